@@ -0,0 +1,218 @@
+"""Columnar storage for historical data, as a directory of compressed Parquet files"""
+import os
+import shutil
+import tempfile
+from datetime import date, datetime
+from typing import Iterable, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+_PARTITIONING = ds.partitioning(pa.schema([("key", pa.string()), ("year", pa.int32())]), flavor="hive")
+_FILE_NAME = "data.parquet"
+
+DateLike = Union[str, date, pd.Timestamp]
+
+
+class ParquetStore:
+    """Typed, compressed columnar storage for date-indexed DataFrames
+
+    Each dataset (eg, "ghcnd_daily") is a directory, partitioned by key (eg, a station ID) and then by year:
+        {root_dir}/{dataset}/key={key}/year={year}/data.parquet
+
+    Reads are memory-mapped, only load the requested columns, and skip any keys & years outside of the requested range
+    without opening their files.
+    DataFrames must be indexed by a DatetimeIndex, which is stored as a "date" column.
+    """
+
+    def __init__(self, root_dir: str, compression: str = "zstd") -> None:
+        """Create a new ParquetStore.
+
+        Args:
+            root_dir: Directory to store datasets in. Dataset directories are created under it as data is written.
+            compression: (optional, default "zstd") Parquet compression codec
+        """
+        self.root_dir = root_dir
+        self.compression = compression
+
+    def write(self, dataset: str, key: str, df: pd.DataFrame):
+        """Replace all the stored data for a key"""
+        self.delete(dataset, key)
+        for (year, year_df) in df.groupby(df.index.year):
+            self._write_file(self._file_path(dataset, key, year), year_df)
+
+    def upsert(self, dataset: str, key: str, df: pd.DataFrame):
+        """Insert or replace rows for a key, by date. Only the years that `df` covers are re-written."""
+        for (year, year_df) in df.groupby(df.index.year):
+            file_path = self._file_path(dataset, key, year)
+            if os.path.exists(file_path):
+                existing_df = self._read_file(file_path)
+                year_df = pd.concat([existing_df[~existing_df.index.isin(year_df.index)], year_df]).sort_index()
+            self._write_file(file_path, year_df)
+
+    def append(self, dataset: str, key: str, df: pd.DataFrame):
+        """Add rows for a key, keeping any existing rows with the same dates. Only the years that `df` covers are re-written.
+
+        Rows stay sorted by date, and rows with the same date keep the order they were appended in.
+        """
+        for (year, year_df) in df.groupby(df.index.year):
+            file_path = self._file_path(dataset, key, year)
+            if os.path.exists(file_path):
+                year_df = pd.concat([self._read_file(file_path), year_df]).sort_index(kind="stable")
+            self._write_file(file_path, year_df)
+
+    def delete(self, dataset: str, key: str):
+        """Delete all the stored data for a key, if there is any"""
+        key_dir = self._key_dir(dataset, key)
+        if os.path.exists(key_dir):
+            shutil.rmtree(key_dir)
+
+    def move(self, src_dataset: str, dataset: str, key: str):
+        """Move all the stored data for a key from one dataset to another, replacing any data it already has there
+
+        This lets a key be rebuilt in a staging dataset, and only swapped in once it's complete. The swap is a pair of
+        directory renames, so readers never see a mix of old & new files. If the key has no data in `src_dataset`, its
+        data in `dataset` is deleted.
+        """
+        src_dir = self._key_dir(src_dataset, key)
+        key_dir = self._key_dir(dataset, key)
+        if not os.path.exists(src_dir):
+            self.delete(dataset, key)
+            return
+
+        # The old data is moved aside under a "."-prefixed name, which dataset discovery and `keys` both ignore
+        os.makedirs(os.path.dirname(key_dir), exist_ok=True)
+        old_dir = os.path.join(os.path.dirname(key_dir), f".{os.path.basename(key_dir)}.old")
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        if os.path.exists(key_dir):
+            os.replace(key_dir, old_dir)
+        os.replace(src_dir, key_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def read(self, dataset: str, key: str, columns: list[str] = None, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """Read the data for a single key, indexed by date
+
+        Args:
+            dataset: Name of the dataset
+            key: Key to read data for
+            columns: (optional) Columns to read. If None, reads all columns.
+            start: (optional) Earliest date to read
+            end: (optional) Latest date to read. Dates & strings without a time include the whole of that period, as
+                in DataFrame indexing.
+        """
+        return self.read_many(dataset, [key], columns, start, end).droplevel("key")
+
+    def read_many(self, dataset: str, keys: Iterable[str] = None, columns: list[str] = None, start: DateLike = None, end: DateLike = None) -> pd.DataFrame:
+        """Read the data for many keys at once, indexed by (key, date)
+
+        Args:
+            dataset: Name of the dataset
+            keys: (optional) Keys to read data for. If None, reads all keys.
+            columns: (optional) Columns to read. If None, reads all columns.
+            start: (optional) Earliest date to read, as anything `pd.Timestamp` accepts
+            end: (optional) Latest date to read, as anything `pd.Timestamp` accepts. As in DataFrame indexing, a date
+                or a string without a time (eg, "2022-01-02" or "2022-01") includes the whole of that day (or month),
+                while a datetime is an exact, inclusive, bound.
+        """
+        dataset_dir = os.path.join(self.root_dir, dataset)
+        if not os.path.exists(dataset_dir):
+            raise FileNotFoundError(f"No such dataset: {dataset_dir}")
+
+        filters = []
+        if keys is not None:
+            filters.append(ds.field("key").isin(list(keys)))
+        if start is not None:
+            start = pd.Timestamp(start)
+            filters.append(ds.field("year") >= start.year)
+            filters.append(ds.field("date") >= pa.scalar(start.to_pydatetime()))
+        if end is not None:
+            (end, inclusive) = _end_bound(end)
+            filters.append(ds.field("year") <= (end if inclusive else end - pd.Timedelta(1)).year)
+            end_scalar = pa.scalar(end.to_pydatetime())
+            filters.append(ds.field("date") <= end_scalar if inclusive else ds.field("date") < end_scalar)
+
+        parquet_ds = ds.dataset(dataset_dir, format="parquet", partitioning=_PARTITIONING,
+                                filesystem=fs.LocalFileSystem(use_mmap=True))
+        table = parquet_ds.to_table(
+            columns=["key", "date"] + list(columns) if columns is not None else None,
+            filter=_all_of(filters)
+        )
+
+        df = table.to_pandas()
+        if "year" in df.columns:
+            df = df.drop(columns="year")
+        return df.set_index(["key", "date"]).sort_index()
+
+    def keys(self, dataset: str) -> list[str]:
+        """Get all the keys stored in a dataset"""
+        dataset_dir = os.path.join(self.root_dir, dataset)
+        if not os.path.exists(dataset_dir):
+            return []
+        return sorted(name.split("=", 1)[1] for name in os.listdir(dataset_dir) if name.startswith("key="))
+
+    def years(self, dataset: str, key: str) -> list[int]:
+        """Get the years that have data stored for a key, eg to read it a year at a time"""
+        key_dir = self._key_dir(dataset, key)
+        if not os.path.exists(key_dir):
+            return []
+        return sorted(int(name.split("=", 1)[1]) for name in os.listdir(key_dir) if name.startswith("year="))
+
+    def latest(self, dataset: str, key: str) -> pd.Timestamp:
+        """Get the latest date stored for a key, or None if nothing is stored. Only reads the latest year."""
+        years = self.years(dataset, key)
+        if not years:
+            return None
+
+        latest_df = pq.read_table(self._file_path(dataset, key, years[-1]), columns=["date"], memory_map=True).to_pandas()
+        return latest_df["date"].max()
+
+    def _key_dir(self, dataset: str, key: str) -> str:
+        return os.path.join(self.root_dir, dataset, f"key={key}")
+
+    def _file_path(self, dataset: str, key: str, year: int) -> str:
+        return os.path.join(self._key_dir(dataset, key), f"year={year}", _FILE_NAME)
+
+    def _write_file(self, file_path: str, df: pd.DataFrame):
+        """Write a DataFrame to a single file, via a temp file so that readers never see a partially-written file
+
+        The temp file name starts with ".", which dataset discovery ignores, so reads of the same dataset don't pick up
+        writes in progress or temp files left behind by a crashed write.
+        """
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+        table = pa.Table.from_pandas(df.rename_axis("date").reset_index(), preserve_index=False)
+        (fd, temp_path) = tempfile.mkstemp(prefix=f".{_FILE_NAME}.", suffix=".tmp", dir=os.path.dirname(file_path))
+        os.close(fd)
+        try:
+            pq.write_table(table, temp_path, compression=self.compression)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def _read_file(self, file_path: str) -> pd.DataFrame:
+        return pq.read_table(file_path, memory_map=True).to_pandas().set_index("date")
+
+
+def _end_bound(end: DateLike) -> tuple[pd.Timestamp, bool]:
+    """Get the bound to filter dates by for an `end` argument, and whether it is inclusive
+
+    Strings are read as periods the way DataFrame indexing reads them, so "2022-01-02" ends before the next day starts.
+    """
+    if isinstance(end, str):
+        return ((pd.Period(end) + 1).start_time, False)
+    if isinstance(end, date) and not isinstance(end, datetime):
+        return (pd.Timestamp(end) + pd.Timedelta(days=1), False)
+    return (pd.Timestamp(end), True)
+
+
+def _all_of(filters: list[ds.Expression]) -> ds.Expression:
+    """Combine filter expressions with AND, or None if there are no filters"""
+    combined = None
+    for expr in filters:
+        combined = expr if combined is None else combined & expr
+    return combined
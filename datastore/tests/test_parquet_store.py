@@ -0,0 +1,126 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from datastore.parquet_store import ParquetStore
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+DATASET = "ghcnd_daily"
+
+
+class TestParquetStore(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ParquetStore(self.temp_dir.name)
+
+        dates = pd.date_range("2021-12-25", "2022-01-05", freq="D", name="date")
+        self.df = pd.DataFrame({"tmax": np.arange(len(dates), dtype=float), "tmin": np.full(len(dates), -5.0)}, index=dates)
+        self.store.write(DATASET, "USC00050848", self.df)
+        self.store.write(DATASET, "USC00053005", self.df * 2)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_write_partitions_by_key_and_year(self):
+        key_dir = os.path.join(self.temp_dir.name, DATASET, "key=USC00050848")
+        self.assertEqual(["year=2021", "year=2022"], sorted(os.listdir(key_dir)))
+        self.assertEqual(["USC00050848", "USC00053005"], self.store.keys(DATASET))
+        self.assertEqual([], self.store.keys("no_such_dataset"))
+        self.assertEqual([2021, 2022], self.store.years(DATASET, "USC00050848"))
+
+    def test_read_round_trips(self):
+        df = self.store.read(DATASET, "USC00050848")
+        pd.testing.assert_frame_equal(self.df, df, check_index_type=False, check_freq=False)
+        self.assertIsInstance(df.index, pd.DatetimeIndex)
+
+    def test_read_projection_and_date_range(self):
+        df = self.store.read(DATASET, "USC00053005", columns=["tmax"], start=date(2021, 12, 30), end="2022-01-02")
+        self.assertEqual(["tmax"], list(df.columns))
+        self.assertEqual(pd.Timestamp("2021-12-30"), df.index[0])
+        self.assertEqual(pd.Timestamp("2022-01-02"), df.index[-1])
+        self.assertEqual(10.0, df.loc["2021-12-30", "tmax"])
+
+    def test_read_date_only_end(self):
+        hours = pd.date_range("2021-12-31", "2022-02-01 23:00", freq="h", name="date")
+        self.store.write("hourly", "PSCO", pd.DataFrame({"demand": np.arange(len(hours), dtype=float)}, index=hours))
+
+        # Dates without a time include the whole day (or month), as when indexing a DataFrame
+        self.assertEqual(48, len(self.store.read("hourly", "PSCO", start="2022-01-01", end="2022-01-02")))
+        self.assertEqual(48, len(self.store.read("hourly", "PSCO", start="2022-01-01", end=date(2022, 1, 2))))
+        self.assertEqual(24 * 31, len(self.store.read("hourly", "PSCO", start="2022-01-01", end="2022-01")))
+        self.assertEqual(24, len(self.store.read("hourly", "PSCO", end="2021")))
+
+        # Datetimes are exact
+        self.assertEqual(25, len(self.store.read("hourly", "PSCO", start="2022-01-01", end=pd.Timestamp("2022-01-02"))))
+        self.assertEqual(26, len(self.store.read("hourly", "PSCO", start="2022-01-01", end="2022-01-02 01:00")))
+
+    def test_read_many(self):
+        df = self.store.read_many(DATASET, start="2022-01-05")
+        self.assertEqual(["key", "date"], df.index.names)
+        self.assertEqual(11.0, df.loc[("USC00050848", pd.Timestamp("2022-01-05")), "tmax"])
+        self.assertEqual(22.0, df.loc[("USC00053005", pd.Timestamp("2022-01-05")), "tmax"])
+
+        with self.assertRaises(FileNotFoundError):
+            self.store.read_many("no_such_dataset")
+
+    def test_upsert_and_latest(self):
+        new_df = pd.DataFrame({"tmax": [99.0, 100.0], "tmin": [0.0, 0.0]}, index=pd.DatetimeIndex(["2022-01-05", "2022-01-06"], name="date"))
+        self.store.upsert(DATASET, "USC00050848", new_df)
+
+        df = self.store.read(DATASET, "USC00050848")
+        self.assertEqual(len(self.df) + 1, len(df))
+        self.assertEqual(10.0, df.loc["2022-01-04", "tmax"])
+        self.assertEqual(99.0, df.loc["2022-01-05", "tmax"])
+        self.assertEqual(pd.Timestamp("2022-01-06"), self.store.latest(DATASET, "USC00050848"))
+        self.assertIsNone(self.store.latest(DATASET, "USW00023062"))
+
+    def test_append_keeps_existing_rows(self):
+        new_df = pd.DataFrame({"tmax": [99.0, 100.0], "tmin": [0.0, 0.0]}, index=pd.DatetimeIndex(["2022-01-05", "2022-01-06"], name="date"))
+        self.store.append(DATASET, "USC00050848", new_df)
+
+        df = self.store.read(DATASET, "USC00050848", start="2022-01-05")
+        self.assertEqual([11.0, 99.0, 100.0], list(df["tmax"]))
+
+    def test_write_replaces_key(self):
+        self.store.write(DATASET, "USC00050848", self.df["2022-01-01":])
+
+        df = self.store.read(DATASET, "USC00050848")
+        self.assertEqual(pd.Timestamp("2022-01-01"), df.index[0])
+        self.assertEqual(["year=2022"], os.listdir(os.path.join(self.temp_dir.name, DATASET, "key=USC00050848")))
+
+        self.store.delete(DATASET, "USC00050848")
+        self.assertEqual(["USC00053005"], self.store.keys(DATASET))
+
+    def test_move(self):
+        self.store.write("staging", "USC00050848", self.df["2022-01-01":] * 10)
+
+        self.store.move("staging", DATASET, "USC00050848")
+
+        self.assertEqual([2022], self.store.years(DATASET, "USC00050848"))
+        self.assertEqual(110.0, self.store.read(DATASET, "USC00050848").loc["2022-01-05", "tmax"])
+        self.assertEqual([], self.store.keys("staging"))
+        self.assertEqual(["USC00050848", "USC00053005"], self.store.keys(DATASET))
+        self.assertEqual(["key=USC00050848", "key=USC00053005"], sorted(os.listdir(os.path.join(self.temp_dir.name, DATASET))))
+
+        # Moving a key with no data deletes it
+        self.store.move("staging", DATASET, "USC00053005")
+        self.assertEqual(["USC00050848"], self.store.keys(DATASET))
+
+    def test_read_ignores_temp_files(self):
+        # Eg, left behind by a write that crashed, or from a write in progress
+        partition_dir = os.path.join(self.temp_dir.name, DATASET, "key=USC00050848", "year=2022")
+        with open(os.path.join(partition_dir, ".data.parquet.abc123.tmp"), "wb") as temp_file:
+            temp_file.write(b"PAR1 partial")
+
+        self.assertEqual(len(self.df), len(self.store.read(DATASET, "USC00050848")))
+        df = self.store.read_many(DATASET, ["USC00050848", "USC00053005"])
+        self.assertEqual(2 * len(self.df), len(df))
+
+        self.store.upsert(DATASET, "USC00050848", self.df)
+        self.assertEqual(["data.parquet"], [name for name in os.listdir(partition_dir) if not name.startswith(".")])
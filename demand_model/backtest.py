@@ -0,0 +1,170 @@
+"""Walk-forward (rolling-origin) backtesting of demand models
+
+Each fold trains a model on the rows before a cutoff date and scores it on the `horizon_days` after it. Folds for every
+model run in parallel across a process pool. The feature matrix is saved once as memory-mapped .npy files which every
+worker maps read-only, and each fold's training & test rows are contiguous slices of it, so no worker copies the full
+frame. Only each fold's predictions are sent back.
+
+Models are anything with scikit-learn style `fit(X, y)` & `predict(X)` methods, given as picklable zero-argument
+factories, eg `functools.partial(RandomForestRegressor, n_estimators=100)`.
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from demand_model.features import TARGET
+
+DateLike = Union[str, date, pd.Timestamp]
+
+SEASONS = np.array(["winter", "winter", "spring", "spring", "spring", "summer",
+                    "summer", "summer", "autumn", "autumn", "autumn", "winter"])
+"""Meteorological season for each month, indexed by month - 1"""
+
+# Memory-mapped feature matrix & target, set in each worker process by `_init_worker`
+_features: np.ndarray = None
+_target: np.ndarray = None
+
+
+@dataclass(frozen=True)
+class Fold:
+    """A single train/test split, as row positions in the feature matrix"""
+    cutoff: pd.Timestamp
+    """First day of the test period. The model is trained on rows before this."""
+    train_start: int
+    train_stop: int
+    test_start: int
+    test_stop: int
+
+
+@dataclass
+class BacktestResult:
+    """Predictions from every fold of a backtest, with scores per fold & per season"""
+    predictions: pd.DataFrame
+    """Indexed by date, with "model", "cutoff", "actual" & "predicted" columns. Days are repeated across models, and
+    across folds if their test periods overlap."""
+
+    def fold_scores(self) -> pd.DataFrame:
+        """RMSE & MAPE for each model and fold, indexed by (model, cutoff)"""
+        return self._scores(["model", "cutoff"])
+
+    def season_scores(self) -> pd.DataFrame:
+        """RMSE & MAPE for each model and season, over all folds, indexed by (model, season)"""
+        seasons = pd.Series(SEASONS[self.predictions.index.month - 1], index=self.predictions.index, name="season")
+        return self._scores(["model", seasons])
+
+    def summary(self) -> pd.DataFrame:
+        """RMSE & MAPE for each model over all folds, indexed by model and sorted best (lowest RMSE) first"""
+        return self._scores(["model"]).sort_values("rmse")
+
+    def _scores(self, by: list) -> pd.DataFrame:
+        errors = self.predictions["predicted"] - self.predictions["actual"]
+        grouped = pd.DataFrame({
+            "squared_error": errors ** 2,
+            "percentage_error": (errors / self.predictions["actual"]).abs(),
+        }).groupby([self.predictions[key] if isinstance(key, str) else key for key in by], sort=True)
+
+        scores = grouped.mean()
+        return pd.DataFrame({
+            "rmse": np.sqrt(scores["squared_error"]),
+            "mape": scores["percentage_error"],
+            "num_days": grouped.size(),
+        })
+
+
+def walk_forward_folds(dates: pd.DatetimeIndex, cutoffs: Iterable[DateLike], horizon_days: int = 365,
+                       train_days: int = None) -> list[Fold]:
+    """Create rolling-origin folds over a sorted index of dates
+
+    Args:
+        dates: Sorted dates of the feature matrix rows
+        cutoffs: First day of each fold's test period, eg `pd.date_range("2019-01-01", "2022-01-01", freq="QS")`
+        horizon_days: (optional, default 365) Length of each fold's test period, in days
+        train_days: (optional) Only train on this many days before each cutoff. If None, each fold trains on all
+            earlier rows (an expanding window).
+
+    Returns:
+        Folds with at least one training and one test row
+    """
+    folds = []
+    for cutoff in pd.DatetimeIndex(cutoffs):
+        test_end = cutoff + pd.Timedelta(days=horizon_days)
+        (train_stop, test_stop) = dates.searchsorted([cutoff, test_end])
+        train_start = dates.searchsorted(cutoff - pd.Timedelta(days=train_days)) if train_days is not None else 0
+
+        if train_stop > train_start and test_stop > train_stop:
+            folds.append(Fold(cutoff, int(train_start), int(train_stop), int(train_stop), int(test_stop)))
+
+    return folds
+
+
+def run_backtest(features_df: pd.DataFrame, models: dict[str, Callable[[], any]], cutoffs: Iterable[DateLike],
+                 horizon_days: int = 365, train_days: int = None, target: str = TARGET,
+                 max_workers: int = None) -> BacktestResult:
+    """Backtest models with walk-forward evaluation, running every (model, fold) in parallel
+
+    Args:
+        features_df: Feature matrix indexed by date, as returned by `build_features`, with no missing values
+        models: Zero-argument factories for the models to compare, by name. Factories must be picklable, eg classes
+            or `functools.partial`s of them, as they are sent to worker processes.
+        cutoffs: First day of each fold's test period, see `walk_forward_folds`
+        horizon_days: (optional, default 365) Length of each fold's test period, in days
+        train_days: (optional) Only train on this many days before each cutoff, rather than all earlier rows
+        target: (optional, default "daily_demand") Column to predict. Every other column is a feature.
+        max_workers: (optional) Number of worker processes. If None, uses one per CPU. If 1, runs in this process.
+    """
+    features_df = features_df.sort_index()
+    folds = walk_forward_folds(features_df.index, cutoffs, horizon_days, train_days)
+    actual = features_df[target].to_numpy(dtype=np.float64)
+    tasks = [(name, factory, fold) for (name, factory) in models.items() for fold in folds]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        np.save(os.path.join(data_dir, "features.npy"), features_df.drop(columns=target).to_numpy(dtype=np.float64))
+        np.save(os.path.join(data_dir, "target.npy"), actual)
+
+        if max_workers == 1:
+            _init_worker(data_dir)
+            try:
+                all_predictions = [_run_fold(*task) for task in tasks]
+            finally:
+                _release_worker()
+        else:
+            with ProcessPoolExecutor(max_workers, initializer=_init_worker, initargs=(data_dir,)) as executor:
+                all_predictions = list(executor.map(_run_fold, *zip(*tasks))) if tasks else []
+
+    frames = [
+        pd.DataFrame({
+            "model": name,
+            "cutoff": fold.cutoff,
+            "actual": actual[fold.test_start:fold.test_stop],
+            "predicted": predictions,
+        }, index=features_df.index[fold.test_start:fold.test_stop])
+        for ((name, _, fold), predictions) in zip(tasks, all_predictions)
+    ]
+    if not frames:
+        frames = [pd.DataFrame(columns=["model", "cutoff", "actual", "predicted"], index=pd.DatetimeIndex([], name=features_df.index.name))]
+    return BacktestResult(pd.concat(frames))
+
+
+def _init_worker(data_dir: str):
+    """Memory-map the feature matrix & target saved by `run_backtest`, read-only"""
+    global _features, _target  # pylint: disable=global-statement
+    _features = np.load(os.path.join(data_dir, "features.npy"), mmap_mode="r")
+    _target = np.load(os.path.join(data_dir, "target.npy"), mmap_mode="r")
+
+
+def _release_worker():
+    global _features, _target  # pylint: disable=global-statement
+    (_features, _target) = (None, None)
+
+
+def _run_fold(_name: str, factory: Callable[[], any], fold: Fold) -> np.ndarray:
+    """Train a new model on a fold's training rows, and predict its test rows"""
+    model = factory()
+    model.fit(_features[fold.train_start:fold.train_stop], _target[fold.train_start:fold.train_stop])
+    return np.asarray(model.predict(_features[fold.test_start:fold.test_stop]), dtype=np.float64)
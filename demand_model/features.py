@@ -0,0 +1,228 @@
+"""Feature engineering for daily demand models
+
+Builds the feature matrix the notebooks used to assemble by hand (calendar parts, lagged demand) plus rolling demand
+statistics and heating/cooling degree days, in one vectorized pass over a continuous daily index. Every lag and rolling
+window is read from a single strided view of the demand array, rather than a `.shift()` and column insert per lag.
+
+Feature matrices can be cached by `FeatureCache`, keyed by a hash of the input data and the `FeatureConfig`, so model
+experiments over the same data don't rebuild identical matrices.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+TARGET = "daily_demand"
+
+CALENDAR_COLUMNS = ["Year", "Month", "Week", "Day", "Dayofweek", "Dayofyear"]
+"""Calendar parts, named as fastai's `add_datepart` names them so the notebooks' column references keep working"""
+
+
+@dataclass(frozen=True)
+class FeatureConfig:
+    """Which features to build"""
+    demand_lags: tuple[int, ...] = tuple(range(1, 15))
+    """Days to lag demand by, eg 1 for yesterday's demand"""
+    rolling_windows: tuple[int, ...] = (7, 28)
+    """Lengths in days of the trailing windows to compute demand mean & standard deviation over. Windows end the day
+    before the row, so no feature includes the row's own demand."""
+    base_temperature: float = 18.0
+    """Base temperature for heating & cooling degree days, in degrees C (the GHCN-d units). 18C is about 65F."""
+    include_weather: bool = True
+    """Whether to include the raw weather columns as features, alongside the degree days"""
+
+    @property
+    def history_days(self) -> int:
+        """How many days of demand before a row are needed to compute all of its features"""
+        return max(self.demand_lags + self.rolling_windows, default=0)
+
+
+def build_features(demand: pd.Series, weather: pd.DataFrame, temperature: pd.Series = None,
+                   config: FeatureConfig = FeatureConfig(), dropna: bool = True) -> pd.DataFrame:
+    """Build a daily feature matrix from demand and weather data
+
+    Args:
+        demand: Daily demand, indexed by date, eg the "daily_demand" column from `read_demand_data`
+        weather: Daily weather, indexed by date, as returned by `read_weather_data`
+        temperature: (optional) Daily mean temperature to compute degree days from, eg a composite of many stations.
+            If None, the mean of all the `*_tmax` & `*_tmin` columns in `weather` is used.
+        config: (optional) Which features to build
+        dropna: (optional, default True) Drop rows with any missing feature or target, eg the first `history_days` rows
+
+    Returns:
+        DataFrame indexed by date with the target ("daily_demand") and feature columns. Rows are every day between
+        the earliest and latest date in `demand` & `weather`, so lags are always whole days even over gaps in the data.
+    """
+    index = demand.index.union(weather.index)
+    dates = pd.date_range(index.min(), index.max(), freq="D", name="date") if len(index) else pd.DatetimeIndex([], name="date")
+    weather = weather.reindex(dates)
+    if temperature is None:
+        temperature = mean_temperature(weather)
+
+    demand_values = demand.reindex(dates).to_numpy(dtype=np.float64)
+    columns = {TARGET: demand_values}
+    columns.update(calendar_features(dates))
+    columns.update(demand_features(demand_values, config))
+    columns.update(degree_day_features(temperature.reindex(dates).to_numpy(dtype=np.float64), config))
+
+    features_df = pd.DataFrame(columns, index=dates)
+    if config.include_weather:
+        features_df = pd.concat([features_df, weather], axis=1)
+
+    return features_df.dropna() if dropna else features_df
+
+
+def calendar_features(dates: pd.DatetimeIndex) -> dict[str, np.ndarray]:
+    """Calendar parts for each date, see `CALENDAR_COLUMNS`"""
+    return {
+        "Year": dates.year.to_numpy(),
+        "Month": dates.month.to_numpy(),
+        "Week": dates.isocalendar().week.to_numpy(dtype=np.int64),
+        "Day": dates.day.to_numpy(),
+        "Dayofweek": dates.dayofweek.to_numpy(),
+        "Dayofyear": dates.dayofyear.to_numpy(),
+    }
+
+
+def demand_features(demand: np.ndarray, config: FeatureConfig) -> dict[str, np.ndarray]:
+    """Lagged demand and trailing rolling statistics for each day of a continuous daily demand array
+
+    Args:
+        demand: Daily demand, one value per consecutive day, with NaN for missing days
+        config: Which lags & rolling windows to compute
+
+    Returns:
+        Arrays the same length as `demand`, named "demand_lag_{lag}", "demand_mean_{window}" and "demand_std_{window}".
+        Values that would need demand from before the start of the array are NaN.
+    """
+    history_days = config.history_days
+
+    # Row t of the window view holds demand for days t - history_days ... t
+    padded = np.concatenate([np.full(history_days, np.nan), demand])
+    return window_features(sliding_window_view(padded, history_days + 1), config)
+
+
+def window_features(windows: np.ndarray, config: FeatureConfig) -> dict[str, np.ndarray]:
+    """Lagged demand and trailing rolling statistics from windows of demand, see `demand_features`
+
+    Args:
+        windows: 2D array with a row per day, holding demand for the `config.history_days` days before it and then the
+            day itself
+        config: Which lags & rolling windows to compute
+    """
+    history_days = config.history_days
+    columns = {}
+    for lag in config.demand_lags:
+        columns[f"demand_lag_{lag}"] = windows[:, history_days - lag]
+    for window in config.rolling_windows:
+        trailing = windows[:, history_days - window:history_days]
+        columns[f"demand_mean_{window}"] = trailing.mean(axis=1)
+        columns[f"demand_std_{window}"] = trailing.std(axis=1, ddof=1)
+
+    return columns
+
+
+def degree_day_features(temperature: np.ndarray, config: FeatureConfig) -> dict[str, np.ndarray]:
+    """Heating & cooling degree days ("hdd" & "cdd") from daily mean temperatures, plus the temperature itself ("tavg")"""
+    return {
+        "tavg": temperature,
+        "hdd": np.maximum(config.base_temperature - temperature, 0.0),
+        "cdd": np.maximum(temperature - config.base_temperature, 0.0),
+    }
+
+
+def mean_temperature(weather: pd.DataFrame) -> pd.Series:
+    """Daily mean temperature across all stations, as the midpoint of the mean max & mean min temperatures
+
+    Args:
+        weather: Daily weather as returned by `read_weather_data`, with `{station_id}_tmax` & `{station_id}_tmin` columns
+    """
+    return pd.Series((station_mean(weather, "tmax") + station_mean(weather, "tmin")) / 2, index=weather.index, name="tavg")
+
+
+def station_mean(weather: pd.DataFrame, element: str) -> np.ndarray:
+    """Daily mean of one element (eg, "tmax") across all stations, ignoring stations missing a day
+
+    Args:
+        weather: Daily weather as returned by `read_weather_data`, with `{station_id}_{element}` columns
+        element: Lower-cased element name
+    """
+    return _nanmean(weather.filter(regex=f"_{element}$").to_numpy(dtype=np.float64))
+
+
+def mean_temperature_values(tmax: np.ndarray, tmin: np.ndarray) -> np.ndarray:
+    """Daily mean temperature from 2D arrays of max & min temperatures, with a row per day and a column per station"""
+    return (_nanmean(tmax) + _nanmean(tmin)) / 2
+
+
+def data_version(*frames: Optional[pd.DataFrame | pd.Series], config: FeatureConfig = None) -> str:
+    """Get a hash of some input data (and optionally a FeatureConfig), which changes whenever any value does
+
+    Args:
+        frames: DataFrames or Series to hash, including their index and column names. None entries are allowed.
+        config: (optional) FeatureConfig to include in the hash
+    """
+    digest = hashlib.sha256()
+    for frame in frames:
+        if frame is None:
+            digest.update(b"None")
+            continue
+        names = frame.columns if isinstance(frame, pd.DataFrame) else [frame.name]
+        digest.update(repr(list(names)).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    if config is not None:
+        digest.update(repr(config).encode())
+    return digest.hexdigest()[:32]
+
+
+class FeatureCache:
+    """Cache of feature matrices keyed by the version of their input data, in memory and optionally on disk"""
+
+    def __init__(self, cache_dir: str = None, max_entries: int = 8) -> None:
+        """Create a new FeatureCache.
+
+        Args:
+            cache_dir: (optional) Directory to persist feature matrices to, as Parquet files. If None, matrices are only
+                cached in memory.
+            max_entries: (optional, default 8) Maximum number of feature matrices to keep in memory
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, pd.DataFrame] = OrderedDict()
+
+    def get_or_build(self, demand: pd.Series, weather: pd.DataFrame, temperature: pd.Series = None,
+                     config: FeatureConfig = FeatureConfig(), dropna: bool = True) -> pd.DataFrame:
+        """Get the feature matrix for some data from the cache, building & caching it if needed. See `build_features`."""
+        version = data_version(demand, weather, temperature, config=config) + ("_dropna" if dropna else "")
+
+        features_df = self._entries.get(version)
+        if features_df is None and self.cache_dir is not None:
+            file_path = os.path.join(self.cache_dir, f"{version}.parquet")
+            if os.path.exists(file_path):
+                features_df = pd.read_parquet(file_path)
+        if features_df is None:
+            features_df = build_features(demand, weather, temperature, config, dropna)
+            if self.cache_dir is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                features_df.to_parquet(os.path.join(self.cache_dir, f"{version}.parquet"))
+
+        self._entries[version] = features_df
+        self._entries.move_to_end(version)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        # Callers get their own copy, so modifying it can't corrupt the cache
+        return features_df.copy()
+
+
+def _nanmean(values: np.ndarray) -> np.ndarray:
+    """Row-wise mean ignoring NaN, which is NaN (without a warning) for rows that are all NaN"""
+    counts = np.count_nonzero(~np.isnan(values), axis=1)
+    sums = np.nansum(values, axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
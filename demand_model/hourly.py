@@ -0,0 +1,186 @@
+"""Hourly demand forecasting, from cleansed hourly EIA demand and hourly temperatures
+
+Features are built for every hour at once: local hour-of-day, day-of-week & day-of-year, temperature with hourly
+heating/cooling degrees and a trailing 24 hour mean, and demand from the same hour a week earlier. A week-long lag
+means a model can forecast as far ahead as NOAA's hourly forecast goes (about 6.5 days) from demand already reported.
+
+Models are trained on historical hours, with temperatures interpolated from the GHCN-d daily max & min (see
+`hourly_temperatures_from_daily`), and then predict from `point_forecast_hourly` temperatures (see
+`hourly_forecast_temperatures`). EIA hourly data and both temperature sources are indexed by naive UTC hours.
+"""
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from demand_model import features
+from noaa_client.point_forecast import PointForecast
+
+TARGET = "demand"
+
+
+@dataclass(frozen=True)
+class HourlyFeatureConfig:
+    """Which hourly features to build"""
+    timezone: str = "America/Denver"
+    """Timezone that calendar features are in, ie the one the load follows. PSCO is in Mountain time."""
+    base_temperature: float = 18.0
+    """Base temperature for heating & cooling degrees, in degrees C"""
+    demand_lags: tuple[int, ...] = (168,)
+    """Hours to lag demand by. Lags shorter than the forecast horizon will be missing for later hours."""
+    min_temperature_hour: int = 6
+    """Local hour of the daily minimum temperature, when interpolating from daily data"""
+    max_temperature_hour: int = 15
+    """Local hour of the daily maximum temperature, when interpolating from daily data"""
+
+
+def build_hourly_features(temperature: pd.Series, demand: pd.Series = None,
+                          config: HourlyFeatureConfig = HourlyFeatureConfig(),
+                          recent_temperature: pd.Series = None) -> pd.DataFrame:
+    """Build an hourly feature matrix, with a row for every hour of temperature data
+
+    Args:
+        temperature: Hourly temperature in degrees C, indexed by naive UTC hour
+        demand: (optional) Hourly demand, indexed by naive UTC hour, eg from `read_demand_data(hourly=True)`. Used for
+            the target & lag features. If None, both are NaN.
+        config: (optional) Which features to build
+        recent_temperature: (optional) Observed hourly temperature before the first hour of `temperature`, so that the
+            trailing 24 hour mean covers a full 24 hours from the first row, as it does in training. Later hours are
+            ignored. If None, the mean only covers the hours in `temperature`.
+
+    Returns:
+        DataFrame indexed by naive UTC hour, with the target ("demand") and feature columns. Rows with missing values
+        are kept.
+    """
+    temperature = temperature.sort_index()
+    hours = pd.DatetimeIndex(temperature.index, name="date")
+    local_hours = hours.tz_localize("UTC").tz_convert(config.timezone)
+    if demand is None:
+        demand = pd.Series(dtype=np.float64, index=pd.DatetimeIndex([]))
+
+    temperature_values = temperature.to_numpy(dtype=np.float64)
+    if recent_temperature is not None and len(hours):
+        recent_temperature = recent_temperature.sort_index()
+        earlier = recent_temperature[recent_temperature.index < hours[0]]
+        mean_24 = pd.concat([earlier, temperature]).rolling("24h", min_periods=1).mean().iloc[len(earlier):]
+    else:
+        mean_24 = temperature.rolling("24h", min_periods=1).mean()
+    columns = {
+        TARGET: demand.reindex(hours).to_numpy(dtype=np.float64),
+        "hour": local_hours.hour.to_numpy(),
+        "dayofweek": local_hours.dayofweek.to_numpy(),
+        "dayofyear": local_hours.dayofyear.to_numpy(),
+        "is_weekend": (local_hours.dayofweek >= 5).astype(np.int64),
+        "temperature": temperature_values,
+        "temperature_mean_24": mean_24.to_numpy(dtype=np.float64),
+    }
+    degrees = features.degree_day_features(temperature_values, features.FeatureConfig(base_temperature=config.base_temperature))
+    columns["hdd"] = degrees["hdd"]
+    columns["cdd"] = degrees["cdd"]
+    for lag in config.demand_lags:
+        columns[f"demand_lag_{lag}"] = demand.reindex(hours - pd.Timedelta(hours=lag)).to_numpy(dtype=np.float64)
+
+    return pd.DataFrame(columns, index=hours)
+
+
+def hourly_temperatures_from_daily(weather: pd.DataFrame, config: HourlyFeatureConfig = HourlyFeatureConfig()) -> pd.Series:
+    """Estimate hourly temperatures from daily max & min temperatures, for training on historical data
+
+    Each day's min is placed at `config.min_temperature_hour` local time and its max at `config.max_temperature_hour`,
+    and the hours between are interpolated linearly. Temperatures are the mean over all stations, as in
+    `features.mean_temperature`.
+
+    Args:
+        weather: Daily weather as returned by `read_weather_data`, with `{station_id}_tmax` & `{station_id}_tmin` columns
+        config: (optional) Timezone & hours of the daily min & max
+
+    Returns:
+        Hourly temperature in degrees C, indexed by naive UTC hour
+    """
+    days = pd.DatetimeIndex(weather.index).normalize()
+    anchors = pd.concat([
+        pd.Series(features.station_mean(weather, "tmin"), index=days + pd.Timedelta(hours=config.min_temperature_hour)),
+        pd.Series(features.station_mean(weather, "tmax"), index=days + pd.Timedelta(hours=config.max_temperature_hour)),
+    ]).dropna()
+    anchors.index = anchors.index.tz_localize(config.timezone).tz_convert("UTC").tz_localize(None)
+    anchors = anchors.sort_index()
+    if anchors.empty:
+        return pd.Series(dtype=np.float64, index=pd.DatetimeIndex([], name="date"), name="temperature")
+
+    hours = pd.date_range(anchors.index[0].ceil("h"), anchors.index[-1].floor("h"), freq="h", name="date")
+    values = np.interp(hours.asi8, anchors.index.asi8, anchors.to_numpy())
+    return pd.Series(values, index=hours, name="temperature")
+
+
+def hourly_forecast_temperatures(forecast: PointForecast) -> pd.Series:
+    """Get hourly temperatures in degrees C from an hourly forecast, eg from `ForecastClient.point_forecast_hourly`
+
+    Returns:
+        Hourly temperature in degrees C, indexed by naive UTC hour
+    """
+    arrays = forecast.to_arrays()
+    temperature = arrays["temperature"]
+    if forecast.periods and forecast.periods[0].temperature_unit == "F":
+        temperature = (temperature - 32.0) * 5.0 / 9.0
+    return pd.Series(temperature, index=pd.DatetimeIndex(arrays["start_time"], name="date"), name="temperature")
+
+
+class HourlyDemandModel:
+    """Hourly demand model, trained and scored in whole batches of hours"""
+
+    def __init__(self, config: HourlyFeatureConfig = HourlyFeatureConfig(),
+                 model_factory: Callable[[], any] = HistGradientBoostingRegressor) -> None:
+        """Create a new, untrained, HourlyDemandModel.
+
+        Args:
+            config: (optional) Which features to build
+            model_factory: (optional) Creates the underlying model, which must have scikit-learn style `fit(X, y)` &
+                `predict(X)` methods. Defaults to histogram-based gradient boosting, which trains on ~100k hours in
+                seconds and handles missing lag values itself.
+        """
+        self.config = config
+        self.model_factory = model_factory
+        self.model = None
+        self.feature_columns: list[str] = None
+
+    def fit(self, demand: pd.Series, temperature: pd.Series) -> "HourlyDemandModel":
+        """Train on historical hourly demand & temperatures
+
+        Args:
+            demand: Cleansed hourly demand, indexed by naive UTC hour, eg the "demand" column from
+                `read_demand_data(hourly=True)`
+            temperature: Hourly temperature in degrees C, indexed by naive UTC hour, eg from
+                `hourly_temperatures_from_daily`. Only hours with both demand & temperature are trained on.
+        """
+        features_df = build_hourly_features(temperature, demand, self.config)
+        features_df = features_df[features_df[TARGET].notna() & features_df["temperature"].notna()]
+
+        self.feature_columns = [column for column in features_df.columns if column != TARGET]
+        self.model = self.model_factory()
+        self.model.fit(features_df[self.feature_columns].to_numpy(), features_df[TARGET].to_numpy())
+        return self
+
+    def predict(self, temperature: pd.Series, recent_demand: pd.Series = None,
+                recent_temperature: pd.Series = None) -> pd.Series:
+        """Predict demand for every hour of a temperature forecast, in one call to the model
+
+        Args:
+            temperature: Hourly temperature in degrees C, indexed by naive UTC hour, eg from
+                `hourly_forecast_temperatures`
+            recent_demand: (optional) Hourly demand before the forecast, for lag features. Without it, lags are missing,
+                which the default model handles but others may not.
+            recent_temperature: (optional) Observed hourly temperature before the forecast, eg the last day of
+                `hourly_temperatures_from_daily`. Without it, the trailing 24 hour mean for the first forecast hours
+                only covers forecast hours, unlike in training.
+
+        Returns:
+            Predicted demand, indexed by naive UTC hour
+        """
+        if self.model is None:
+            raise ValueError("HourlyDemandModel must be fit before predicting")
+
+        features_df = build_hourly_features(temperature, recent_demand, self.config, recent_temperature)
+        predictions = self.model.predict(features_df[self.feature_columns].to_numpy())
+        return pd.Series(np.asarray(predictions, dtype=np.float64), index=features_df.index, name=TARGET)
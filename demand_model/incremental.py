@@ -0,0 +1,121 @@
+"""Incremental feature updates, for scoring one new day at a time without rebuilding features over all history
+
+`IncrementalFeatures` keeps only the trailing window of demand that lags & rolling statistics need, so appending a day
+and producing its feature row takes the same (sub-millisecond) time however much history there is. Rows are identical
+to the matching rows of `build_features(..., dropna=False)`.
+"""
+from datetime import date, timedelta
+from typing import Mapping, Union
+
+import numpy as np
+import pandas as pd
+
+from demand_model import features
+from demand_model.features import TARGET, FeatureConfig
+
+DateLike = Union[str, date, pd.Timestamp]
+
+
+class IncrementalFeatures:
+    """Trailing-window feature state for a single daily demand series"""
+
+    def __init__(self, last_date: DateLike, recent_demand: np.ndarray, weather_columns: list[str],
+                 config: FeatureConfig = FeatureConfig()) -> None:
+        """Create a new IncrementalFeatures. See `from_history` to create one from previously-built data.
+
+        Args:
+            last_date: The latest day that demand has been seen for
+            recent_demand: Demand for the `config.history_days` days up to and including `last_date`, oldest first,
+                with NaN for missing days
+            weather_columns: Weather columns to include in feature rows, as returned by `read_weather_data`
+            config: (optional) Which features to build
+        """
+        if len(recent_demand) != config.history_days:
+            raise ValueError(f"Expected {config.history_days} days of recent demand, got {len(recent_demand)}")
+
+        self.config = config
+        self.last_date = pd.Timestamp(last_date).normalize()
+        self.weather_columns = list(weather_columns)
+        self.columns = self._columns()
+        self._tmax_positions = [i for (i, column) in enumerate(self.weather_columns) if column.endswith("_tmax")]
+        self._tmin_positions = [i for (i, column) in enumerate(self.weather_columns) if column.endswith("_tmin")]
+        self._demand = np.array(recent_demand, dtype=np.float64)
+
+    @classmethod
+    def from_history(cls, demand: pd.Series, weather: pd.DataFrame, config: FeatureConfig = FeatureConfig()) -> "IncrementalFeatures":
+        """Create a new IncrementalFeatures, seeded with the end of some historical data
+
+        Args:
+            demand: Daily demand, indexed by date. Only the last `config.history_days` days are kept.
+            weather: Daily weather, as returned by `read_weather_data`. Only the column names are kept.
+            config: (optional) Which features to build
+        """
+        last_date = demand.index.max()
+        dates = pd.date_range(end=last_date, periods=config.history_days, freq="D")
+        return cls(last_date, demand.reindex(dates).to_numpy(dtype=np.float64), weather.columns, config)
+
+    def features_for_next_day(self, weather: Mapping[str, float], temperature: float = None) -> pd.Series:
+        """Get the feature row for the day after `last_date`, eg to predict tomorrow's demand. The state is unchanged.
+
+        Args:
+            weather: Weather (eg, forecast) for the day, keyed by the columns in `weather_columns`. Missing keys are NaN.
+            temperature: (optional) Mean temperature for the day, see `build_features`
+        """
+        return self._row(self.last_date + timedelta(days=1), np.nan, weather, temperature)
+
+    def append(self, day: DateLike, demand: float, weather: Mapping[str, float], temperature: float = None) -> pd.Series:
+        """Add a new day of demand & weather, and get its feature row
+
+        Any days skipped between `last_date` and `day` are treated as missing, exactly as `build_features` would.
+
+        Args:
+            day: The day to add, which must be after `last_date`
+            demand: Demand for the day
+            weather: Weather observed on the day, keyed by the columns in `weather_columns`. Missing keys are NaN.
+            temperature: (optional) Mean temperature for the day, see `build_features`
+        """
+        day = pd.Timestamp(day).normalize()
+        num_days = (day - self.last_date).days
+        if num_days < 1:
+            raise ValueError(f"Can only append days after {self.last_date.date()}, got {day.date()}")
+
+        if num_days > 1:
+            self._shift_in(np.full(min(num_days - 1, self.config.history_days), np.nan))
+
+        row = self._row(day, demand, weather, temperature)
+        self._shift_in(np.array([demand], dtype=np.float64))
+        self.last_date = day
+        return row
+
+    def _row(self, day: pd.Timestamp, demand: float, weather: Mapping[str, float], temperature: float) -> pd.Series:
+        weather_values = np.array([weather.get(column, np.nan) for column in self.weather_columns], dtype=np.float64)
+        if temperature is None:
+            temperature = features.mean_temperature_values(weather_values[np.newaxis, self._tmax_positions],
+                                                           weather_values[np.newaxis, self._tmin_positions])[0]
+
+        # Calendar parts straight from the Timestamp, as building a DatetimeIndex for one day costs more than the rest
+        window = np.append(self._demand, demand)[np.newaxis]
+        values = [demand, day.year, day.month, day.isocalendar()[1], day.day, day.dayofweek, day.dayofyear]
+        values.extend(column[0] for column in features.window_features(window, self.config).values())
+        values.extend(column[0] for column in features.degree_day_features(np.array([temperature], dtype=np.float64), self.config).values())
+        if self.config.include_weather:
+            values.extend(weather_values)
+
+        return pd.Series(values, index=self.columns, name=day, dtype=np.float64)
+
+    def _shift_in(self, values: np.ndarray):
+        """Push the newest days of demand onto the end of the trailing window, dropping the oldest"""
+        num_values = min(len(values), len(self._demand))
+        if num_values:
+            self._demand[:-num_values] = self._demand[num_values:]
+            self._demand[-num_values:] = values[-num_values:]
+
+    def _columns(self) -> pd.Index:
+        """Feature columns, in the same order as `build_features`"""
+        columns = [TARGET]
+        columns.extend(features.CALENDAR_COLUMNS)
+        columns.extend(features.window_features(np.full((1, self.config.history_days + 1), np.nan), self.config))
+        columns.extend(features.degree_day_features(np.array([np.nan]), self.config))
+        if self.config.include_weather:
+            columns.extend(self.weather_columns)
+        return pd.Index(columns)
@@ -0,0 +1,241 @@
+"""Registry of trained daily demand models, and batch prediction with them
+
+Models are saved with joblib, uncompressed, and loaded with `mmap_mode="r"`, so plain numpy arrays inside them (eg, a
+linear model's coefficients) are memory-mapped rather than read & copied. Objects that rebuild their own buffers when
+unpickled, like scikit-learn's decision trees, are still read into memory. Each saved model sits alongside a small JSON
+file of metadata: the feature columns & `FeatureConfig` it was trained with, a hash of its training data, and the
+trailing demand its lag features need. Loading a model only reads that metadata; the model itself is loaded on first
+use.
+
+    {registry_dir}/{name}/{version}/model.joblib
+    {registry_dir}/{name}/{version}/metadata.json
+"""
+import json
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from functools import cached_property, lru_cache
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from demand_model import features
+from demand_model.features import TARGET, FeatureConfig
+
+DEFAULT_MODEL_NAME = "daily_demand"
+
+_MODEL_FILE_NAME = "model.joblib"
+_METADATA_FILE_NAME = "metadata.json"
+
+
+@dataclass
+class ModelMetadata:
+    """Everything needed to build features for, and describe, a trained model"""
+    name: str
+    version: str
+    trained_at: str
+    """UTC time the model was saved, in ISO-8601 format"""
+    data_version: str
+    """Hash of the feature matrix the model was trained on, see `features.data_version`"""
+    feature_columns: list[str]
+    weather_columns: list[str]
+    """Raw weather feature columns, empty unless `config.include_weather`"""
+    config: FeatureConfig
+    last_demand_date: str
+    """Latest day of demand in the training data"""
+    recent_demand: list[float]
+    """Demand for the `config.history_days` days up to `last_demand_date`, oldest first"""
+
+    def to_json(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_json(cls, json_dict: dict) -> "ModelMetadata":
+        config = json_dict["config"]
+        config = FeatureConfig(**{**config, "demand_lags": tuple(config["demand_lags"]),
+                                  "rolling_windows": tuple(config["rolling_windows"])})
+        return cls(**{**json_dict, "config": config})
+
+
+class TrainedModel:
+    """A model from the registry, which is only loaded from disk when first used"""
+
+    def __init__(self, model_dir: str) -> None:
+        """Create a new TrainedModel. Usually created by `ModelRegistry.load` rather than directly.
+
+        Args:
+            model_dir: Directory the model & its metadata were saved to
+        """
+        self.model_dir = model_dir
+        with open(os.path.join(model_dir, _METADATA_FILE_NAME), "r", encoding="utf-8") as f:
+            self.metadata = ModelMetadata.from_json(json.load(f))
+
+    @cached_property
+    def model(self) -> any:
+        """The trained model, loaded on first access. Any plain numpy arrays in it are memory-mapped read-only."""
+        return joblib.load(os.path.join(self.model_dir, _MODEL_FILE_NAME), mmap_mode="r")
+
+    def predict_daily_demand(self, dates: pd.DatetimeIndex, temperature_forecasts: pd.DataFrame,
+                             recent_demand: pd.Series = None) -> pd.Series:
+        """Predict daily demand for a batch of days and/or weather scenarios, in one call to the model
+
+        Lag & rolling demand features are looked up from `recent_demand`, so every date must be close enough to the
+        last day of known demand that its lags are all known. With the default lags, that's the day after.
+
+        Args:
+            dates: Day to predict for each row. Dates may repeat, eg to score many scenarios for the same day.
+            temperature_forecasts: Weather for each row, aligned with `dates`, with columns as returned by
+                `read_weather_data` (eg, "USC00050848_tmax"). May also have a "tavg" column of mean temperature to use
+                for degree days, rather than the mean of the station columns.
+            recent_demand: (optional) Daily demand, indexed by date, for at least `config.history_days` days before
+                the earliest date. Defaults to the demand at the end of the training data.
+
+        Returns:
+            Predicted demand for each row, indexed by `dates`
+        """
+        metadata = self.metadata
+        config = metadata.config
+        dates = pd.DatetimeIndex(dates).normalize()
+        if len(dates) != len(temperature_forecasts):
+            raise ValueError(f"Got {len(dates)} dates but {len(temperature_forecasts)} rows of temperature forecasts")
+        if recent_demand is None:
+            last_demand_date = pd.Timestamp(metadata.last_demand_date)
+            recent_demand = pd.Series(metadata.recent_demand,
+                                      index=pd.date_range(end=last_demand_date, periods=config.history_days, freq="D"))
+
+        weather = temperature_forecasts.reindex(columns=metadata.weather_columns).to_numpy(dtype=np.float64)
+        if "tavg" in temperature_forecasts:
+            temperature = temperature_forecasts["tavg"].to_numpy(dtype=np.float64)
+        else:
+            temperature = features.mean_temperature(temperature_forecasts).to_numpy()
+
+        columns = features.calendar_features(dates)
+        columns.update(features.window_features(_demand_windows(dates, recent_demand, config.history_days), config))
+        columns.update(features.degree_day_features(temperature, config))
+        if config.include_weather:
+            columns.update(zip(metadata.weather_columns, weather.T))
+
+        features_df = pd.DataFrame(columns, index=dates)[metadata.feature_columns]
+        if features_df.isna().to_numpy().any():
+            missing_dates = features_df.index[features_df.isna().any(axis=1)].unique()
+            raise ValueError(f"Missing features for {len(missing_dates)} dates, starting {missing_dates[0].date()}. "
+                             "Check that recent demand covers their lags, and that forecasts have every weather column.")
+
+        # Only pass column names if the model was fitted with them, otherwise scikit-learn warns
+        model_input = features_df if hasattr(self.model, "feature_names_in_") else features_df.to_numpy()
+        return pd.Series(np.asarray(self.model.predict(model_input), dtype=np.float64), index=dates, name=TARGET)
+
+
+class ModelRegistry:
+    """Directory of trained models, by name & version"""
+
+    def __init__(self, registry_dir: str) -> None:
+        """Create a new ModelRegistry.
+
+        Args:
+            registry_dir: Directory to save models in. Created if it does not exist.
+        """
+        self.registry_dir = registry_dir
+        os.makedirs(registry_dir, exist_ok=True)
+
+    def save(self, model: any, features_df: pd.DataFrame, config: FeatureConfig = FeatureConfig(),
+             name: str = DEFAULT_MODEL_NAME) -> TrainedModel:
+        """Save a trained model, with the metadata needed to predict with it
+
+        Args:
+            model: Trained model, with a scikit-learn style `predict(X)` method
+            features_df: Feature matrix the model was trained on, as returned by `build_features`
+            config: (optional) FeatureConfig the feature matrix was built with
+            name: (optional, default "daily_demand") Name to save the model under
+
+        Returns:
+            The saved model, with its new version
+        """
+        feature_columns = [column for column in features_df.columns if column != TARGET]
+        derived_columns = set(features.CALENDAR_COLUMNS).union(
+            features.window_features(np.full((1, config.history_days + 1), np.nan), config),
+            features.degree_day_features(np.array([np.nan]), config))
+
+        demand = features_df[TARGET].dropna()
+        last_demand_date = demand.index.max()
+        recent_demand = demand.reindex(pd.date_range(end=last_demand_date, periods=config.history_days, freq="D"))
+
+        trained_at = datetime.now(timezone.utc)
+        data_version = features.data_version(features_df, config=config)
+        metadata = ModelMetadata(
+            name=name,
+            version=f"{trained_at:%Y%m%dT%H%M%S%f}-{data_version[:8]}",
+            trained_at=trained_at.isoformat(),
+            data_version=data_version,
+            feature_columns=feature_columns,
+            weather_columns=[column for column in feature_columns if column not in derived_columns],
+            config=config,
+            last_demand_date=last_demand_date.date().isoformat(),
+            recent_demand=recent_demand.tolist(),
+        )
+
+        model_dir = os.path.join(self.registry_dir, name, metadata.version)
+        os.makedirs(model_dir)
+        joblib.dump(model, os.path.join(model_dir, _MODEL_FILE_NAME))
+        with open(os.path.join(model_dir, _METADATA_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(metadata.to_json(), f, indent=2)
+
+        return TrainedModel(model_dir)
+
+    def versions(self, name: str = DEFAULT_MODEL_NAME) -> list[str]:
+        """Saved versions of a model, oldest first"""
+        model_dir = os.path.join(self.registry_dir, name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(version for version in os.listdir(model_dir)
+                      if os.path.exists(os.path.join(model_dir, version, _METADATA_FILE_NAME)))
+
+    def load(self, name: str = DEFAULT_MODEL_NAME, version: str = None) -> TrainedModel:
+        """Load a saved model. Only its metadata is read until the model is used.
+
+        Args:
+            name: (optional, default "daily_demand") Name of the model
+            version: (optional) Version of the model. If None, loads the latest version.
+        """
+        if version is None:
+            versions = self.versions(name)
+            if not versions:
+                raise FileNotFoundError(f"No saved versions of model {name} in {self.registry_dir}")
+            version = versions[-1]
+        return TrainedModel(os.path.join(self.registry_dir, name, version))
+
+
+def predict_daily_demand(dates: pd.DatetimeIndex, temperature_forecasts: pd.DataFrame, registry_dir: str,
+                         name: str = DEFAULT_MODEL_NAME, recent_demand: pd.Series = None) -> pd.Series:
+    """Predict daily demand with the latest saved version of a model. See `TrainedModel.predict_daily_demand`.
+
+    The loaded model is kept between calls, so repeated scheduled runs only pay for loading it once.
+    """
+    return _load_latest(registry_dir, name, tuple(ModelRegistry(registry_dir).versions(name))) \
+        .predict_daily_demand(dates, temperature_forecasts, recent_demand)
+
+
+@lru_cache(maxsize=8)
+def _load_latest(registry_dir: str, name: str, versions: tuple[str, ...]) -> TrainedModel:
+    """Load the latest version of a model. Cached by the versions available, so saving a new version reloads."""
+    if not versions:
+        raise FileNotFoundError(f"No saved versions of model {name} in {registry_dir}")
+    return TrainedModel(os.path.join(registry_dir, name, versions[-1]))
+
+
+def _demand_windows(dates: pd.DatetimeIndex, recent_demand: pd.Series, history_days: int) -> np.ndarray:
+    """Windows of demand for the `history_days` days before each date and the date itself, see `window_features`
+
+    Days outside of `recent_demand` are NaN, including each date itself.
+    """
+    recent_demand = recent_demand.sort_index()
+    first_date = recent_demand.index.min().normalize()
+    demand_dates = pd.date_range(first_date, recent_demand.index.max(), freq="D")
+    demand = recent_demand.reindex(demand_dates).to_numpy(dtype=np.float64)
+
+    # Look up every (date, offset) position at once, with a trailing NaN for positions outside of the known demand
+    padded = np.append(demand, np.nan)
+    positions = (dates - first_date).days.to_numpy()[:, np.newaxis] + np.arange(-history_days, 1)
+    positions[(positions < 0) | (positions >= len(demand))] = len(demand)
+    return padded[positions]
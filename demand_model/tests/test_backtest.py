@@ -0,0 +1,75 @@
+import unittest
+from functools import partial
+
+import numpy as np
+import pandas as pd
+from sklearn.dummy import DummyRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.tree import DecisionTreeRegressor
+
+from demand_model.backtest import run_backtest, walk_forward_folds
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+def linear_features() -> pd.DataFrame:
+    dates = pd.date_range("2018-01-01", "2021-12-31", freq="D", name="date")
+    rng = np.random.default_rng(7)
+    tavg = 10 + 15 * np.sin(2 * np.pi * dates.dayofyear / 365) + rng.normal(0, 2, len(dates))
+    hdd = np.maximum(18 - tavg, 0)
+    cdd = np.maximum(tavg - 18, 0)
+    return pd.DataFrame({"daily_demand": 60000 + 1500 * hdd + 2500 * cdd, "hdd": hdd, "cdd": cdd}, index=dates)
+
+
+class TestWalkForwardFolds(unittest.TestCase):
+
+    def test_folds(self):
+        dates = pd.date_range("2020-01-01", "2020-12-31", freq="D")
+        folds = walk_forward_folds(dates, ["2019-06-01", "2020-03-01", "2020-12-01"], horizon_days=60)
+
+        # No training data before the first cutoff
+        self.assertEqual(2, len(folds))
+        self.assertEqual((0, 60, 60, 120), (folds[0].train_start, folds[0].train_stop, folds[0].test_start, folds[0].test_stop))
+        self.assertEqual(len(dates), folds[1].test_stop)
+
+        (fold,) = walk_forward_folds(dates, ["2020-03-01"], horizon_days=30, train_days=14)
+        self.assertEqual((46, 60, 60, 90), (fold.train_start, fold.train_stop, fold.test_start, fold.test_stop))
+
+
+class TestRunBacktest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.features_df = linear_features()
+        self.models = {
+            "linear": LinearRegression,
+            "mean": DummyRegressor,
+            "tree": partial(DecisionTreeRegressor, max_depth=4, random_state=0),
+        }
+        self.cutoffs = pd.date_range("2019-01-01", "2021-07-01", freq="6MS")
+
+    def test_scores(self):
+        result = run_backtest(self.features_df, self.models, self.cutoffs, horizon_days=180, max_workers=1)
+
+        fold_scores = result.fold_scores()
+        self.assertEqual(3 * len(self.cutoffs), len(fold_scores))
+        self.assertLess(fold_scores.loc["linear", "rmse"].max(), 1e-6)
+
+        # Check one fold against a model trained directly
+        cutoff = self.cutoffs[2]
+        (train_df, test_df) = (self.features_df[:cutoff - pd.Timedelta(days=1)], self.features_df[cutoff:cutoff + pd.Timedelta(days=179)])
+        predicted = DummyRegressor().fit(train_df[["hdd", "cdd"]], train_df["daily_demand"]).predict(test_df[["hdd", "cdd"]])
+        errors = predicted - test_df["daily_demand"]
+        self.assertAlmostEqual(np.sqrt((errors ** 2).mean()), fold_scores.loc[("mean", cutoff), "rmse"])
+        self.assertAlmostEqual((errors / test_df["daily_demand"]).abs().mean(), fold_scores.loc[("mean", cutoff), "mape"])
+
+        season_scores = result.season_scores()
+        self.assertEqual(["autumn", "spring", "summer", "winter"], list(season_scores.loc["mean"].index))
+        self.assertEqual(len(self.cutoffs) * 180, season_scores.loc["tree", "num_days"].sum())
+
+        self.assertEqual(["linear", "tree", "mean"], list(result.summary().index))
+
+    def test_process_pool_matches_in_process(self):
+        in_process = run_backtest(self.features_df, self.models, self.cutoffs, horizon_days=180, max_workers=1)
+        pooled = run_backtest(self.features_df, self.models, self.cutoffs, horizon_days=180, max_workers=2)
+
+        pd.testing.assert_frame_equal(in_process.predictions, pooled.predictions)
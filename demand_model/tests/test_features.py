@@ -0,0 +1,94 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from demand_model import features
+from demand_model.features import FeatureCache, FeatureConfig, build_features
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+def sample_data(num_days: int = 120) -> tuple[pd.Series, pd.DataFrame]:
+    dates = pd.date_range("2021-12-01", periods=num_days, freq="D", name="date")
+    rng = np.random.default_rng(42)
+    demand = pd.Series(60000 + rng.normal(0, 5000, num_days), index=dates, name="daily_demand")
+    weather = pd.DataFrame({
+        "USC00050848_tmax": rng.normal(10, 8, num_days),
+        "USC00050848_tmin": rng.normal(-2, 6, num_days),
+        "USC00053005_tmax": rng.normal(8, 8, num_days),
+        "USC00053005_tmin": rng.normal(-4, 6, num_days),
+    }, index=dates)
+    return (demand, weather)
+
+
+class TestBuildFeatures(unittest.TestCase):
+
+    def setUp(self) -> None:
+        (self.demand, self.weather) = sample_data()
+
+    def test_matches_shifted_columns(self):
+        features_df = build_features(self.demand, self.weather, dropna=False)
+
+        for lag in range(1, 15):
+            np.testing.assert_array_equal(self.demand.shift(lag).to_numpy(), features_df[f"demand_lag_{lag}"].to_numpy())
+        for window in (7, 28):
+            trailing = self.demand.shift(1).rolling(window)
+            np.testing.assert_allclose(trailing.mean().to_numpy(), features_df[f"demand_mean_{window}"].to_numpy())
+            np.testing.assert_allclose(trailing.std().to_numpy(), features_df[f"demand_std_{window}"].to_numpy())
+
+        self.assertEqual(list(self.demand.index.dayofweek), list(features_df["Dayofweek"]))
+        self.assertEqual(list(self.demand.index.isocalendar().week), list(features_df["Week"]))
+
+        tavg = (self.weather.filter(like="_tmax").mean(axis=1) + self.weather.filter(like="_tmin").mean(axis=1)) / 2
+        np.testing.assert_allclose(tavg.to_numpy(), features_df["tavg"].to_numpy())
+        np.testing.assert_allclose(np.maximum(18.0 - tavg, 0).to_numpy(), features_df["hdd"].to_numpy())
+        np.testing.assert_allclose(np.maximum(tavg - 18.0, 0).to_numpy(), features_df["cdd"].to_numpy())
+
+        pd.testing.assert_frame_equal(self.weather, features_df[self.weather.columns], check_freq=False)
+
+    def test_dropna_drops_history(self):
+        features_df = build_features(self.demand, self.weather)
+        self.assertEqual(len(self.demand) - 28, len(features_df))
+        self.assertEqual(self.demand.index[28], features_df.index[0])
+
+    def test_lags_are_whole_days_over_gaps(self):
+        demand = self.demand.drop(self.demand.index[50])
+        features_df = build_features(demand, self.weather, config=FeatureConfig(demand_lags=(1, 2), rolling_windows=()))
+
+        # Only the 2 days lagging onto the missing day, and the missing day itself, are dropped
+        self.assertEqual(len(self.demand) - 2 - 3, len(features_df))
+        self.assertNotIn(self.demand.index[52], features_df.index)
+        self.assertEqual(self.demand.iloc[51], features_df.loc[self.demand.index[53], "demand_lag_2"])
+
+
+class TestFeatureCache(unittest.TestCase):
+
+    def setUp(self) -> None:
+        (self.demand, self.weather) = sample_data()
+
+    def test_builds_once_per_data_version(self):
+        cache = FeatureCache()
+        with mock.patch.object(features, "build_features", wraps=features.build_features) as build:
+            first_df = cache.get_or_build(self.demand, self.weather)
+            second_df = cache.get_or_build(self.demand.copy(), self.weather.copy())
+            self.assertEqual(1, build.call_count)
+            pd.testing.assert_frame_equal(first_df, second_df)
+
+            changed_demand = self.demand.copy()
+            changed_demand.iloc[-1] += 1
+            cache.get_or_build(changed_demand, self.weather)
+            cache.get_or_build(self.demand, self.weather, config=FeatureConfig(rolling_windows=(7,)))
+            self.assertEqual(3, build.call_count)
+
+    def test_persists_to_disk(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first_df = FeatureCache(cache_dir).get_or_build(self.demand, self.weather)
+
+            with mock.patch.object(features, "build_features") as build:
+                second_df = FeatureCache(cache_dir).get_or_build(self.demand, self.weather)
+                build.assert_not_called()
+
+        pd.testing.assert_frame_equal(first_df, second_df, check_freq=False)
@@ -0,0 +1,108 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from demand_model.hourly import (HourlyDemandModel, build_hourly_features, hourly_forecast_temperatures,
+                                 hourly_temperatures_from_daily)
+from noaa_client.noaa_metadata import parse as parse_metadata
+from noaa_client.point_forecast import PointForecast
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+def synthetic_hours(start: str, num_hours: int) -> tuple[pd.Series, pd.Series]:
+    """Hourly temperature, and demand driven by local hour, weekends & temperature, indexed by naive UTC hour"""
+    hours = pd.date_range(start, periods=num_hours, freq="h", name="date")
+    local_hours = hours.tz_localize("UTC").tz_convert("America/Denver")
+    rng = np.random.default_rng(3)
+
+    temperature = 10 + 12 * np.sin(2 * np.pi * (local_hours.dayofyear - 100) / 365) \
+        + 6 * np.sin(2 * np.pi * (local_hours.hour - 9) / 24) + rng.normal(0, 1, num_hours)
+    demand = 3500 + 900 * np.sin(np.pi * local_hours.hour / 24) - 300 * (local_hours.dayofweek >= 5) \
+        + 60 * np.maximum(18 - temperature, 0) + 120 * np.maximum(temperature - 18, 0)
+    return (pd.Series(demand, index=hours, name="demand"), pd.Series(temperature, index=hours, name="temperature"))
+
+
+class TestHourlyFeatures(unittest.TestCase):
+
+    def test_build_hourly_features(self):
+        (demand, temperature) = synthetic_hours("2022-07-01", 24 * 14)
+        features_df = build_hourly_features(temperature, demand)
+
+        # 2022-07-02 06:00 UTC is midnight on a Saturday in Denver
+        row = features_df.loc["2022-07-02 06:00"]
+        self.assertEqual((0, 5, 1), (row["hour"], row["dayofweek"], row["is_weekend"]))
+
+        self.assertTrue(features_df["demand_lag_168"][:168].isna().all())
+        np.testing.assert_array_equal(demand[:-168].to_numpy(), features_df["demand_lag_168"][168:].to_numpy())
+        np.testing.assert_allclose(temperature[:24].mean(), features_df["temperature_mean_24"].iloc[23])
+
+    def test_recent_temperature_seeds_trailing_mean(self):
+        (demand, temperature) = synthetic_hours("2022-07-01", 24 * 14)
+        (history, forecast) = (temperature[:-48], temperature[-48:])
+        expected_mean = build_hourly_features(temperature, demand)["temperature_mean_24"][-48:].to_numpy()
+
+        features_df = build_hourly_features(forecast, recent_temperature=history)
+
+        # The first forecast hours average over observed hours too, exactly as when training on the whole series
+        self.assertEqual(list(forecast.index), list(features_df.index))
+        np.testing.assert_allclose(expected_mean, features_df["temperature_mean_24"].to_numpy())
+        self.assertNotAlmostEqual(expected_mean[0], build_hourly_features(forecast)["temperature_mean_24"].iloc[0])
+
+        # Observed hours that overlap the forecast are ignored
+        features_df = build_hourly_features(forecast, recent_temperature=temperature)
+        np.testing.assert_allclose(expected_mean, features_df["temperature_mean_24"].to_numpy())
+
+    def test_hourly_temperatures_from_daily(self):
+        days = pd.date_range("2023-01-01", periods=3, freq="D", name="date")
+        weather = pd.DataFrame({"A_tmax": [10.0, 12.0, 14.0], "A_tmin": [0.0, 2.0, 4.0],
+                                "B_tmax": [12.0, np.nan, 16.0], "B_tmin": [2.0, 4.0, 6.0]}, index=days)
+
+        temperature = hourly_temperatures_from_daily(weather)
+
+        # Min at 06:00 & max at 15:00 Mountain (UTC-7 in winter), averaged over stations that have the day
+        self.assertEqual(1.0, temperature["2023-01-01 13:00"])
+        self.assertEqual(11.0, temperature["2023-01-01 22:00"])
+        self.assertEqual(12.0, temperature["2023-01-02 22:00"])
+        # Interpolated from the 11.0 max at 22:00 down to the 3.0 min at 13:00 the next day
+        self.assertAlmostEqual(11.0 - 8.0 * 10 / 15, temperature["2023-01-02 08:00"])
+        self.assertEqual(pd.Timestamp("2023-01-03 22:00"), temperature.index[-1])
+
+    def test_hourly_forecast_temperatures(self):
+        periods = [
+            {"number": 1, "name": "", "startTime": "2023-01-01T10:00:00-07:00", "endTime": "2023-01-01T11:00:00-07:00",
+             "isDaytime": True, "temperature": 50, "temperatureUnit": "F"},
+            {"number": 2, "name": "", "startTime": "2023-01-01T11:00:00-07:00", "endTime": "2023-01-01T12:00:00-07:00",
+             "isDaytime": True, "temperature": 32, "temperatureUnit": "F"},
+        ]
+        forecast = PointForecast({"properties": {"periods": periods}}, parse_metadata({}))
+
+        temperature = hourly_forecast_temperatures(forecast)
+
+        self.assertEqual([pd.Timestamp("2023-01-01 17:00"), pd.Timestamp("2023-01-01 18:00")], list(temperature.index))
+        np.testing.assert_allclose([10.0, 0.0], temperature.to_numpy())
+
+
+class TestHourlyDemandModel(unittest.TestCase):
+
+    def test_fit_and_predict(self):
+        # A bit over 90k hours
+        (demand, temperature) = synthetic_hours("2012-01-01", 24 * 3800)
+        (train_end, forecast_hours) = (len(demand) - 156, slice(len(demand) - 156, None))
+
+        model = HourlyDemandModel().fit(demand[:train_end], temperature[:train_end])
+        predicted = model.predict(temperature[forecast_hours], recent_demand=demand[:train_end],
+                                  recent_temperature=temperature[:train_end])
+
+        self.assertEqual(list(temperature.index[forecast_hours]), list(predicted.index))
+        mape = ((predicted - demand[forecast_hours]) / demand[forecast_hours]).abs().mean()
+        self.assertLess(mape, 0.03)
+
+        # Lags are optional at prediction time
+        self.assertEqual(156, model.predict(temperature[forecast_hours]).notna().sum())
+
+    def test_predict_before_fit(self):
+        (_, temperature) = synthetic_hours("2022-01-01", 24)
+        with self.assertRaises(ValueError):
+            HourlyDemandModel().predict(temperature)
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from demand_model.features import FeatureConfig, build_features
+from demand_model.incremental import IncrementalFeatures
+from demand_model.tests.test_features import sample_data
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+class TestIncrementalFeatures(unittest.TestCase):
+
+    def setUp(self) -> None:
+        (self.demand, self.weather) = sample_data()
+        self.expected_df = build_features(self.demand, self.weather, dropna=False)
+
+    def test_append_matches_build_features(self):
+        state = IncrementalFeatures.from_history(self.demand[:60], self.weather[:60])
+
+        for day in self.demand.index[60:]:
+            row = state.append(day, self.demand[day], self.weather.loc[day])
+            pd.testing.assert_series_equal(self.expected_df.loc[day], row, check_dtype=False, check_names=False)
+            self.assertEqual(day, row.name)
+
+        self.assertEqual(self.demand.index[-1], state.last_date)
+
+    def test_features_for_next_day(self):
+        state = IncrementalFeatures.from_history(self.demand[:60], self.weather[:60])
+        next_day = self.demand.index[60]
+
+        row = state.features_for_next_day(self.weather.loc[next_day])
+        expected = self.expected_df.loc[next_day].copy()
+        expected["daily_demand"] = np.nan
+        pd.testing.assert_series_equal(expected, row, check_dtype=False, check_names=False)
+
+        # Didn't change the state
+        self.assertEqual(self.demand.index[59], state.last_date)
+
+    def test_append_over_gap(self):
+        config = FeatureConfig(demand_lags=(1, 2, 3), rolling_windows=(3,))
+        demand = self.demand.drop(self.demand.index[[61, 62]])
+        expected_df = build_features(demand, self.weather, config=config, dropna=False)
+
+        state = IncrementalFeatures.from_history(demand[:60], self.weather[:60], config)
+        for day in demand.index[60:70]:
+            row = state.append(day, demand[day], self.weather.loc[day])
+            pd.testing.assert_series_equal(expected_df.loc[day], row, check_dtype=False, check_names=False)
+
+        with self.assertRaises(ValueError):
+            state.append(demand.index[65], 1.0, {})
+
+    def test_state_independent_of_history(self):
+        dates = pd.date_range("1990-01-01", "2022-12-31", freq="D")
+        demand = pd.Series(np.arange(len(dates), dtype=float), index=dates)
+        history_days = FeatureConfig().history_days
+        weather_row = self.weather.iloc[0].to_dict()
+
+        # Decades of history keep the same state as just the trailing window, so appends cost the same either way
+        long_state = IncrementalFeatures.from_history(demand, self.weather)
+        short_state = IncrementalFeatures.from_history(demand[-history_days:], self.weather)
+        for day in pd.date_range("2023-01-01", periods=100, freq="D"):
+            pd.testing.assert_series_equal(short_state.append(day, 1.0, weather_row), long_state.append(day, 1.0, weather_row))
+
+        self.assertEqual((history_days,), long_state._demand.shape)  # pylint: disable=protected-access
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from demand_model.features import TARGET, FeatureConfig, build_features
+from demand_model.incremental import IncrementalFeatures
+from demand_model.predict import ModelRegistry, predict_daily_demand
+from demand_model.tests.test_features import sample_data
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(self.temp_dir.name)
+
+        (self.demand, self.weather) = sample_data()
+        self.features_df = build_features(self.demand, self.weather)
+        (self.xs, self.y) = (self.features_df.drop(columns=TARGET), self.features_df[TARGET])
+        self.forest = RandomForestRegressor(n_estimators=10, random_state=0).fit(self.xs, self.y)
+
+        # Forecast scenarios for the day after the training data
+        self.next_day = self.demand.index[-1] + pd.Timedelta(days=1)
+        self.scenarios = pd.DataFrame({
+            "USC00050848_tmax": [-5.0, 10.0, 35.0],
+            "USC00050848_tmin": [-15.0, 0.0, 20.0],
+            "USC00053005_tmax": [-6.0, 9.0, 34.0],
+            "USC00053005_tmin": [-16.0, -1.0, 19.0],
+        })
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_save_and_load(self):
+        saved = self.registry.save(self.forest, self.features_df)
+        loaded = self.registry.load()
+
+        self.assertEqual([saved.metadata.version], self.registry.versions())
+        self.assertEqual(saved.metadata, loaded.metadata)
+        self.assertEqual(list(self.weather.columns), loaded.metadata.weather_columns)
+        self.assertEqual(list(self.demand[-28:]), loaded.metadata.recent_demand)
+
+        # The model itself isn't loaded until it's used
+        self.assertNotIn("model", loaded.__dict__)
+        np.testing.assert_array_equal(self.forest.predict(self.xs), loaded.model.predict(self.xs))
+
+        with self.assertRaises(FileNotFoundError):
+            self.registry.load("no_such_model")
+
+    def test_creates_registry_dir(self):
+        registry_dir = os.path.join(self.temp_dir.name, "new", "models")
+        registry = ModelRegistry(registry_dir)
+
+        self.assertTrue(os.path.isdir(registry_dir))
+        self.assertEqual([], registry.versions())
+
+    def test_predict_daily_demand_matches_features(self):
+        self.registry.save(self.forest, self.features_df)
+        dates = pd.DatetimeIndex([self.next_day] * len(self.scenarios))
+
+        predicted = self.registry.load().predict_daily_demand(dates, self.scenarios)
+
+        state = IncrementalFeatures.from_history(self.demand, self.weather)
+        rows = pd.DataFrame([state.features_for_next_day(weather) for (_, weather) in self.scenarios.iterrows()])
+        expected = self.forest.predict(rows.drop(columns=TARGET))
+        np.testing.assert_allclose(expected, predicted.to_numpy())
+        self.assertTrue((predicted.index == self.next_day).all())
+
+    def test_predict_daily_demand_with_recent_demand(self):
+        config = FeatureConfig(demand_lags=(1, 7), rolling_windows=(), include_weather=False)
+        features_df = build_features(self.demand, self.weather, config=config)
+        linear = LinearRegression().fit(features_df.drop(columns=TARGET).to_numpy(), features_df[TARGET].to_numpy())
+        self.registry.save(linear, features_df, config, name="linear")
+
+        # Predict days within the training data, from its own demand
+        dates = self.features_df.index[-10:]
+        weather = self.weather.loc[dates].reset_index(drop=True)
+        predicted = predict_daily_demand(dates, weather, self.temp_dir.name, name="linear", recent_demand=self.demand)
+        np.testing.assert_allclose(linear.predict(features_df.loc[dates].drop(columns=TARGET).to_numpy()), predicted.to_numpy())
+
+        # Too far ahead of the known demand for lag 1
+        with self.assertRaises(ValueError):
+            predict_daily_demand([self.next_day + pd.Timedelta(days=1)], weather[:1], self.temp_dir.name, name="linear")
@@ -1,149 +1,261 @@
-import glob
 import os
-from datetime import date
+from datetime import date, timedelta
 
 import dotenv
 import numpy as np
 import pandas as pd
-import requests
-from json_encoder import json
 
 import eia.eia_client as eia
-import ghcnd.station_observations
-
-
-def download_eia_historical_data(electric_data_dir: str, eia_respondent: str = "PSCO"):
-    """Download historical usage data from the EIA"""
+from eia import cleansing
+import ghcnd.bulk_ingest
+import ghcnd.incremental_refresh
+from ghcnd.station_weighting import StationWeighting
+from datastore.parquet_store import ParquetStore
+
+EIA_RAW_DATASET = "eia_hourly_raw"
+"""ParquetStore dataset of hourly demand as downloaded from the EIA, keyed by respondent"""
+EIA_HOURLY_DATASET = "eia_hourly"
+"""ParquetStore dataset of cleansed hourly demand, keyed by respondent"""
+EIA_DAILY_DATASET = "eia_daily"
+"""ParquetStore dataset of cleansed daily demand totals, keyed by respondent"""
+STAGING_SUFFIX = "_staging"
+"""Suffix of the datasets that data is cleansed into, before it replaces the previously cleansed data"""
+
+
+def download_eia_historical_data(electric_data_dir: str, eia_respondent: str = "PSCO") -> pd.DataFrame:
+    """Download historical usage data from the EIA
+
+    The data is written to the `EIA_RAW_DATASET` dataset of a ParquetStore rooted at `electric_data_dir`.
+    Returns the downloaded data, so that it can be passed straight to `cleanse_eia_data` without re-reading it.
+    """
     start_date = date(2015, 1, 1)
     end_date = date.today()
 
     print("Downloading EIA demand data...")
-    usage_data = eia.get_electric_demand_hourly(start_date, end_date, respondent=eia_respondent)
+    usage_df = eia.get_electric_demand_hourly_frame(start_date, end_date, respondent=eia_respondent)
+
+    print(f"Writing EIA demand data to {electric_data_dir}...")
+    ParquetStore(electric_data_dir).write(EIA_RAW_DATASET, eia_respondent, usage_df)
+
+    print("Completed downloading EIA demand data")
+    return usage_df
+
+
+def download_eia_historical_data_multi(electric_data_dir: str, eia_respondents: list[str]) -> pd.DataFrame:
+    """Download historical usage data from the EIA for many respondents at once, eg for comparing neighbouring BAs
+
+    Writes each respondent's data to the same store as `download_eia_historical_data`.
+    Returns the downloaded data, indexed by (respondent, date).
+    """
+    start_date = date(2015, 1, 1)
+    end_date = date.today()
 
-    if not os.path.exists(electric_data_dir):
-        os.makedirs(electric_data_dir)
+    print(f"Downloading EIA demand data for {', '.join(eia_respondents)}...")
+    usage_df = eia.get_electric_demand_hourly_multi(start_date, end_date, respondents=eia_respondents)
 
-    eia_file = os.path.join(electric_data_dir, f"{eia_respondent}.json")
-    print(f"Writing EIA demand data to {eia_file}...")
-    with open(eia_file, "w", encoding="utf-8") as f:
-        json.dump(usage_data, f, indent=4, allow_nan=True)
+    print(f"Writing EIA demand data to {electric_data_dir}...")
+    store = ParquetStore(electric_data_dir)
+    for (respondent, respondent_df) in usage_df.groupby(level="respondent", observed=True):
+        store.write(EIA_RAW_DATASET, respondent, respondent_df.droplevel("respondent"))
 
     print("Completed downloading EIA demand data")
+    return usage_df
 
 
-# Pylint seems unable to figure out that we're getting back a DataFrame from the reader
-# pylint: disable=no-member
-def cleanse_eia_data(electric_data_dir: str, eia_respondent: str = "PSCO"):
-    """Clean up already-downloaded EIA data and save daily & hourly dataframe files"""
-    print("Cleansing EIA data")
-    eia_file = os.path.join(electric_data_dir, f"{eia_respondent}.json")
-    df: pd.DataFrame = pd.read_json(eia_file, typ="frame", orient="records", convert_dates=["dates"])
-    df.set_index("date", inplace=True)
-
-    # This is a dead-simple criterion, but it works better than what I found before.
-    # See `data_cleansing.ipynb` for how I came up with this
-    good_criterion = df['demand'].map(lambda d: d > 1000 and d < 11000)
-
-    # replace outliers with nan, then interpolate those values
-    df = df.where(good_criterion, np.nan)
-    df.interpolate(inplace=True)
-
-    # Save the cleaned hourly dataframe
-    df_file_path = os.path.join(electric_data_dir, "psco-hourly-dataframe.json")
-    df.to_json(df_file_path)
-
-    # Group and sum into daily totals
-    grouped = df.groupby(lambda x: x.date, sort=False).agg(
-        daily_demand=("demand", np.sum),
-        num_hours_reported=("demand", np.count_nonzero)
-    )
+EIA_SYNC_OVERLAP = timedelta(hours=48)
+"""How far before the latest stored hour to re-request, to pick up any revisions the EIA has made"""
 
-    # Drop days with less than 24 hours of data (usually first & last day of range)
-    grouped = grouped[grouped.num_hours_reported == 24].drop(labels="num_hours_reported", axis=1)
 
-    grouped_file_path = os.path.join(electric_data_dir, "psco-daily-dataframe.json")
-    grouped.to_json(grouped_file_path)
+def sync_eia_historical_data(electric_data_dir: str, eia_respondent: str = "PSCO", overlap: timedelta = EIA_SYNC_OVERLAP,
+                             detectors: list[cleansing.OutlierDetector] = cleansing.DEFAULT_DETECTORS):
+    """Bring previously-downloaded EIA data up to date, only requesting & re-cleansing recent data
 
+    Only data from shortly before the latest stored hour is requested, and upserted into the stored data.
+    Cleansing is then re-run only for the days that were affected. If there is no stored data yet, this falls back to a
+    full download & cleanse.
 
-DATAFRAME_SUFFIX = "-dataframe.json"
+    Args:
+        electric_data_dir: Directory containing the downloaded EIA data
+        eia_respondent: (optional, default "PSCO") the EIA respondent to sync data for
+        overlap: (optional, default 48 hours) how far before the latest stored hour to re-request data from
+        detectors: (optional) Outlier detectors to cleanse with, see `eia.cleansing`
+    """
+    store = ParquetStore(electric_data_dir)
+    latest_hour = store.latest(EIA_RAW_DATASET, eia_respondent)
+    if latest_hour is None or store.latest(EIA_HOURLY_DATASET, eia_respondent) is None:
+        usage_df = download_eia_historical_data(electric_data_dir, eia_respondent)
+        cleanse_eia_data(electric_data_dir, eia_respondent, usage_df, detectors)
+        return
 
+    sync_start = (latest_hour - overlap).to_pydatetime()
 
-def download_ghcnd_historical_data(weather_data_dir: str, weather_station_ids: list[str]):
-    """Download and cleanse historical weather data from GHCND"""
-    ghcnd_base_url = "https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/all"
+    print(f"Syncing EIA demand data from {sync_start}...")
+    new_df = eia.get_electric_demand_hourly_frame(sync_start, date.today(), respondent=eia_respondent)
 
-    print("Downloading historical weather data from GHCN-d...")
+    # Newly-requested values win, since they include any revisions
+    store.upsert(EIA_RAW_DATASET, eia_respondent, new_df)
 
-    if not os.path.exists(weather_data_dir):
-        os.makedirs(weather_data_dir)
+    # Re-cleanse whole days from the first one whose detector windows overlap the new data, with enough data before
+    # them for the detectors and interpolation
+    context = cleansing.detector_context(detectors)
+    affected_start = (pd.Timestamp(sync_start) - context + timedelta(days=1)).normalize()
+    usage_df = store.read(EIA_RAW_DATASET, eia_respondent, start=affected_start - context)
+    cleansed_df = cleansing.cleanse_hourly(usage_df, detectors)[affected_start:]
 
-    for station_id in weather_station_ids:
-        dly_name = f"{station_id}.dly"
-        dly_file_path = os.path.join(weather_data_dir, dly_name)
-        station_url = f"{ghcnd_base_url}/{dly_name}"
+    store.upsert(EIA_HOURLY_DATASET, eia_respondent, cleansed_df)
+    store.upsert(EIA_DAILY_DATASET, eia_respondent, cleansing.daily_totals(cleansed_df))
 
-        print(f"Downloading {station_url} to {dly_file_path}...")
+    print(f"Completed syncing EIA demand data, {len(new_df)} hours requested")
 
-        resp = requests.get(url=station_url, timeout=120)
-        with open(dly_file_path, "w", encoding="utf-8") as f:
-            f.write(resp.text)
 
-        # Cleanse data and write out DataFrame
-        obs = ghcnd.station_observations.parse_from_dly_text(resp.text)
+def cleanse_eia_data(electric_data_dir: str, eia_respondent: str = "PSCO", usage_df: pd.DataFrame = None,
+                     detectors: list[cleansing.OutlierDetector] = cleansing.DEFAULT_DETECTORS):
+    """Clean up already-downloaded EIA data and save daily & hourly DataFrames
 
-        hist_temp_df = pd.DataFrame(obs.observations)
+    The cleansed data is written to the `EIA_HOURLY_DATASET` and `EIA_DAILY_DATASET` datasets, and can be read back
+    with `read_demand_data`.
 
-        hist_temp_df["date"] = pd.to_datetime(hist_temp_df["date"], errors="raise")
-        hist_temp_df.set_index("date", inplace=True)
+    Args:
+        electric_data_dir: Directory containing the downloaded EIA data
+        eia_respondent: (optional, default "PSCO") the EIA respondent to cleanse data for
+        usage_df: (optional) Hourly data as returned by `download_eia_historical_data`. If None, the
+            previously-downloaded data is streamed from the store a year at a time.
+        detectors: (optional) Outlier detectors to cleanse with, see `eia.cleansing`
+    """
+    print("Cleansing EIA data")
+    store = ParquetStore(electric_data_dir)
+    if usage_df is not None:
+        chunks = [usage_df]
+    else:
+        chunks = (
+            store.read(EIA_RAW_DATASET, eia_respondent, start=f"{year}-01-01", end=f"{year}-12-31 23:59:59")
+            for year in store.years(EIA_RAW_DATASET, eia_respondent)
+        )
+
+    # Cleanse into staging datasets, and only replace the previously cleansed data once all of it has been re-cleansed,
+    # so a failure part way through leaves the old data in place rather than a partial year range
+    (hourly_staging, daily_staging) = (f"{EIA_HOURLY_DATASET}{STAGING_SUFFIX}", f"{EIA_DAILY_DATASET}{STAGING_SUFFIX}")
+    store.delete(hourly_staging, eia_respondent)
+    store.delete(daily_staging, eia_respondent)
+    for df in cleansing.cleanse_hourly_chunks(chunks, detectors):
+        store.upsert(hourly_staging, eia_respondent, df)
+        store.upsert(daily_staging, eia_respondent, cleansing.daily_totals(df))
+
+    store.move(hourly_staging, EIA_HOURLY_DATASET, eia_respondent)
+    store.move(daily_staging, EIA_DAILY_DATASET, eia_respondent)
+
+
+def read_demand_data(electric_data_dir: str, eia_respondent: str = "PSCO", hourly: bool = False,
+                     start_date: str = None, end_date: str = None) -> pd.DataFrame:
+    """Read cleansed demand data written by `cleanse_eia_data`, indexed by date
 
-        hist_temp_df["tmax"] = hist_temp_df["tmax"] / 10.0
-        hist_temp_df["tmin"] = hist_temp_df["tmin"] / 10.0
+    Args:
+        electric_data_dir: Directory containing the EIA data
+        eia_respondent: (optional, default "PSCO") the EIA respondent to read data for
+        hourly: (optional) Read hourly data, rather than daily totals
+        start_date: (optional) String suitable for DataFrame indexing. The earliest date of data to return.
+        end_date: (optional) String suitable for DataFrame indexing. The latest date of data to return.
+    """
+    dataset = EIA_HOURLY_DATASET if hourly else EIA_DAILY_DATASET
+    return ParquetStore(electric_data_dir).read(dataset, eia_respondent, start=start_date, end=end_date)
 
-        hist_temp_df = hist_temp_df.interpolate(method="time")
 
-        df_file_path = os.path.join(weather_data_dir, f"{station_id}{DATAFRAME_SUFFIX}")
-        hist_temp_df.to_json(df_file_path, date_unit="ms")
+def download_ghcnd_historical_data(weather_data_dir: str, weather_station_ids: list[str], incremental: bool = False):
+    """Download and cleanse historical weather data from GHCND
+
+    Args:
+        weather_data_dir: Directory to save all the weather data files into
+        weather_station_ids: GHCN-d station IDs to download
+        incremental: (optional) Only download stations that have changed since the last run, and only re-process
+            their newest data. Stations with no existing data are downloaded in full.
+    """
+    if incremental:
+        print(f"Refreshing historical weather data for {len(weather_station_ids)} stations from GHCN-d...")
+        for result in ghcnd.incremental_refresh.refresh_stations(weather_station_ids, weather_data_dir):
+            status = f"parsed {result.num_days_parsed} days" if result.changed else "unchanged"
+            print(f"{result.station_id}: {status}")
+    else:
+        print(f"Downloading historical weather data for {len(weather_station_ids)} stations from GHCN-d...")
+        result = ghcnd.bulk_ingest.ingest_stations(weather_station_ids, weather_data_dir)
+        for timing in result.timings:
+            print(f"{timing.station_id}: downloaded in {timing.download_seconds:.1f}s, "
+                  f"parsed {timing.num_days} days in {timing.parse_seconds:.1f}s")
 
     print("Finished downloading data")
 
 
-def read_weather_data(weather_data_dir: str, station_ids: list[str], earliest_date: str = "2015-01-01") -> pd.DataFrame:
-    """Read and parse weather data from saved JSON dataframes into an in-memory DF
+def read_weather_observations(weather_data_dir: str, station_ids: list[str], earliest_date: str = "2015-01-01",
+                              latest_date: str = None, elements: list[str] = None) -> pd.DataFrame:
+    """Read weather data for many stations at once, indexed by date with (station_id, element) columns
+
+    All stations are read in a single multi-threaded scan of the store, with the date range and elements pushed down so
+    nothing outside them is loaded. The values are then scattered into one pre-allocated array aligned on the union of
+    all stations' dates, with NaN wherever a station has no data for a date.
 
     Args:
         weather_data_dir: Directory containing all the weather data files
-        station_ids: List of file paths to read
-        earliest_date: String suitable for DataFrame indexing. The earliest date of data to return. None for no filtering.
+        station_ids: GHCN-d station IDs to read, in the order their columns should appear
+        earliest_date: (optional) String suitable for DataFrame indexing. The earliest date of data to return. None for no filtering.
+        latest_date: (optional) String suitable for DataFrame indexing. The latest date of data to return. None for no filtering.
+        elements: (optional) Elements to read, eg ["tmax"]. If None, reads all elements.
     """
-    temp_df: pd.DataFrame = None
+    store = ParquetStore(weather_data_dir)
+    missing_station_ids = set(station_ids).difference(store.keys(ghcnd.bulk_ingest.GHCND_DATASET))
+    if missing_station_ids:
+        raise FileNotFoundError(f"No weather data for stations: {', '.join(sorted(missing_station_ids))}")
 
-    # Load up temperature data for each weather station, into their own columns
-    for station_id in station_ids:
-        df_file = os.path.join(weather_data_dir, f"{station_id}{DATAFRAME_SUFFIX}")
-        with open(df_file, "r", encoding="utf-8") as f:
-            # print(f"Importing {df_file}")
-            station_df = pd.read_json(f)
-            station_df.index.rename("date", inplace=True)
+    long_df = store.read_many(ghcnd.bulk_ingest.GHCND_DATASET, station_ids, columns=elements, start=earliest_date, end=latest_date)
 
-            # Apparently Pandas has a hard time reading it's own DataFrames back from JSON format?
-            station_df.index = pd.to_datetime(station_df.index, errors="raise", unit="ms")
+    station_codes = pd.Categorical(long_df.index.get_level_values("key"), categories=station_ids).codes
+    (date_codes, dates) = pd.factorize(long_df.index.get_level_values("date"), sort=True)
 
-            # TODO: This name-mangling seems like a halfassed way to either do a MultiIndex or maybe a tuple-index
-            # Going to leave it for now as I'm not clear what will be easiest when trying to train an ML model
-            col_renames = {col: f"{station_id}_{col}" for col in station_df.columns}
-            station_df.rename(col_renames, axis="columns", inplace=True)
+    values = np.full((len(dates), len(station_ids), len(long_df.columns)), np.nan)
+    values[date_codes, station_codes] = long_df.to_numpy(dtype=np.float64)
 
-            if temp_df is not None:
-                temp_df = pd.merge(left=temp_df, right=station_df, how="outer", left_index=True, right_index=True)
-            else:
-                temp_df = station_df
+    return pd.DataFrame(
+        values.reshape(len(dates), -1),
+        index=pd.DatetimeIndex(dates, name="date"),
+        columns=pd.MultiIndex.from_product([station_ids, long_df.columns], names=["station_id", "element"])
+    )
 
-    if earliest_date:
-        temp_df = temp_df[earliest_date:]
 
+def read_weather_data(weather_data_dir: str, station_ids: list[str], earliest_date: str = "2015-01-01") -> pd.DataFrame:
+    """Read weather data written by `download_ghcnd_historical_data` into an in-memory DF
+
+    Columns are named `{station_id}_{element}`. See `read_weather_observations` for the same data with MultiIndex columns.
+
+    Args:
+        weather_data_dir: Directory containing all the weather data files
+        station_ids: GHCN-d station IDs to read
+        earliest_date: String suitable for DataFrame indexing. The earliest date of data to return. None for no filtering.
+    """
+    temp_df = read_weather_observations(weather_data_dir, station_ids, earliest_date)
+    temp_df.columns = [f"{station_id}_{element}" for (station_id, element) in temp_df.columns]
     return temp_df
 
 
+def read_composite_weather(weather_data_dir: str, weighting: StationWeighting, earliest_date: str = "2015-01-01",
+                           latest_date: str = None) -> pd.DataFrame:
+    """Read load-weighted composite temperatures, rather than a column per station. See `ghcnd.station_weighting`.
+
+    Only the stations the weighting uses are read. Any of them that haven't been downloaded are skipped, and their
+    weight shared with the other stations near the same load centers.
+
+    Args:
+        weather_data_dir: Directory containing all the weather data files
+        weighting: Station weights, eg `StationWeighting(read_stations_file(...))`
+        earliest_date: (optional) String suitable for DataFrame indexing. The earliest date of data to return. None for no filtering.
+        latest_date: (optional) String suitable for DataFrame indexing. The latest date of data to return. None for no filtering.
+
+    Returns:
+        DataFrame indexed by date with composite "tmax", "tmin" & "tavg" columns
+    """
+    downloaded_station_ids = set(ParquetStore(weather_data_dir).keys(ghcnd.bulk_ingest.GHCND_DATASET))
+    station_ids = [station_id for station_id in weighting.station_ids if station_id in downloaded_station_ids]
+    weather_df = read_weather_observations(weather_data_dir, station_ids, earliest_date, latest_date, elements=["tmax", "tmin"])
+    return weighting.composite_weather(weather_df)
+
+
 if __name__ == "__main__":
     HISTORICAL_DATA_DIR = os.path.abspath("./historical_data")
     ELECTRIC_DATA_DIR = os.path.join(HISTORICAL_DATA_DIR, "electric_data")
@@ -162,6 +274,5 @@ if __name__ == "__main__":
 
     dotenv.load_dotenv()
 
-    download_eia_historical_data(ELECTRIC_DATA_DIR, eia_respondent="PSCO")
-    cleanse_eia_data(ELECTRIC_DATA_DIR, eia_respondent="PSCO")
-    download_ghcnd_historical_data(WEATHER_DATA_DIR, WEATHER_STATION_IDS)
+    sync_eia_historical_data(ELECTRIC_DATA_DIR, eia_respondent="PSCO")
+    download_ghcnd_historical_data(WEATHER_DATA_DIR, WEATHER_STATION_IDS, incremental=True)
@@ -0,0 +1,204 @@
+"""Vectorized cleansing of hourly EIA demand data
+
+Outliers are found by one or more detectors, replaced with NaN, and then interpolated over. Every detector works on
+whole arrays at once (rolling windows, group-wise statistics), so cleansing years of hourly data for many respondents
+takes a fraction of a second per respondent-year. See `data_cleansing.ipynb` for how these rules were explored.
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+# Scales a median absolute deviation to be comparable to a standard deviation, for normally distributed data
+_MAD_TO_STD = 1.4826
+
+
+class OutlierDetector(ABC):
+    """Base class for outlier detectors, which flag suspect values in a series of hourly demand"""
+
+    @property
+    def context(self) -> pd.Timedelta:
+        """How much data either side of a value the detector looks at, so chunked cleansing knows how much to overlap"""
+        return pd.Timedelta(0)
+
+    @abstractmethod
+    def detect(self, demand: pd.Series) -> np.ndarray:
+        """Get a boolean array that is True for the values in `demand` that look like outliers
+
+        Args:
+            demand: Hourly demand indexed by a sorted DatetimeIndex, for a single respondent
+        """
+
+
+@dataclass
+class FixedBoundsDetector(OutlierDetector):
+    """Flags values outside of fixed bounds, and missing values
+
+    This is a dead-simple criterion, but it works well for PSCO.
+    """
+    min_demand: float = 1000
+    max_demand: float = 11000
+
+    def detect(self, demand: pd.Series) -> np.ndarray:
+        values = demand.to_numpy()
+        return ~((values > self.min_demand) & (values < self.max_demand))
+
+
+@dataclass
+class RollingIqrDetector(OutlierDetector):
+    """Flags values more than `multiplier` inter-quartile ranges from the median of a centered rolling window"""
+    window: str = "14D"
+    multiplier: float = 3.0
+    min_periods: int = 24
+
+    @property
+    def context(self) -> pd.Timedelta:
+        return pd.Timedelta(self.window)
+
+    def detect(self, demand: pd.Series) -> np.ndarray:
+        rolling = demand.rolling(self.window, center=True, min_periods=self.min_periods)
+        iqr = rolling.quantile(0.75) - rolling.quantile(0.25)
+        return ((demand - rolling.median()).abs() > self.multiplier * iqr).to_numpy()
+
+
+@dataclass
+class RollingMadDetector(OutlierDetector):
+    """Flags values more than `threshold` scaled median absolute deviations from the median of a centered rolling window
+
+    The MAD is itself taken over a rolling window of absolute deviations from the rolling median, which keeps this to two
+    rolling medians rather than a median per window.
+    """
+    window: str = "14D"
+    threshold: float = 5.0
+    min_periods: int = 24
+
+    @property
+    def context(self) -> pd.Timedelta:
+        return pd.Timedelta(self.window)
+
+    def detect(self, demand: pd.Series) -> np.ndarray:
+        abs_deviation = (demand - demand.rolling(self.window, center=True, min_periods=self.min_periods).median()).abs()
+        mad = abs_deviation.rolling(self.window, center=True, min_periods=self.min_periods).median()
+        return (abs_deviation > self.threshold * _MAD_TO_STD * mad).to_numpy()
+
+
+@dataclass
+class SeasonalZScoreDetector(OutlierDetector):
+    """Flags values whose z-score against the same hour of day over the surrounding `window_days` days exceeds `threshold`
+
+    Demand has a strong daily cycle, so comparing each hour to the same hour on nearby days catches values that are
+    plausible overall but wrong for their time of day. Each value is left out of its own mean & standard deviation, so
+    a single large outlier cannot mask itself.
+    """
+    window_days: int = 28
+    threshold: float = 4.0
+    min_periods: int = 7
+
+    @property
+    def context(self) -> pd.Timedelta:
+        return pd.Timedelta(days=self.window_days)
+
+    def detect(self, demand: pd.Series) -> np.ndarray:
+        values = demand.astype(np.float64)
+        rolling = pd.DataFrame({"x": values, "x2": values ** 2}) \
+            .groupby(demand.index.hour) \
+            .rolling(f"{self.window_days}D", center=True, min_periods=self.min_periods)
+        sums = rolling.sum().droplevel(0).reindex(demand.index)
+        counts = rolling.count()["x"].droplevel(0).reindex(demand.index)
+
+        # Leave-one-out mean & variance, from the rolling sums
+        n = counts - 1
+        mean = (sums["x"] - values) / n
+        variance = (sums["x2"] - values ** 2 - n * mean ** 2) / (n - 1)
+        z_score = (values - mean).abs() / np.sqrt(variance.clip(lower=0))
+        return ((z_score > self.threshold) & (n >= self.min_periods)).to_numpy()
+
+
+DEFAULT_DETECTORS: tuple[OutlierDetector, ...] = (FixedBoundsDetector(),)
+
+
+def find_outliers(demand: pd.Series, detectors: Iterable[OutlierDetector] = DEFAULT_DETECTORS) -> np.ndarray:
+    """Get a boolean array that is True where any of the detectors flag a value in `demand`"""
+    outliers = np.zeros(len(demand), dtype=bool)
+    for detector in detectors:
+        outliers |= detector.detect(demand)
+    return outliers
+
+
+def detector_context(detectors: Iterable[OutlierDetector]) -> pd.Timedelta:
+    """How much data either side of a value is needed to cleanse it, including a day to interpolate from"""
+    return max((detector.context for detector in detectors), default=pd.Timedelta(0)) + pd.Timedelta(days=1)
+
+
+def cleanse_hourly(usage_df: pd.DataFrame, detectors: Iterable[OutlierDetector] = DEFAULT_DETECTORS) -> pd.DataFrame:
+    """Replace outliers in hourly demand data with interpolated values
+
+    Args:
+        usage_df: Hourly data with a "demand" column, indexed either by date, or by (respondent, date) as returned by
+            `get_electric_demand_hourly_multi`. Each respondent is cleansed independently.
+        detectors: (optional) Outlier detectors to apply. Defaults to fixed bounds of 1000-11000.
+    """
+    if isinstance(usage_df.index, pd.MultiIndex):
+        return pd.concat(
+            {
+                respondent: cleanse_hourly(respondent_df.droplevel("respondent"), detectors)
+                for (respondent, respondent_df) in usage_df.groupby(level="respondent", observed=True)
+            },
+            names=["respondent"]
+        )
+
+    df = usage_df.copy()
+    df.loc[find_outliers(df["demand"], detectors)] = np.nan
+    df.interpolate(inplace=True)
+    return df
+
+
+def cleanse_hourly_chunks(chunks: Iterable[pd.DataFrame], detectors: Iterable[OutlierDetector] = DEFAULT_DETECTORS) -> Iterator[pd.DataFrame]:
+    """Cleanse hourly demand data a chunk at a time, eg a year at a time from a ParquetStore
+
+    Each chunk is cleansed along with enough of its neighbours to cover the detectors' windows plus a day to interpolate
+    from, so the results match cleansing all the data at once while only holding three chunks in memory.
+
+    Args:
+        chunks: Consecutive chunks of hourly data for a single respondent, each indexed by date
+        detectors: (optional) Outlier detectors to apply. Defaults to fixed bounds of 1000-11000.
+    """
+    detectors = list(detectors)
+    context = detector_context(detectors)
+
+    chunk_iter = (chunk for chunk in chunks if len(chunk))
+    previous = None
+    current = next(chunk_iter, None)
+    while current is not None:
+        following = next(chunk_iter, None)
+        (start, end) = (current.index[0], current.index[-1])
+
+        parts = [current]
+        if previous is not None:
+            parts.insert(0, previous[previous.index >= start - context])
+        if following is not None:
+            parts.append(following[following.index <= end + context])
+
+        yield cleanse_hourly(pd.concat(parts), detectors)[start:end]
+        (previous, current) = (current, following)
+
+
+def daily_totals(hourly_df: pd.DataFrame) -> pd.DataFrame:
+    """Sum cleansed hourly demand into daily totals, dropping days without 24 hours of data
+
+    Args:
+        hourly_df: Hourly data with a "demand" column, indexed either by date or by (respondent, date)
+    """
+    demand = hourly_df["demand"]
+    if isinstance(hourly_df.index, pd.MultiIndex):
+        grouped = demand.groupby([pd.Grouper(level="respondent"), pd.Grouper(level="date", freq="D")], observed=True)
+    else:
+        grouped = demand.resample("D")
+
+    totals = grouped.agg(["sum", "count"])
+
+    # Drop days with less than 24 hours of data (usually first & last day of range)
+    totals = totals[totals["count"] == 24]
+    return totals[["sum"]].rename(columns={"sum": "daily_demand"})
@@ -1,11 +1,17 @@
 """A dead-simple wrapper around the one EIA OpenData endpoint we use"""
 import datetime
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date
+from typing import Union
 
+import numpy as np
+import pandas as pd
 import requests
 from json_encoder.json import json_encoder
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 @dataclass
@@ -31,7 +37,14 @@ def encode_hourlydemand(obj):
     return obj.to_dict()
 
 
-def get_electric_demand_hourly(start: date, end: date = None, respondent: str = "PSCO", results_per_request: int = 5000) -> list[HourlyDemand]:
+EIA_REGION_DATA_URL = "https://api.eia.gov/v2/electricity/rto/region-data/data"
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+"""HTTP status codes that will be retried, with backoff"""
+
+
+def get_electric_demand_hourly(start: date, end: date = None, respondent: str = "PSCO", results_per_request: int = 5000,
+                               max_concurrency: int = 4, max_retries: int = 5) -> list[HourlyDemand]:
     """Get hourly electric demand for a particular date range and respondent.
     This will automatically perform pagination, so it may execute multiple requests under the covers.
     Based on the EIA OpenData API. See the /support/Electricity Production.md file for more documentation of the API
@@ -39,55 +52,165 @@ def get_electric_demand_hourly(start: date, end: date = None, respondent: str =
     Requires an environment variable "EIA_TOKEN" be set with a valid EIA OpenData API token.
 
     Args:
-        start: earliest date of retrieved data
+        start: earliest date of retrieved data. May be a datetime to start partway through a day.
         end: (optional) latest date of retrieved data. If None, then get all available data after `start` date.
         respondent: (optional, default "PSCO") the EIA respondent to retrieve data for
         max_results: (optional, default 5000) maximum number of data points to return per request
+        max_concurrency: (optional, default 4) maximum number of pages to request at once. Use 1 to request pages serially.
+        max_retries: (optional, default 5) maximum number of times to retry a request that was throttled or failed with a 5xx
     """
+    demand_days: list[HourlyDemand] = []
+    for page in _get_pages(start, end, respondent, results_per_request, max_concurrency, max_retries):
+        for row in page:
+            row_date = datetime.datetime.strptime(row["period"], "%Y-%m-%dT%H")
+            demand_days.append(HourlyDemand(date=row_date, demand=row["value"]))
+
+    print(f"Finished requesting EIA data, retrieved {len(demand_days)} data points")
+
+    return demand_days
+
+
+def get_electric_demand_hourly_frame(start: date, end: date = None, respondent: str = "PSCO", results_per_request: int = 5000,
+                                     max_concurrency: int = 4, max_retries: int = 5) -> pd.DataFrame:
+    """Get hourly electric demand as a DataFrame, indexed by hour with a single "demand" column
+
+    This requests the same data as `get_electric_demand_hourly`, but decodes it column-wise. All the periods are parsed
+    in one vectorized call, and no per-row objects are created, which is much faster for multi-year ranges.
+    Demand is a float column, since the EIA occasionally reports null values. These are returned as NaN.
+
+    See `get_electric_demand_hourly` for a description of the arguments.
+    """
+    pages = _get_pages(start, end, respondent, results_per_request, max_concurrency, max_retries)
+    periods = [row["period"] for page in pages for row in page]
+    values = [row["value"] for page in pages for row in page]
+
+    print(f"Finished requesting EIA data, retrieved {len(periods)} data points")
+
+    index = pd.DatetimeIndex(np.array(periods, dtype="datetime64[h]"), name="date")
+    return pd.DataFrame({"demand": np.array(values, dtype=np.float64)}, index=index)
+
+
+def get_electric_demand_hourly_multi(start: date, end: date = None, respondents: list[str] = None, results_per_request: int = 5000,
+                                     max_concurrency: int = 4, max_retries: int = 5) -> pd.DataFrame:
+    """Get hourly electric demand for many respondents (ie, balancing authorities) at once
+
+    All the respondents are requested in a single query, and its pages requested concurrently, so fetching many
+    respondents costs about the same wall-clock time as fetching one. Results are decoded column-wise, the same as
+    `get_electric_demand_hourly_frame`.
+
+    Args:
+        start: earliest date of retrieved data. May be a datetime to start partway through a day.
+        end: (optional) latest date of retrieved data. If None, then get all available data after `start` date.
+        respondents: the EIA respondents to retrieve data for, eg ["PSCO", "WACM", "PNM"]
+        results_per_request: (optional, default 5000) maximum number of data points to return per request
+        max_concurrency: (optional, default 4) maximum number of pages to request at once
+        max_retries: (optional, default 5) maximum number of times to retry a request that was throttled or failed with a 5xx
 
+    Returns:
+        A long-format DataFrame indexed by (respondent, date), with a single "demand" column
+    """
+    if not respondents:
+        raise ValueError("respondents")
+
+    pages = _get_pages(start, end, list(respondents), results_per_request, max_concurrency, max_retries)
+    row_respondents = [row["respondent"] for page in pages for row in page]
+    periods = [row["period"] for page in pages for row in page]
+    values = [row["value"] for page in pages for row in page]
+
+    print(f"Finished requesting EIA data, retrieved {len(periods)} data points for {len(respondents)} respondents")
+
+    index = pd.MultiIndex.from_arrays([
+        pd.Categorical(row_respondents, categories=sorted(respondents)),
+        pd.DatetimeIndex(np.array(periods, dtype="datetime64[h]"))
+    ], names=["respondent", "date"])
+    return pd.DataFrame({"demand": np.array(values, dtype=np.float64)}, index=index)
+
+
+def _get_pages(start: date, end: date, respondents: Union[str, list[str]], results_per_request: int, max_concurrency: int,
+               max_retries: int) -> list[list[dict]]:
+    """Get all pages of data rows for a query, in order by respondent then period
+
+    The first page is requested on its own, since its response tells us the total number of rows. After that all the
+    remaining offsets are known, so they are requested concurrently. A page that comes back with fewer rows than its
+    offset should have is re-requested once, and if the rows still don't add up to the total a ValueError is raised
+    rather than silently returning a gap.
+    """
     api_key = os.environ.get("EIA_TOKEN")
     if not api_key:
         raise ValueError("EIA_TOKEN environment variable not set")
 
-    url = "https://api.eia.gov/v2/electricity/rto/region-data/data"
-
     params = {
         "data[]": "value",
-        "facets[respondent][]": respondent,
+        "facets[respondent][]": respondents,  # A list is sent as a repeated parameter, to request multiple respondents
         "facets[type][]": "D",
         "frequency": "hourly",  # or "local-hourly"
         "api_key": api_key,
-        "start": start,
+        # Sorting keeps pagination stable, since the pages are not necessarily requested in order
+        "sort[0][column]": "respondent",
+        "sort[0][direction]": "asc",
+        "sort[1][column]": "period",
+        "sort[1][direction]": "asc",
+        "start": _format_period(start),
         "offset": 0,
         "length": results_per_request
     }
 
     if end:
-        params["end"] = end
+        params["end"] = _format_period(end)
 
-    demand_days: list[HourlyDemand] = []
-    expected_result_count = 999_999_999
+    with _create_session(max_concurrency, max_retries) as session:
+        (first_page, total) = _get_page(session, params, 0)
+        if not first_page:
+            print("Received no data from EIA, ending iteration")
+            return []
 
-    while len(demand_days) < expected_result_count:
-        print(f"Requesting EIA data from offset {params['offset']}")
-        resp = requests.get(url, params, timeout=120)
-        resp.raise_for_status()
+        # The EIA may return fewer rows than we asked for, so use the actual page size to compute the remaining offsets
+        page_size = len(first_page)
+        offsets = range(page_size, total, page_size)
 
-        json_resp = resp.json()["response"]
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            remaining_pages = list(pool.map(
+                lambda offset: _get_full_page(session, params, offset, min(page_size, total - offset)), offsets))
 
-        data = json_resp["data"]
-        if not data:
-            print("Received no data from EIA, ending iteration")
-            break
+    pages = [first_page] + remaining_pages
+    num_rows = sum(len(page) for page in pages)
+    if num_rows != total:
+        raise ValueError(f"Expected {total} rows from EIA but received {num_rows}")
+    return pages
 
-        for row in data:
-            row_date = datetime.datetime.strptime(row["period"], "%Y-%m-%dT%H")
-            demand_days.append(HourlyDemand(date=row_date, demand=row["value"]))
 
-        # Update pagination
-        expected_result_count = json_resp["total"]
-        params["offset"] = params["offset"] + len(data)
+def _get_page(session: requests.Session, params: dict, offset: int) -> tuple[list[dict], int]:
+    """Get a single page of data rows, along with the total number of rows available"""
+    print(f"Requesting EIA data from offset {offset}")
+    resp = session.get(EIA_REGION_DATA_URL, params={**params, "offset": offset}, timeout=120)
+    resp.raise_for_status()
 
-    print(f"Finished requesting EIA data, retrieved {len(demand_days)} data points")
+    json_resp = resp.json()["response"]
+    return (json_resp["data"], int(json_resp["total"]))
 
-    return demand_days
+
+def _get_full_page(session: requests.Session, params: dict, offset: int, expected_rows: int) -> list[dict]:
+    """Get a single page of data rows, re-requesting it once if it has fewer than `expected_rows` rows"""
+    (page, _) = _get_page(session, params, offset)
+    if len(page) < expected_rows:
+        print(f"Received {len(page)} of {expected_rows} rows from offset {offset}, retrying")
+        (page, _) = _get_page(session, params, offset)
+    return page
+
+
+def _format_period(value: date) -> str:
+    """Format a date or datetime the way the EIA API expects for hourly data"""
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%dT%H")
+    return value.isoformat()
+
+
+def _create_session(pool_size: int, max_retries: int) -> requests.Session:
+    """Create a session with a connection pool large enough for our concurrency, that retries throttled & failed requests"""
+    retry = Retry(total=max_retries, backoff_factor=0.5, status_forcelist=RETRY_STATUS_CODES, allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,86 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from eia.cleansing import (FixedBoundsDetector, OutlierDetector, RollingIqrDetector, RollingMadDetector,
+                           SeasonalZScoreDetector, cleanse_hourly, cleanse_hourly_chunks, daily_totals)
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+class TestCleansing(unittest.TestCase):
+
+    def setUp(self) -> None:
+        # 90 days of demand with a daily cycle and a little noise
+        dates = pd.date_range("2021-11-15", periods=90 * 24, freq="h", name="date")
+        rng = np.random.default_rng(42)
+        demand = 5000 + 1500 * np.sin(2 * np.pi * dates.hour.to_numpy() / 24) + rng.normal(0, 50, len(dates))
+        self.usage_df = pd.DataFrame({"demand": demand}, index=dates)
+
+    def test_fixed_bounds(self):
+        usage_df = self.usage_df.copy()
+        usage_df.iloc[100, 0] = 0
+        usage_df.iloc[200, 0] = 50000
+        usage_df.iloc[300, 0] = np.nan
+
+        outliers = FixedBoundsDetector().detect(usage_df["demand"])
+        self.assertEqual([100, 200, 300], list(np.flatnonzero(outliers)))
+
+    def test_detectors_must_implement_detect(self):
+        with self.assertRaises(TypeError):
+            OutlierDetector()  # pylint: disable=abstract-class-instantiated
+
+    def test_rolling_detectors(self):
+        usage_df = self.usage_df.copy()
+        usage_df.iloc[1000, 0] = 20000
+
+        for detector in [RollingIqrDetector(), RollingMadDetector()]:
+            self.assertEqual([1000], list(np.flatnonzero(detector.detect(usage_df["demand"]))), type(detector).__name__)
+
+    def test_seasonal_z_score(self):
+        # Plausible overall, but far too high for the daily low point
+        usage_df = self.usage_df.copy()
+        daily_low = usage_df.index.get_loc(pd.Timestamp("2021-12-20 18:00"))
+        usage_df.iloc[daily_low, 0] = 6400
+
+        self.assertFalse(FixedBoundsDetector().detect(usage_df["demand"]).any())
+        self.assertEqual([daily_low], list(np.flatnonzero(SeasonalZScoreDetector().detect(usage_df["demand"]))))
+
+    def test_cleanse_interpolates_outliers(self):
+        usage_df = self.usage_df.copy()
+        usage_df.iloc[500, 0] = 0
+
+        df = cleanse_hourly(usage_df)
+        self.assertAlmostEqual((usage_df.iloc[499, 0] + usage_df.iloc[501, 0]) / 2, df.iloc[500, 0])
+        self.assertTrue(df.drop(df.index[500]).equals(usage_df.drop(usage_df.index[500])))
+
+    def test_chunks_match_all_at_once(self):
+        usage_df = self.usage_df.copy()
+        usage_df.iloc[[10, 700, 1500], 0] = 20000
+        detectors = [FixedBoundsDetector(), SeasonalZScoreDetector(window_days=14)]
+
+        chunks = [usage_df.loc[:"2021-12-31"], usage_df.loc["2022-01-01":"2022-01-20"], usage_df.loc["2022-01-21":]]
+        chunked_df = pd.concat(cleanse_hourly_chunks(chunks, detectors))
+
+        pd.testing.assert_frame_equal(cleanse_hourly(usage_df, detectors), chunked_df)
+
+    def test_multiple_respondents(self):
+        usage_df = pd.concat({"PSCO": self.usage_df, "WACM": self.usage_df * 0.5}, names=["respondent"])
+        usage_df.loc[("WACM", pd.Timestamp("2021-12-01 00:00")), "demand"] = 0
+
+        df = cleanse_hourly(usage_df)
+        self.assertEqual(["respondent", "date"], df.index.names)
+        self.assertLess(1000, df.loc[("WACM", pd.Timestamp("2021-12-01 00:00")), "demand"])
+
+        daily_df = daily_totals(df)
+        self.assertEqual(["respondent", "date"], daily_df.index.names)
+        self.assertEqual(180, len(daily_df))
+
+    def test_daily_totals_drops_partial_days(self):
+        daily_df = daily_totals(self.usage_df.iloc[12:-1])
+
+        self.assertEqual(["daily_demand"], list(daily_df.columns))
+        self.assertEqual(pd.Timestamp("2021-11-16"), daily_df.index[0])
+        self.assertEqual(88, len(daily_df))
+        self.assertAlmostEqual(self.usage_df.loc["2021-11-16", "demand"].sum(), daily_df.iloc[0, 0])
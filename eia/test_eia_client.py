@@ -1,8 +1,13 @@
+import json
+import math
 import os
 import unittest
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
 import dotenv
+import responses
 
 import eia.eia_client
 
@@ -23,3 +28,117 @@ class TestEiaClient(unittest.TestCase):
         self.assertEqual(0, daily_demand[0].date.hour)
         self.assertEqual(datetime(2022, 1, 1, 0), daily_demand[0].date)
         self.assertEqual(6427, daily_demand[0].demand)
+
+
+def _mock_eia_rows(num_rows: int, respondent: str = "PSCO") -> list[dict]:
+    start = datetime(2022, 1, 1)
+    return [
+        {"period": (start + timedelta(hours=idx)).strftime("%Y-%m-%dT%H"), "respondent": respondent, "type": "D", "value": 5000 + idx}
+        for idx in range(num_rows)
+    ]
+
+
+class TestEiaClientPagination(unittest.TestCase):
+    """Tests that use a mocked EIA endpoint, so can run without an API key"""
+
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {"EIA_TOKEN": "test-token"})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.rows = _mock_eia_rows(95)
+        self.rows_by_respondent = {"PSCO": self.rows}
+        self.throttled_offsets = set()
+        self.short_offsets = []
+
+    def _paged_response(self, request):
+        query = parse_qs(urlparse(request.url).query)
+        offset = int(query["offset"][0])
+        length = int(query["length"][0])
+        rows = [row for respondent in sorted(query["facets[respondent][]"]) for row in self.rows_by_respondent[respondent]]
+
+        # Throttle the first request for each offset listed in throttled_offsets
+        if offset in self.throttled_offsets:
+            self.throttled_offsets.remove(offset)
+            return (429, {}, "")
+        # Drop the last row of the response for each time an offset is listed in short_offsets
+        if offset in self.short_offsets:
+            self.short_offsets.remove(offset)
+            length -= 1
+
+        body = {"response": {"total": str(len(rows)), "data": rows[offset:offset + length]}}
+        return (200, {}, json.dumps(body))
+
+    @responses.activate
+    def test_concurrent_pagination_in_order(self):
+        responses.add_callback(responses.GET, eia.eia_client.EIA_REGION_DATA_URL, callback=self._paged_response)
+
+        demand = eia.eia_client.get_electric_demand_hourly(date(2022, 1, 1), date(2022, 1, 5), results_per_request=10, max_concurrency=4)
+
+        self.assertEqual(10, len(responses.calls))
+        self.assertEqual(95, len(demand))
+        self.assertEqual([5000 + idx for idx in range(95)], [hourly.demand for hourly in demand])
+        self.assertEqual(datetime(2022, 1, 1, 0), demand[0].date)
+        self.assertEqual(datetime(2022, 1, 4, 22), demand[-1].date)
+
+    @responses.activate
+    def test_retry_throttled_pages(self):
+        responses.add_callback(responses.GET, eia.eia_client.EIA_REGION_DATA_URL, callback=self._paged_response)
+        self.throttled_offsets = {0, 50}
+
+        with mock.patch("time.sleep"):
+            demand = eia.eia_client.get_electric_demand_hourly(date(2022, 1, 1), date(2022, 1, 5), results_per_request=10, max_concurrency=4)
+
+        self.assertEqual(12, len(responses.calls))
+        self.assertEqual([5000 + idx for idx in range(95)], [hourly.demand for hourly in demand])
+
+    @responses.activate
+    def test_retry_short_pages(self):
+        responses.add_callback(responses.GET, eia.eia_client.EIA_REGION_DATA_URL, callback=self._paged_response)
+        self.short_offsets = [30, 80]
+
+        demand = eia.eia_client.get_electric_demand_hourly(date(2022, 1, 1), date(2022, 1, 5), results_per_request=10, max_concurrency=4)
+
+        self.assertEqual(12, len(responses.calls))
+        self.assertEqual([5000 + idx for idx in range(95)], [hourly.demand for hourly in demand])
+
+    @responses.activate
+    def test_persistently_short_page(self):
+        responses.add_callback(responses.GET, eia.eia_client.EIA_REGION_DATA_URL, callback=self._paged_response)
+        self.short_offsets = [30, 30]
+
+        with self.assertRaises(ValueError):
+            eia.eia_client.get_electric_demand_hourly(date(2022, 1, 1), date(2022, 1, 5), results_per_request=10, max_concurrency=4)
+
+    @responses.activate
+    def test_frame_matches_objects(self):
+        responses.add_callback(responses.GET, eia.eia_client.EIA_REGION_DATA_URL, callback=self._paged_response)
+        self.rows[3]["value"] = None
+
+        demand = eia.eia_client.get_electric_demand_hourly(date(2022, 1, 1), date(2022, 1, 5), results_per_request=10)
+        demand_df = eia.eia_client.get_electric_demand_hourly_frame(date(2022, 1, 1), date(2022, 1, 5), results_per_request=10)
+
+        self.assertEqual(["demand"], list(demand_df.columns))
+        self.assertEqual("date", demand_df.index.name)
+        self.assertEqual([hourly.date for hourly in demand], list(demand_df.index.to_pydatetime()))
+        self.assertEqual(5000.0, demand_df["demand"].iloc[0])
+        self.assertTrue(math.isnan(demand_df["demand"].iloc[3]))
+
+    @responses.activate
+    def test_multiple_respondents(self):
+        responses.add_callback(responses.GET, eia.eia_client.EIA_REGION_DATA_URL, callback=self._paged_response)
+        self.rows_by_respondent["WACM"] = _mock_eia_rows(30, respondent="WACM")
+        self.rows_by_respondent["PNM"] = _mock_eia_rows(20, respondent="PNM")
+
+        demand_df = eia.eia_client.get_electric_demand_hourly_multi(
+            date(2022, 1, 1), date(2022, 1, 5), respondents=["WACM", "PSCO", "PNM"], results_per_request=10)
+
+        query = parse_qs(urlparse(responses.calls[0].request.url).query)
+        self.assertEqual(["WACM", "PSCO", "PNM"], query["facets[respondent][]"])
+        self.assertEqual(15, len(responses.calls))
+
+        self.assertEqual(["respondent", "date"], demand_df.index.names)
+        self.assertEqual(145, len(demand_df))
+        self.assertEqual(95, len(demand_df.loc["PSCO"]))
+        self.assertEqual(30, len(demand_df.loc["WACM"]))
+        self.assertEqual(5019.0, demand_df.loc[("PNM", datetime(2022, 1, 1, 19)), "demand"])
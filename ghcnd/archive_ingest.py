@@ -0,0 +1,167 @@
+"""Bulk ingestion of GHCN-d data from the by-year CSV files or the ghcnd_all.tar.gz superset archive
+
+Both formats are read as a stream, without extracting anything to disk, and filtered down to a set of stations.
+This makes loading a whole region one sequential pass over local files, rather than one HTTP request per station.
+See https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/ for the files themselves.
+"""
+import os
+import tarfile
+from typing import Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from datastore.parquet_store import ParquetStore
+from ghcnd.bulk_ingest import GHCND_DATASET, to_cleansed_dataframe
+from ghcnd.station_observations import (ALL_MEASUREMENTS, DEFAULT_MEASUREMENTS, FLAGS_DTYPE, MISSING_VALUE,
+                                        StationObservations, blank_flags, parse_from_dly_bytes)
+
+# Column layout of the by-year files, from https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/by_year/readme-by_year.txt
+BY_YEAR_COLUMNS = ["station_id", "date", "element", "value", "mflag", "qflag", "sflag", "obs_time"]
+
+_INT16_INFO = np.iinfo(np.int16)
+
+
+def read_superset_archive(archive_path: str, station_ids: Iterable[str] = None, desired_measurements: set[str] = DEFAULT_MEASUREMENTS,
+                          exclude_failed_qc: bool = False) -> Iterator[StationObservations]:
+    """Read StationObservations from the ghcnd_all.tar.gz superset archive (or any tar of .dly files)
+
+    The archive is decompressed as a stream, and only the .dly files for the requested stations are read.
+
+    Args:
+        archive_path: Path to the archive
+        station_ids: (optional) Station IDs to read. If None, reads every station in the archive.
+        desired_measurements: (optional) Set of GHCN-d elements to read, or `ALL_MEASUREMENTS`
+        exclude_failed_qc: (optional) Treat values with any QFLAG set (ie, that failed a quality check) as missing
+    """
+    wanted = set(station_ids) if station_ids is not None else None
+
+    with tarfile.open(archive_path, mode="r|*") as tar:
+        for member in tar:
+            (station_id, extension) = os.path.splitext(os.path.basename(member.name))
+            if not member.isfile() or extension != ".dly" or (wanted is not None and station_id not in wanted):
+                continue
+
+            with tar.extractfile(member) as f:
+                yield parse_from_dly_bytes(f.read(), desired_measurements, exclude_failed_qc)
+
+
+def read_by_year_csv(csv_paths: Iterable[str], station_ids: Iterable[str] = None, desired_measurements: set[str] = DEFAULT_MEASUREMENTS,
+                     exclude_failed_qc: bool = False, chunk_size: int = 1_000_000) -> dict[str, StationObservations]:
+    """Read StationObservations from one or more of the by-year CSV files (eg, 2022.csv.gz)
+
+    Each file is read in chunks, and each chunk is filtered down to the requested stations & elements before being kept,
+    so memory use depends on the amount of data kept rather than the size of the files. Values are read as int32 and
+    narrowed to int16 once filtered, and the rare values too large for int16 (eg, some solar radiation readings) are
+    treated as missing rather than wrapping around.
+
+    Args:
+        csv_paths: Paths to the by-year files. Gzipped files are decompressed on the fly.
+        station_ids: (optional) Station IDs to read. If None, reads every station in the files.
+        desired_measurements: (optional) Set of GHCN-d elements to read, or `ALL_MEASUREMENTS`
+        exclude_failed_qc: (optional) Treat values with any QFLAG set (ie, that failed a quality check) as missing
+        chunk_size: (optional) Number of rows to read at once
+    """
+    if isinstance(csv_paths, str):
+        csv_paths = [csv_paths]
+    if station_ids is not None:
+        station_ids = list(station_ids)
+
+    kept_chunks: list[pd.DataFrame] = []
+    for csv_path in csv_paths:
+        chunks = pd.read_csv(
+            csv_path,
+            header=None,
+            names=BY_YEAR_COLUMNS,
+            usecols=BY_YEAR_COLUMNS[:7],
+            dtype={"station_id": str, "date": np.int32, "element": str, "value": np.int32, "mflag": str, "qflag": str, "sflag": str},
+            keep_default_na=False,
+            chunksize=chunk_size
+        )
+        for chunk in chunks:
+            keep = np.ones(len(chunk), dtype=bool)
+            if desired_measurements is not ALL_MEASUREMENTS:
+                keep &= chunk["element"].isin(desired_measurements)
+            if station_ids is not None:
+                keep &= chunk["station_id"].isin(station_ids)
+            kept_chunk = chunk[keep]
+            values = kept_chunk["value"].to_numpy()
+            values = np.where((values < _INT16_INFO.min) | (values > _INT16_INFO.max), MISSING_VALUE, values)
+            kept_chunks.append(kept_chunk.assign(value=values.astype(np.int16)))
+
+    if not kept_chunks:
+        return {}
+
+    rows = pd.concat(kept_chunks, ignore_index=True)
+    return {
+        station_id: _observations_from_rows(station_id, station_rows, desired_measurements, exclude_failed_qc)
+        for (station_id, station_rows) in rows.groupby("station_id", sort=False)
+    }
+
+
+def ingest_archive(archive_paths: Iterable[str], weather_data_dir: str, station_ids: Iterable[str] = None) -> list[str]:
+    """Ingest stations from the superset archive or by-year CSV files, and write out their cleansed DataFrames
+
+    This writes to the same `GHCND_DATASET` store as downloading station files individually.
+    The format is chosen by file extension, .csv/.csv.gz for by-year files and anything else is treated as an archive.
+
+    Args:
+        archive_paths: Paths to either a single superset archive, or one or more by-year CSV files
+        weather_data_dir: Root directory of the ParquetStore to write the DataFrames into
+        station_ids: (optional) Station IDs to ingest, eg from `ghcnd.stations.stations_in_bounding_box`. If None, ingests every station.
+
+    Returns:
+        The IDs of the stations that were written
+    """
+    if isinstance(archive_paths, str):
+        archive_paths = [archive_paths]
+
+    if not os.path.exists(weather_data_dir):
+        os.makedirs(weather_data_dir)
+
+    if all(path.endswith((".csv", ".csv.gz")) for path in archive_paths):
+        station_observations = read_by_year_csv(archive_paths, station_ids).values()
+    elif len(archive_paths) == 1:
+        station_observations = read_superset_archive(archive_paths[0], station_ids)
+    else:
+        raise ValueError("archive_paths must be either by-year CSV files, or a single archive")
+
+    store = ParquetStore(weather_data_dir)
+    written: list[str] = []
+    for obs in station_observations:
+        store.write(GHCND_DATASET, obs.station_id, to_cleansed_dataframe(obs))
+        written.append(obs.station_id)
+
+    return written
+
+
+def _observations_from_rows(station_id: str, rows: pd.DataFrame, desired_measurements: set[str], exclude_failed_qc: bool) -> StationObservations:
+    """Pivot long-format by-year rows for a single station into StationObservations"""
+    ymd = rows["date"].to_numpy()
+    months = ((ymd // 10000 - 1970) * 12 + ymd // 100 % 100 - 1).astype("datetime64[M]")
+    row_day_ordinals = months.astype("datetime64[D]").astype(np.int64) + ymd % 100 - 1
+
+    day_ordinals = np.unique(row_day_ordinals)
+    row_positions = np.searchsorted(day_ordinals, row_day_ordinals)
+
+    row_values = rows["value"].to_numpy(dtype=np.int16)
+    row_flags = np.empty(len(rows), dtype=FLAGS_DTYPE)
+    for flag in FLAGS_DTYPE.names:
+        row_flags[flag] = rows[flag].replace("", " ").to_numpy(dtype="S1")
+    if exclude_failed_qc:
+        row_values = np.where(row_flags["qflag"] != b" ", MISSING_VALUE, row_values).astype(np.int16)
+
+    elements = rows["element"].to_numpy()
+    if desired_measurements is ALL_MEASUREMENTS:
+        desired_measurements = set(elements)
+
+    values: dict[str, np.ndarray] = {}
+    flags: dict[str, np.ndarray] = {}
+    for elem in sorted(desired_measurements):
+        is_elem = elements == elem
+        values[elem] = np.full(day_ordinals.shape, MISSING_VALUE, dtype=np.int16)
+        values[elem][row_positions[is_elem]] = row_values[is_elem]
+        flags[elem] = blank_flags(day_ordinals.shape)
+        flags[elem][row_positions[is_elem]] = row_flags[is_elem]
+
+    return StationObservations(station_id, day_ordinals, values, flags)
@@ -0,0 +1,126 @@
+"""Parallel download & parsing of GHCN-d station files for many stations at once"""
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from datastore.parquet_store import ParquetStore
+from ghcnd.station_observations import MISSING_VALUE, StationObservations, read_from_dly_file
+
+GHCND_BASE_URL = "https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/all"
+
+GHCND_DATASET = "ghcnd_daily"
+"""Name of the ParquetStore dataset that cleansed station DataFrames are written to, keyed by station ID"""
+
+
+@dataclass
+class StationIngestTiming:
+    """How long each stage of ingesting a single station took"""
+    station_id: str
+    download_seconds: float
+    parse_seconds: float
+    num_days: int
+    """Number of days of observations parsed for the station"""
+
+
+@dataclass
+class IngestResult:
+    """Combined results of ingesting many stations"""
+    observations: pd.DataFrame
+    """Cleansed observations for all stations, indexed by date with (station_id, element) columns"""
+    timings: list[StationIngestTiming] = field(default_factory=list)
+    """Per-station timings, in the order that stations were requested"""
+
+
+def to_decimal_dataframe(obs: StationObservations) -> pd.DataFrame:
+    """Convert StationObservations into a DataFrame in decimal degrees, with NaN for missing values"""
+    df = obs.to_pandas()
+    return df.where(df != MISSING_VALUE) / 10.0
+
+
+def to_cleansed_dataframe(obs: StationObservations) -> pd.DataFrame:
+    """Convert StationObservations into a DataFrame in decimal degrees, with gaps interpolated"""
+    return to_decimal_dataframe(obs).interpolate(method="time")
+
+
+def ingest_stations(station_ids: list[str], weather_data_dir: str, base_url: str = GHCND_BASE_URL,
+                    max_download_workers: int = 8, max_parse_workers: int = None) -> IngestResult:
+    """Download, parse and cleanse GHCN-d data for many stations in parallel
+
+    Downloads run on a bounded thread pool, since they are I/O bound. As each download completes its station is handed
+    to a process pool for parsing & cleansing, so wall-clock time scales with the number of cores rather than the
+    number of stations. The raw .dly file for each station is written to `weather_data_dir`, and the cleansed DataFrame
+    to the `GHCND_DATASET` dataset of a ParquetStore rooted there.
+
+    Args:
+        station_ids: GHCN-d station IDs to ingest
+        weather_data_dir: Directory to write the downloaded and cleansed files into
+        base_url: (optional) URL to download `{station_id}.dly` files from
+        max_download_workers: (optional, default 8) Maximum number of concurrent downloads
+        max_parse_workers: (optional) Maximum number of parsing processes. If None, uses the number of CPUs.
+    """
+    if not os.path.exists(weather_data_dir):
+        os.makedirs(weather_data_dir)
+
+    download_seconds: dict[str, float] = {}
+    parse_results: dict[str, tuple[pd.DataFrame, float]] = {}
+
+    with requests.Session() as session, \
+            ThreadPoolExecutor(max_workers=max_download_workers) as download_pool, \
+            ProcessPoolExecutor(max_workers=max_parse_workers) as parse_pool:
+        adapter = HTTPAdapter(pool_maxsize=max_download_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        downloads: dict[Future, str] = {
+            download_pool.submit(_download_station_file, session, base_url, station_id, weather_data_dir): station_id
+            for station_id in station_ids
+        }
+
+        parses: dict[Future, str] = {}
+        for download in as_completed(downloads):
+            (dly_file_path, seconds) = download.result()
+            station_id = downloads[download]
+            download_seconds[station_id] = seconds
+
+            parses[parse_pool.submit(_parse_station_file, station_id, dly_file_path, weather_data_dir)] = station_id
+
+        for parse in as_completed(parses):
+            parse_results[parses[parse]] = parse.result()
+
+    frames = [parse_results[station_id][0] for station_id in station_ids]
+    timings = [
+        StationIngestTiming(station_id, download_seconds[station_id], parse_results[station_id][1], len(parse_results[station_id][0]))
+        for station_id in station_ids
+    ]
+
+    combined = pd.concat(frames, axis=1, keys=station_ids, names=["station_id", "element"])
+    return IngestResult(combined, timings)
+
+
+def _download_station_file(session: requests.Session, base_url: str, station_id: str, weather_data_dir: str) -> tuple[str, float]:
+    """Download a single station's .dly file, returning the file path and how long it took"""
+    start = time.perf_counter()
+
+    dly_file_path = os.path.join(weather_data_dir, f"{station_id}.dly")
+    with session.get(url=f"{base_url}/{station_id}.dly", timeout=120, stream=True) as resp:
+        resp.raise_for_status()
+        with open(dly_file_path, "wb") as f:
+            for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+
+    return (dly_file_path, time.perf_counter() - start)
+
+
+def _parse_station_file(station_id: str, dly_file_path: str, weather_data_dir: str) -> tuple[pd.DataFrame, float]:
+    """Parse & cleanse a single station's .dly file, and write the DataFrame out. Runs in a worker process."""
+    start = time.perf_counter()
+
+    df = to_cleansed_dataframe(read_from_dly_file(dly_file_path))
+    ParquetStore(weather_data_dir).write(GHCND_DATASET, station_id, df)
+
+    return (df, time.perf_counter() - start)
@@ -0,0 +1,147 @@
+"""Incremental refresh of already-downloaded GHCN-d station data
+
+Keeps a manifest of the HTTP validators (ETag/Last-Modified) and the last month parsed for each station, so that
+unchanged files are skipped via conditional requests, and changed files only have their newest records re-parsed.
+"""
+import dataclasses
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from datastore.parquet_store import ParquetStore
+from ghcnd.bulk_ingest import GHCND_BASE_URL, GHCND_DATASET, to_cleansed_dataframe, to_decimal_dataframe
+from ghcnd.station_observations import read_from_dly_file
+
+MANIFEST_FILE_NAME = "ghcnd-manifest.json"
+
+
+@dataclass
+class StationManifestEntry:
+    """What we know about the last refresh of a single station"""
+    etag: str = None
+    """ETag header from the last successful download"""
+    last_modified: str = None
+    """Last-Modified header from the last successful download"""
+    last_parsed_year: int = None
+    last_parsed_month: int = None
+    """Year & month of the newest record that has been parsed into the station's DataFrame"""
+
+
+@dataclass
+class StationRefreshResult:
+    """Outcome of refreshing a single station"""
+    station_id: str
+    changed: bool
+    """False if NOAA reported the file was unchanged, so nothing was downloaded"""
+    num_days_parsed: int
+    """Number of days that were (re-)parsed and merged into the station's DataFrame"""
+
+
+def load_manifest(weather_data_dir: str) -> dict[str, StationManifestEntry]:
+    """Load the refresh manifest from `weather_data_dir`, or an empty one if there is none yet"""
+    manifest_path = os.path.join(weather_data_dir, MANIFEST_FILE_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return {station_id: StationManifestEntry(**entry) for (station_id, entry) in json.load(f).items()}
+
+
+def save_manifest(weather_data_dir: str, manifest: dict[str, StationManifestEntry]):
+    """Save the refresh manifest into `weather_data_dir`"""
+    manifest_path = os.path.join(weather_data_dir, MANIFEST_FILE_NAME)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({station_id: dataclasses.asdict(entry) for (station_id, entry) in manifest.items()}, f, indent=4)
+
+
+def refresh_stations(station_ids: list[str], weather_data_dir: str, base_url: str = GHCND_BASE_URL,
+                     max_workers: int = 8) -> list[StationRefreshResult]:
+    """Refresh downloaded GHCN-d data for many stations, only re-processing what has changed
+
+    Each station's .dly file is requested with If-None-Match/If-Modified-Since, so unchanged files are not re-downloaded.
+    For changed files, only records from the last-parsed month onwards are parsed and upserted into the station's
+    existing data in the `GHCND_DATASET` store. Stations with no existing data get a full download & parse.
+
+    Args:
+        station_ids: GHCN-d station IDs to refresh
+        weather_data_dir: Directory containing the downloaded .dly files, ParquetStore and manifest
+        base_url: (optional) URL to download `{station_id}.dly` files from
+        max_workers: (optional, default 8) Maximum number of stations to refresh concurrently
+    """
+    if not os.path.exists(weather_data_dir):
+        os.makedirs(weather_data_dir)
+
+    manifest = load_manifest(weather_data_dir)
+    store = ParquetStore(weather_data_dir)
+
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+        adapter = HTTPAdapter(pool_maxsize=max_workers)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        refreshed = list(pool.map(
+            lambda station_id: _refresh_station(session, store, base_url, station_id, weather_data_dir, manifest.get(station_id)),
+            station_ids
+        ))
+
+    for (result, entry) in refreshed:
+        manifest[result.station_id] = entry
+    save_manifest(weather_data_dir, manifest)
+
+    return [result for (result, _) in refreshed]
+
+
+def _refresh_station(session: requests.Session, store: ParquetStore, base_url: str, station_id: str, weather_data_dir: str,
+                     entry: StationManifestEntry) -> tuple[StationRefreshResult, StationManifestEntry]:
+    """Refresh a single station, returning the result and the station's new manifest entry"""
+    dly_file_path = os.path.join(weather_data_dir, f"{station_id}.dly")
+    have_existing_data = entry is not None and os.path.exists(dly_file_path) and store.latest(GHCND_DATASET, station_id) is not None
+
+    headers = {}
+    if have_existing_data:
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+
+    resp = session.get(url=f"{base_url}/{station_id}.dly", headers=headers, timeout=120)
+    if resp.status_code == 304:
+        return (StationRefreshResult(station_id, changed=False, num_days_parsed=0), entry)
+    resp.raise_for_status()
+
+    with open(dly_file_path, "wb") as f:
+        f.write(resp.content)
+
+    # The last-parsed month was most likely partial, so we start by re-parsing it
+    start_date = None
+    if have_existing_data and entry.last_parsed_year:
+        start_date = date(entry.last_parsed_year, entry.last_parsed_month, 1)
+
+    obs = read_from_dly_file(dly_file_path, start_date=start_date)
+
+    if start_date:
+        # Interpolate starting from the last existing day, so gaps at the start of the new data get filled.
+        # Only the years covered by the new data are re-written.
+        existing_df = store.read(GHCND_DATASET, station_id, start=date(start_date.year - 1, 1, 1))
+        anchor_df = existing_df[existing_df.index < pd.Timestamp(start_date)].iloc[-1:]
+        tail_df = pd.concat([anchor_df, to_decimal_dataframe(obs)]).interpolate(method="time").iloc[len(anchor_df):]
+        store.upsert(GHCND_DATASET, station_id, tail_df)
+    else:
+        store.write(GHCND_DATASET, station_id, to_cleansed_dataframe(obs))
+
+    updated_entry = StationManifestEntry(etag=resp.headers.get("ETag"), last_modified=resp.headers.get("Last-Modified"))
+    if len(obs):
+        updated_entry.last_parsed_year = obs.end_date.year
+        updated_entry.last_parsed_month = obs.end_date.month
+    elif entry:
+        updated_entry.last_parsed_year = entry.last_parsed_year
+        updated_entry.last_parsed_month = entry.last_parsed_month
+
+    return (StationRefreshResult(station_id, changed=True, num_days_parsed=len(obs)), updated_entry)
+
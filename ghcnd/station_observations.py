@@ -1,8 +1,13 @@
-import calendar
+import mmap
+import os
+from collections.abc import Sequence
 from dataclasses import dataclass
 from datetime import date
 from math import nan as NaN
-from typing import Tuple
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
 
 
 @dataclass
@@ -30,78 +35,270 @@ class StationDayObservations:
         return (self.tmax is NaN and self.tmin is NaN)
 
 
-@dataclass
+MISSING_VALUE = -9999
+"""Special value used by GHCN-d to indicate missing data"""
+
+FLAGS_DTYPE = np.dtype([("mflag", "S1"), ("qflag", "S1"), ("sflag", "S1")])
+"""Per-day measurement, quality and source flags for an element. Blank (b" ") means no flag."""
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
 class StationObservations:
-    """A set of observations for a station"""
-    station_id: str
-    """Station ID"""
-    observations: list[StationDayObservations]
+    """A set of observations for a station, stored column-wise in compact arrays
+
+    Dates are stored as an int32 array of day ordinals (days since 1970-01-01), and each element as an int16 array in
+    the GHCN-d units (eg, tenths-of-a-degree C) with `MISSING_VALUE` for missing data.
+    The MFLAG/QFLAG/SFLAG columns for each element are kept alongside the values in `FLAGS_DTYPE` arrays.
+    `observations` still gives list-like access to StationDayObservations, which are created on demand.
+    """
+    __slots__ = ("station_id", "day_ordinals", "values", "flags")
+
+    def __init__(self, station_id: str, day_ordinals: np.ndarray, values: dict[str, np.ndarray], flags: dict[str, np.ndarray] = None) -> None:
+        """Create a new StationObservations.
+
+        Args:
+            station_id: Station ID
+            day_ordinals: Days since 1970-01-01 for each observation, in date order
+            values: Observation values for each GHCN-d element (eg, "TMAX"), aligned with `day_ordinals`
+            flags: (optional) `FLAGS_DTYPE` flags for each element in `values`. If None, all flags are blank.
+        """
+        self.station_id = station_id
+        self.day_ordinals = np.asarray(day_ordinals, dtype=np.int32)
+        self.values = {elem: np.asarray(elem_values, dtype=np.int16) for (elem, elem_values) in values.items()}
+        if flags is None:
+            flags = {elem: blank_flags(self.day_ordinals.shape) for elem in self.values}
+        self.flags = flags
+
+    def __len__(self) -> int:
+        return len(self.day_ordinals)
+
+    def __repr__(self) -> str:
+        return f"StationObservations(station_id={self.station_id!r}, days={len(self)}, elements={sorted(self.values)})"
+
+    @property
+    def observations(self) -> "StationDayObservationsView":
+        """List-like view of the observations as StationDayObservations"""
+        return StationDayObservationsView(self)
 
     @property
     def start_date(self) -> date:
         """First date of observations"""
-        return self.observations[0].date
+        return date.fromordinal(int(self.day_ordinals[0]) + _EPOCH_ORDINAL)
 
     @property
     def end_date(self) -> date:
         """Last date of observations"""
-        return self.observations[-1].date
+        return date.fromordinal(int(self.day_ordinals[-1]) + _EPOCH_ORDINAL)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Observation dates as datetime64[D]"""
+        return self.day_ordinals.astype("datetime64[D]")
+
+    @property
+    def tmax(self) -> np.ndarray:
+        """Max temperature in tenths-of-a-degree C"""
+        return self._element_values("TMAX")
+
+    @property
+    def tmin(self) -> np.ndarray:
+        """Min temperature in tenths-of-a-degree C"""
+        return self._element_values("TMIN")
+
+    def to_numpy(self) -> dict[str, np.ndarray]:
+        """Get the observations as a dict of NumPy arrays, keyed by element with an additional "date" entry
+
+        The element arrays are returned as-is rather than copied, so should not be modified.
+        """
+        return {"date": self.dates, **self.values}
+
+    def to_pandas(self, include_flags: bool = False) -> pd.DataFrame:
+        """Get the observations as a DataFrame indexed by date, with one int16 column per element
+
+        Column names are the lower-cased element names (eg, "tmax"). Missing values are left as `MISSING_VALUE`.
+        The value columns may share memory with `values` (depending on the pandas version), so should not be modified.
+
+        Args:
+            include_flags: (optional) Also include "{element}_mflag", "{element}_qflag" and "{element}_sflag" columns
+        """
+        columns: dict[str, np.ndarray] = {}
+        for (elem, elem_values) in self.values.items():
+            columns[elem.lower()] = elem_values
+            if include_flags:
+                for flag in FLAGS_DTYPE.names:
+                    columns[f"{elem.lower()}_{flag}"] = self.flags[elem][flag].astype(str)
+
+        index = pd.DatetimeIndex(self.dates, name="date")
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def _element_values(self, element: str) -> np.ndarray:
+        elem_values = self.values.get(element)
+        if elem_values is None:
+            return np.full(self.day_ordinals.shape, MISSING_VALUE, dtype=np.int16)
+        return elem_values
+
+
+class StationDayObservationsView(Sequence):
+    """Read-only, list-like view of a StationObservations as StationDayObservations"""
+    __slots__ = ("_station_obs",)
+
+    def __init__(self, station_obs: StationObservations) -> None:
+        self._station_obs = station_obs
+
+    def __len__(self) -> int:
+        return len(self._station_obs)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        day_ordinal = int(self._station_obs.day_ordinals[idx])
+        return StationDayObservations(
+            date=date.fromordinal(day_ordinal + _EPOCH_ORDINAL),
+            tmax=_to_python_value(self._station_obs.tmax[idx]),
+            tmin=_to_python_value(self._station_obs.tmin[idx])
+        )
+
+
+def blank_flags(shape: Tuple[int, ...]) -> np.ndarray:
+    """Get a `FLAGS_DTYPE` array with all flags blank"""
+    flags = np.empty(shape, dtype=FLAGS_DTYPE)
+    for flag in FLAGS_DTYPE.names:
+        flags[flag] = b" "
+    return flags
+
+
+def _to_python_value(value: np.int16) -> int:
+    return NaN if value == MISSING_VALUE else int(value)
 
 
 DEFAULT_MEASUREMENTS: set[str] = frozenset(["TMAX", "TMIN"])
 
+ALL_MEASUREMENTS: set[str] = None
+"""Pass as `desired_measurements` to read every element present in the file"""
 
-def read_from_dly_file(dly_file_path: str, desired_measurements: set[str] = DEFAULT_MEASUREMENTS) -> StationObservations:
-    """Parse StationObservations from a .dly text file"""
-    with open(dly_file_path, "r", encoding="utf-8") as f:
-        return parse_from_dly_text(f.read(), desired_measurements)
+# Layout of a .dly record, see `_parse_records` for the full description
+RECORD_LENGTH = 269
+_DAYS_PER_RECORD = 31
+_DAY_STRIDE = 8
+_VALUE_WIDTH = 5
+_VALUES_OFFSET = 21
 
 
-def parse_from_dly_text(dly_text: str, desired_measurements: set[str] = DEFAULT_MEASUREMENTS) -> StationObservations:
+def read_from_dly_file(dly_file_path: str, desired_measurements: set[str] = DEFAULT_MEASUREMENTS,
+                       start_date: date = None, end_date: date = None, exclude_failed_qc: bool = False) -> StationObservations:
+    """Parse StationObservations from a .dly text file, optionally limited to a date range
+
+    The file is memory-mapped rather than read into memory. Records for other elements, or for months outside of
+    `start_date`-`end_date`, are skipped based on their raw bytes and never parsed, so pulling a few recent months out
+    of a century-long station history takes roughly constant memory.
+
+    Args:
+        dly_file_path: Path to the .dly file
+        desired_measurements: (optional) Set of GHCN-d elements to read, or `ALL_MEASUREMENTS`
+        start_date: (optional) Earliest date to return. If None, start at the beginning of the file.
+        end_date: (optional) Latest date to return. If None, read through to the end of the file.
+        exclude_failed_qc: (optional) Treat values with any QFLAG set (ie, that failed a quality check) as missing
+    """
+    with open(dly_file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return _parse_records(_records_from_lines([]), desired_measurements, exclude_failed_qc=exclude_failed_qc)
+
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = np.frombuffer(mm, dtype=np.uint8)
+        records = _fixed_width_records(buf)
+        try:
+            if records is not None:
+                # Note that the parsed StationObservations are all new arrays, nothing refers back to the mmap
+                return _parse_records(records, desired_measurements, start_date, end_date, exclude_failed_qc)
+        finally:
+            # Numpy views must be released before the mmap can be closed
+            del records
+            del buf
+            try:
+                mm.close()
+            except BufferError:
+                pass  # An in-flight exception's traceback still refers to a view, the mmap will be closed once it's freed
+
+        # Not fixed-width, so fall back to streaming through the lines while skipping the ones we don't want
+        f.seek(0)
+        records = _records_from_lines(_filter_dly_lines(f, desired_measurements, start_date, end_date))
+        return _parse_records(records, desired_measurements, start_date, end_date, exclude_failed_qc)
+
+
+def parse_from_dly_text(dly_text: str, desired_measurements: set[str] = DEFAULT_MEASUREMENTS, exclude_failed_qc: bool = False) -> StationObservations:
     """Parse StationObservations from a .dly text string
 
     The returned observations will be sorted in date order. Days with no valid observations will be trimmed from the end only.
     There may still be days with no observations in the middle of the date range, as long as there is at least one valid day afterwards.
+
+    Args:
+        dly_text: Contents of a .dly file
+        desired_measurements: (optional) Set of GHCN-d elements to read, or `ALL_MEASUREMENTS`
+        exclude_failed_qc: (optional) Treat values with any QFLAG set (ie, that failed a quality check) as missing
     """
-    observations: dict[date, StationDayObservations] = {}
+    return parse_from_dly_bytes(dly_text.encode("ascii"), desired_measurements, exclude_failed_qc)
 
-    station_id: str = None
 
-    for line in dly_text.splitlines():
-        if not station_id:
-            station_id = line[0:11]
+def parse_from_dly_bytes(dly_bytes: bytes, desired_measurements: set[str] = DEFAULT_MEASUREMENTS, exclude_failed_qc: bool = False) -> StationObservations:
+    """Parse StationObservations from the raw bytes of a .dly file, see `parse_from_dly_text` for details"""
+    records = _fixed_width_records(np.frombuffer(dly_bytes, dtype=np.uint8))
+    if records is None:
+        records = _records_from_lines([line for line in dly_bytes.splitlines() if line])
+    return _parse_records(records, desired_measurements, exclude_failed_qc=exclude_failed_qc)
 
-        (year, month, elem, day_observations_values) = _parse_from_dly_line(line, desired_measurements)
-        if elem not in desired_measurements:
-            continue
 
-        for (day_ord, observation_value) in enumerate(day_observations_values):
-            dt = date(year, month, day_ord + 1)
-            day_obs = observations.get(dt, StationDayObservations(dt, None, None))
+def _fixed_width_records(buf: np.ndarray) -> np.ndarray:
+    """Get a zero-copy 2-D (record, character) uint8 view over the raw bytes of a .dly file
 
-            if elem == "TMAX":
-                day_obs.tmax = observation_value
-            elif elem == "TMIN":
-                day_obs.tmin = observation_value
+    Real .dly files have fixed-width records, so we can view them in-place without splitting lines.
+    Returns None if the buffer does not contain fixed-width records.
+    """
+    newlines = np.flatnonzero(buf[:RECORD_LENGTH + 2] == ord("\n"))
+    stride = int(newlines[0]) + 1 if newlines.size else 0
+    if stride <= RECORD_LENGTH:
+        return None
 
-            observations[day_obs.date] = day_obs
+    (num_records, remainder) = divmod(buf.size, stride)
+    if remainder == RECORD_LENGTH:
+        num_records += 1  # No line break after the last record
+    elif remainder != 0:
+        return None
+    if not np.all(buf[stride - 1::stride] == ord("\n")):
+        return None
 
-    sorted_obs = sorted(observations.values(), key=lambda obs: obs.date)
+    return np.lib.stride_tricks.as_strided(buf, shape=(num_records, RECORD_LENGTH), strides=(stride, 1), writeable=False)
 
-    # Strip fully-empty observations from the end of the list.
-    # This almost always happens because each line is a full month of data, but we're almost always retrieving it
-    # partway through the month, so the remaining days in the current month are null
-    while sorted_obs[-1].is_empty:
-        sorted_obs.pop()
 
-    return StationObservations(station_id, sorted_obs)
+def _records_from_lines(lines: list[bytes]) -> np.ndarray:
+    """Get a 2-D (record, character) uint8 array from .dly lines, padding any short lines with spaces
+
+    Short lines are usually ones with their trailing blank flags stripped, so they're padded with spaces (ie, blank
+    flags) rather than the NUL bytes numpy would pad with, which would read as set flags.
+    """
+    padded = [line.rstrip(b"\r\n").ljust(RECORD_LENGTH) for line in lines]
+    return np.array(padded, dtype=f"S{RECORD_LENGTH}").view(np.uint8).reshape(-1, RECORD_LENGTH)
+
+
+def _filter_dly_lines(lines: Iterable[bytes], desired_measurements: set[str], start_date: date = None, end_date: date = None) -> list[bytes]:
+    """Get the raw .dly lines for the desired elements that overlap the date range, without decoding the others"""
+    desired = {elem.encode("ascii") for elem in desired_measurements} if desired_measurements is not ALL_MEASUREMENTS else None
+    first_month = (start_date.year, start_date.month) if start_date else (0, 0)
+    last_month = (end_date.year, end_date.month) if end_date else (9999, 12)
+
+    return [line for line in lines
+            if (desired is None or line[17:21] in desired) and first_month <= (int(line[11:15]), int(line[15:17])) <= last_month]
 
 
-def _parse_from_dly_line(dly_line: str, desired_measures: set[str]) -> Tuple[int, int, str, list[int]]:
-    """Parse a month of StationDayObervations from a line in a GHCN .dly file
+def _parse_records(records: np.ndarray, desired_measurements: set[str], start_date: date = None, end_date: date = None,
+                   exclude_failed_qc: bool = False) -> StationObservations:
+    """Parse a 2-D (record, character) array of .dly records into StationObservations
 
-    Each line contains a month of data, hence this method returns a list, with one object for each day.
-    Currently we only parse out the temperature min/max
+    All the desired elements and their flags are parsed in a single pass over the records. Values are laid out on a
+    (month, day) grid so that every element lines up with the same date index.
+    Records are filtered by element and month before any values are parsed.
+    Days with no valid observations are trimmed from the end only.
 
     The format for the .dly files can be found in: https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/readme.txt
     Copying from there:
@@ -130,26 +327,89 @@ def _parse_from_dly_line(dly_line: str, desired_measures: set[str]) -> Tuple[int
     SFLAG31    269-269   Character
     ------------------------------
     """
+    station_id = records[0, 0:11].tobytes().decode("ascii") if len(records) else None
+
+    elements = np.ascontiguousarray(records[:, 17:21]).view("S4").ravel()
+    if desired_measurements is ALL_MEASUREMENTS:
+        desired = np.unique(elements)
+    else:
+        desired = np.array(sorted(elem.encode("ascii") for elem in desired_measurements), dtype="S4")
+        is_desired = np.isin(elements, desired)
+        records = records[is_desired]
+        elements = elements[is_desired]
+
+    # Months are numbered from the epoch, so they can be converted straight to datetime64[M]
+    record_months = (_parse_int_fields(records[:, 11:15]) - 1970) * 12 + _parse_int_fields(records[:, 15:17]) - 1
+    if start_date or end_date:
+        in_range = np.ones(record_months.shape, dtype=bool)
+        if start_date:
+            in_range &= record_months >= np.datetime64(start_date, "M").astype(np.int64)
+        if end_date:
+            in_range &= record_months <= np.datetime64(end_date, "M").astype(np.int64)
+        records = records[in_range]
+        elements = elements[in_range]
+        record_months = record_months[in_range]
+
+    months = np.unique(record_months)
+
+    value_starts = _VALUES_OFFSET + _DAY_STRIDE * np.arange(_DAYS_PER_RECORD)
+    value_chars = records[:, value_starts[:, None] + np.arange(_VALUE_WIDTH)]
+    record_values = _parse_int_fields(value_chars).astype(np.int16)
+
+    # Flags are the three single characters following each value
+    record_flags = np.empty(record_values.shape, dtype=FLAGS_DTYPE)
+    for (flag_offset, flag) in enumerate(FLAGS_DTYPE.names):
+        record_flags[flag] = records[:, value_starts + _VALUE_WIDTH + flag_offset].view("S1")
+    if exclude_failed_qc:
+        record_values[record_flags["qflag"] != b" "] = MISSING_VALUE
+
+    month_starts = months.astype("datetime64[M]")
+    day_grid = month_starts.astype("datetime64[D]")[:, None] + np.arange(_DAYS_PER_RECORD)
+    valid_days = day_grid < (month_starts + 1).astype("datetime64[D]")[:, None]
+    if start_date:
+        valid_days &= day_grid >= np.datetime64(start_date, "D")
+    if end_date:
+        valid_days &= day_grid <= np.datetime64(end_date, "D")
+
+    record_rows = np.searchsorted(months, record_months)
+    values: dict[str, np.ndarray] = {}
+    flags: dict[str, np.ndarray] = {}
+    for elem in desired:
+        is_elem = elements == elem
+        value_grid = np.full(day_grid.shape, MISSING_VALUE, dtype=np.int16)
+        value_grid[record_rows[is_elem]] = record_values[is_elem]
+        flag_grid = blank_flags(day_grid.shape)
+        flag_grid[record_rows[is_elem]] = record_flags[is_elem]
+
+        values[elem.decode("ascii")] = value_grid[valid_days]
+        flags[elem.decode("ascii")] = flag_grid[valid_days]
+
+    dates = day_grid[valid_days]
+
+    # Strip fully-empty days from the end.
+    # This almost always happens because each line is a full month of data, but we're almost always retrieving it
+    # partway through the month, so the remaining days in the current month are null
+    has_value = np.zeros(dates.shape, dtype=bool)
+    for elem_values in values.values():
+        has_value |= elem_values != MISSING_VALUE
+    end = int(np.flatnonzero(has_value)[-1]) + 1 if has_value.any() else 0
 
-    element = dly_line[17:21]
-    if element not in desired_measures:
-        # We don't care about this measurement
-        return (None, None, element, None)
+    day_ordinals = dates[:end].astype(np.int32)
+    return StationObservations(station_id, day_ordinals,
+                               {elem: elem_values[:end] for (elem, elem_values) in values.items()},
+                               {elem: elem_flags[:end] for (elem, elem_flags) in flags.items()})
 
-    year = int(dly_line[11:15])
-    month = int(dly_line[15:17])
 
-    (_, last_day_of_month) = calendar.monthrange(year, month)
+def _parse_int_fields(chars: np.ndarray) -> np.ndarray:
+    """Vectorized equivalent of `int()` over fixed-width, right-justified ASCII integer fields
 
-    measurements: list[int] = list()
-    for day_idx in range(0, last_day_of_month):
-        start_idx = (day_idx * 8) + 21
+    The last axis of `chars` holds the characters of each field. Blank fields parse as zero.
+    """
+    is_digit = (chars >= ord("0")) & (chars <= ord("9"))
+    digits = chars.astype(np.int32) - ord("0")
 
-        # Extract measurement, note we're skipping the flags
-        raw_measurement = dly_line[start_idx:start_idx + 5]
-        parsed_measure = int(raw_measurement)
-        if parsed_measure == -9999:  # Special value indicating missing data
-            parsed_measure = NaN
-        measurements.append(parsed_measure)
+    parsed = np.zeros(chars.shape[:-1], dtype=np.int32)
+    for idx in range(chars.shape[-1]):
+        parsed = np.where(is_digit[..., idx], parsed * 10 + digits[..., idx], parsed)
 
-    return (year, month, element, measurements)
+    return np.where((chars == ord("-")).any(axis=-1), -parsed, parsed)
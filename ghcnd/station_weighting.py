@@ -0,0 +1,150 @@
+"""Load-weighted composite temperatures from many GHCN-d stations
+
+Rather than giving models a temperature column per station, each station is weighted by how much load is near it:
+every load center (eg, a metro area, weighted by population) takes an inverse-distance weighted mean of its nearest
+stations, and the composite is the load-weighted mean of the centers. Stations far from any load (eg, Alamosa) barely
+count, and adding more stations doesn't widen the feature matrix.
+
+The nearest stations are found once, with a KD-tree over station coordinates, and the weights are kept as a
+(station x load center) matrix. Composites for every day are then two matrix products, with each center's weights
+renormalized over the stations that have data that day, so a station's gap falls back to its neighbours.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0
+
+
+@dataclass(frozen=True)
+class LoadCenter:
+    """A concentration of electric load, at a point"""
+    name: str
+    latitude: float
+    longitude: float
+    weight: float
+    """Relative share of load, eg population"""
+
+
+PSCO_LOAD_CENTERS = [
+    LoadCenter("Denver", 39.7392, -104.9903, 2_960_000),
+    LoadCenter("Fort Collins", 40.5853, -105.0844, 360_000),
+    LoadCenter("Boulder", 40.0150, -105.2705, 330_000),
+    LoadCenter("Greeley", 40.4233, -104.7091, 330_000),
+    LoadCenter("Grand Junction", 39.0639, -108.5506, 155_000),
+    LoadCenter("Alamosa", 37.4694, -105.8700, 16_000),
+]
+"""Major population centers in the PSCO territory, weighted by approximate metro area population"""
+
+
+class StationWeighting:
+    """Precomputed weights of GHCN-d stations for a set of load centers"""
+
+    def __init__(self, stations: pd.DataFrame, load_centers: list[LoadCenter] = None, stations_per_center: int = 4,
+                 power: float = 2.0, max_distance_km: float = 150.0) -> None:
+        """Create a new StationWeighting.
+
+        Args:
+            stations: Candidate stations, as returned by `ghcnd.stations.read_stations_file`, indexed by station ID
+            load_centers: (optional) Load centers to weight stations by. Defaults to `PSCO_LOAD_CENTERS`.
+            stations_per_center: (optional, default 4) Number of nearest stations each center averages. Extra stations
+                beyond the nearest are what keep a center covered when its nearest station has a gap.
+            power: (optional, default 2) Inverse-distance weighting power. Higher favors the nearest station more.
+            max_distance_km: (optional, default 150km) Ignore stations further than this from a center
+        """
+        self.load_centers = list(load_centers if load_centers is not None else PSCO_LOAD_CENTERS)
+        self.power = power
+        self._all_stations = stations
+        self._tree = cKDTree(_unit_vectors(stations["latitude"].to_numpy(), stations["longitude"].to_numpy()))
+
+        num_neighbours = min(stations_per_center, len(stations))
+        center_coords = _unit_vectors(np.array([center.latitude for center in self.load_centers]),
+                                      np.array([center.longitude for center in self.load_centers]))
+        (chord_distances, positions) = self._tree.query(center_coords, k=num_neighbours)
+        (distances_km, positions) = (_chord_to_km(chord_distances).reshape(len(self.load_centers), -1),
+                                     positions.reshape(len(self.load_centers), -1))
+
+        # Only keep the stations that some center uses, as columns of a (station x center) weight matrix
+        in_range = distances_km <= max_distance_km
+        (used_positions, station_codes) = np.unique(positions[in_range], return_inverse=True)
+        self.station_ids: list[str] = list(stations.index[used_positions])
+        """Stations used by at least one center. Only these need to be read to compute composites."""
+
+        self._weights = np.zeros((len(used_positions), len(self.load_centers)))
+        center_codes = np.nonzero(in_range)[0]
+        # Clamp distances so a station sat right on a center doesn't get an infinite weight
+        self._weights[station_codes, center_codes] = 1.0 / np.maximum(distances_km[in_range], 1.0) ** power
+        self._center_weights = np.array([center.weight for center in self.load_centers], dtype=np.float64)
+
+    def nearest_stations(self, latitude: float, longitude: float, k: int = 5) -> pd.DataFrame:
+        """Get the `k` nearest of all the candidate stations to a point, nearest first, with a "distance_km" column"""
+        (chord_distances, positions) = self._tree.query(_unit_vectors(np.array([latitude]), np.array([longitude])),
+                                                        k=min(k, len(self._all_stations)))
+        nearest = self._all_stations.iloc[np.atleast_1d(positions.squeeze())].copy()
+        nearest["distance_km"] = _chord_to_km(np.atleast_1d(chord_distances.squeeze()))
+        return nearest
+
+    def station_weights(self) -> pd.Series:
+        """Overall weight of each station in the composite, when every station has data. Sums to 1."""
+        center_totals = self._weights.sum(axis=0)
+        covered = center_totals > 0
+        weights = (self._weights[:, covered] / center_totals[covered]) @ self._center_weights[covered]
+        return pd.Series(weights / weights.sum(), index=pd.Index(self.station_ids, name="station_id"), name="weight")
+
+    def composite(self, values: pd.DataFrame) -> pd.Series:
+        """Load-weighted composite of a single element across stations, for every row
+
+        Args:
+            values: Rows of observations (eg, one per day) with a column per station ID. Stations that are missing a
+                row, or missing from the columns entirely, have their weight shared among the other stations near
+                the same centers. Columns for stations not in `station_ids` are ignored.
+
+        Returns:
+            Composite value for each row, NaN where no center has any station with data
+        """
+        index = values.index
+        values = values.reindex(columns=self.station_ids).to_numpy(dtype=np.float64)
+        has_value = ~np.isnan(values)
+
+        # (rows x stations) @ (stations x centers): each center's weighted sum, and its total weight with data
+        center_sums = np.where(has_value, values, 0.0) @ self._weights
+        center_totals = has_value.astype(np.float64) @ self._weights
+
+        covered = center_totals > 0
+        with np.errstate(invalid="ignore", divide="ignore"):
+            center_means = np.where(covered, center_sums / center_totals, 0.0)
+            composite = (center_means @ self._center_weights) / (covered.astype(np.float64) @ self._center_weights)
+
+        return pd.Series(composite, index=index, name="composite")
+
+    def composite_weather(self, weather: pd.DataFrame, elements: tuple[str, ...] = ("tmax", "tmin")) -> pd.DataFrame:
+        """Load-weighted composites of several elements, plus their mean temperature
+
+        Args:
+            weather: Daily weather with (station_id, element) columns, as returned by `read_weather_observations`
+            elements: (optional, default tmax & tmin) Elements to composite
+
+        Returns:
+            DataFrame indexed like `weather` with a column per element, and a "tavg" column of the midpoint of tmax &
+            tmin when both are included. "tavg" can be passed as the `temperature` to `build_features`.
+        """
+        composites = pd.DataFrame({
+            element: self.composite(weather.xs(element, axis=1, level="element")).to_numpy() for element in elements
+        }, index=weather.index)
+        if "tmax" in composites and "tmin" in composites:
+            composites["tavg"] = (composites["tmax"] + composites["tmin"]) / 2
+        return composites
+
+
+def _unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Convert lat/longs in degrees to 3D points on the unit sphere, so that straight-line distances rank like
+    great-circle ones"""
+    (lat, lon) = (np.radians(latitudes), np.radians(longitudes))
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _chord_to_km(chord_distances: np.ndarray) -> np.ndarray:
+    """Convert straight-line distances between points on the unit sphere to great-circle distances in km"""
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord_distances / 2, 0.0, 1.0))
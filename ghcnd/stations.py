@@ -0,0 +1,61 @@
+"""Parsing for the GHCN-d station metadata file, ghcnd-stations.txt"""
+from dataclasses import dataclass
+
+import pandas as pd
+
+GHCND_STATIONS_URL = "https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/ghcnd-stations.txt"
+
+# Column layout from https://www1.ncdc.noaa.gov/pub/data/ghcn/daily/readme.txt
+# ------------------------------
+# Variable   Columns   Type
+# ------------------------------
+# ID            1-11   Character
+# LATITUDE     13-20   Real
+# LONGITUDE    22-30   Real
+# ELEVATION    32-37   Real
+# STATE        39-40   Character
+# NAME         42-71   Character
+# GSN FLAG     73-75   Character
+# HCN/CRN FLAG 77-79   Character
+# WMO ID       81-85   Character
+# ------------------------------
+_STATION_COLUMNS = {
+    "station_id": (0, 11),
+    "latitude": (12, 20),
+    "longitude": (21, 30),
+    "elevation": (31, 37),
+    "state": (38, 40),
+    "name": (41, 71),
+}
+
+
+@dataclass
+class BoundingBox:
+    """A simple lat/long bounding box, in decimal degrees"""
+    min_latitude: float
+    min_longitude: float
+    max_latitude: float
+    max_longitude: float
+
+
+def read_stations_file(stations_file_path: str) -> pd.DataFrame:
+    """Read ghcnd-stations.txt into a DataFrame indexed by station ID
+
+    Columns are latitude, longitude, elevation (meters), state and name.
+    """
+    df = pd.read_fwf(
+        stations_file_path,
+        colspecs=list(_STATION_COLUMNS.values()),
+        names=list(_STATION_COLUMNS.keys()),
+        dtype={"station_id": str, "state": str, "name": str},
+        keep_default_na=False,
+        header=None
+    )
+    return df.set_index("station_id")
+
+
+def stations_in_bounding_box(stations: pd.DataFrame, bounding_box: BoundingBox) -> pd.DataFrame:
+    """Filter a DataFrame from `read_stations_file` down to the stations within a bounding box"""
+    in_box = stations["latitude"].between(bounding_box.min_latitude, bounding_box.max_latitude) \
+        & stations["longitude"].between(bounding_box.min_longitude, bounding_box.max_longitude)
+    return stations[in_box]
@@ -0,0 +1,113 @@
+import gzip
+import io
+import os
+import tarfile
+import tempfile
+import unittest
+from datetime import date
+
+import numpy as np
+
+from datastore.parquet_store import ParquetStore
+from ghcnd.archive_ingest import ingest_archive, read_by_year_csv, read_superset_archive
+from ghcnd.bulk_ingest import GHCND_DATASET
+from ghcnd.station_observations import ALL_MEASUREMENTS, MISSING_VALUE, read_from_dly_file
+from ghcnd.stations import BoundingBox, read_stations_file, stations_in_bounding_box
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+
+
+def _dly_to_by_year_rows(dly_text: str) -> list[str]:
+    """Convert .dly text into the equivalent by-year CSV rows, skipping missing values like the real files do"""
+    rows = []
+    for line in dly_text.splitlines():
+        for day in range(31):
+            start = 21 + day * 8
+            value = int(line[start:start + 5])
+            if value == MISSING_VALUE:
+                continue
+            (mflag, qflag, sflag) = (line[start + 5].strip(), line[start + 6].strip(), line[start + 7].strip())
+            rows.append(f"{line[0:11]},{line[11:17]}{day + 1:02},{line[17:21]},{value},{mflag},{qflag},{sflag},")
+    return rows
+
+
+class TestArchiveIngest(unittest.TestCase):
+
+    def setUp(self) -> None:
+        with open(os.path.join(TEST_DATA_DIR, "test_daily.dly"), "r", encoding="utf-8") as f:
+            self.dly_text = f.read()
+        self.expected = read_from_dly_file(os.path.join(TEST_DATA_DIR, "test_daily.dly"))
+        self.temp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _write_archive(self) -> str:
+        archive_path = os.path.join(self.temp_dir.name, "ghcnd_all.tar.gz")
+        with tarfile.open(archive_path, "w:gz") as tar:
+            for station_id in ["USC00050848", "USC00053005", "USW00094728"]:
+                data = self.dly_text.replace("USC00050848", station_id).encode("ascii")
+                member = tarfile.TarInfo(f"ghcnd_all/{station_id}.dly")
+                member.size = len(data)
+                tar.addfile(member, io.BytesIO(data))
+        return archive_path
+
+    def _write_by_year_csv(self) -> str:
+        csv_path = os.path.join(self.temp_dir.name, "2022.csv.gz")
+        rows = _dly_to_by_year_rows(self.dly_text) + _dly_to_by_year_rows(self.dly_text.replace("USC00050848", "USW00094728"))
+        with gzip.open(csv_path, "wt", encoding="ascii") as f:
+            f.write("\n".join(rows) + "\n")
+        return csv_path
+
+    def test_read_superset_archive(self):
+        station_obs = list(read_superset_archive(self._write_archive(), station_ids=["USC00050848", "USC00053005"]))
+
+        self.assertEqual(["USC00050848", "USC00053005"], [obs.station_id for obs in station_obs])
+        np.testing.assert_array_equal(self.expected.day_ordinals, station_obs[1].day_ordinals)
+        np.testing.assert_array_equal(self.expected.tmax, station_obs[1].tmax)
+
+    def test_read_by_year_csv(self):
+        station_obs = read_by_year_csv(self._write_by_year_csv(), station_ids=["USC00050848"])
+
+        self.assertEqual(["USC00050848"], list(station_obs))
+        obs = station_obs["USC00050848"]
+        self.assertEqual(date(2022, 8, 1), obs.start_date)
+        self.assertEqual(date(2022, 10, 16), obs.end_date)
+
+        # Days that are missing from the by-year file entirely are not included
+        expected_present = (self.expected.tmax != MISSING_VALUE) | (self.expected.tmin != MISSING_VALUE)
+        np.testing.assert_array_equal(self.expected.day_ordinals[expected_present], obs.day_ordinals)
+        np.testing.assert_array_equal(self.expected.tmax[expected_present], obs.tmax)
+        np.testing.assert_array_equal(self.expected.tmin[expected_present], obs.tmin)
+        self.assertEqual(b"7", obs.flags["TMAX"]["sflag"][0])
+
+    def test_read_by_year_csv_wide_values(self):
+        csv_path = os.path.join(self.temp_dir.name, "2022.csv")
+        with open(csv_path, "w", encoding="ascii") as f:
+            f.write("USC00050848,20220801,TMAX,339,,,7,\n"
+                    "USC00050848,20220801,DASF,40000,,,7,\n"  # Too large for int16, but not an element we keep
+                    "USC00050848,20220802,TMAX,300,,,7,\n")
+
+        obs = read_by_year_csv(csv_path, chunk_size=2)["USC00050848"]
+        self.assertEqual([339, 300], list(obs.tmax))
+        self.assertEqual(np.int16, obs.tmax.dtype)
+
+        # Kept values that don't fit are missing, rather than wrapping around to negative values
+        obs = read_by_year_csv(csv_path, desired_measurements=ALL_MEASUREMENTS, chunk_size=2)["USC00050848"]
+        self.assertEqual([MISSING_VALUE, MISSING_VALUE], list(obs.values["DASF"]))
+
+    def test_ingest_archive_bounding_box(self):
+        stations = read_stations_file(os.path.join(TEST_DATA_DIR, "test_stations.txt"))
+        front_range = stations_in_bounding_box(stations, BoundingBox(39.0, -106.0, 41.0, -104.0))
+        self.assertNotIn("USW00094728", front_range.index)
+        self.assertNotIn("USW00023066", front_range.index)
+
+        weather_data_dir = os.path.join(self.temp_dir.name, "weather")
+        written = ingest_archive(self._write_archive(), weather_data_dir, station_ids=front_range.index)
+
+        self.assertEqual(["USC00050848", "USC00053005"], written)
+        df = ParquetStore(weather_data_dir).read(GHCND_DATASET, "USC00053005")
+        self.assertEqual(77, len(df))
+        self.assertEqual(["tmax", "tmin"], list(df.columns))
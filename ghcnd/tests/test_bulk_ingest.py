@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+import responses
+
+from datastore.parquet_store import ParquetStore
+from ghcnd.bulk_ingest import GHCND_BASE_URL, GHCND_DATASET, ingest_stations
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+class TestBulkIngest(unittest.TestCase):
+
+    @responses.activate
+    def test_ingest_stations(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        with open(filepath, "r", encoding="utf-8") as f:
+            dly_text = f.read()
+
+        station_ids = ["USC00050848", "USC00053005"]
+        for station_id in station_ids:
+            responses.get(f"{GHCND_BASE_URL}/{station_id}.dly", body=dly_text.replace("USC00050848", station_id))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            result = ingest_stations(station_ids, temp_dir, max_download_workers=2, max_parse_workers=2)
+
+            for station_id in station_ids:
+                self.assertTrue(os.path.exists(os.path.join(temp_dir, f"{station_id}.dly")))
+            self.assertEqual(station_ids, ParquetStore(temp_dir).keys(GHCND_DATASET))
+
+        self.assertEqual(station_ids, [timing.station_id for timing in result.timings])
+        self.assertEqual([77, 77], [timing.num_days for timing in result.timings])
+
+        df = result.observations
+        self.assertEqual(["station_id", "element"], df.columns.names)
+        self.assertEqual(77, len(df))
+        self.assertEqual(33.9, df.loc["2022-08-01", ("USC00053005", "tmax")])
+        self.assertEqual(15.6, df.loc["2022-08-01", ("USC00050848", "tmin")])
+
+        # Missing days are interpolated
+        self.assertFalse(df.isna().any().any())
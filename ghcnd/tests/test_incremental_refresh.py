@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+import responses
+
+from datastore.parquet_store import ParquetStore
+from ghcnd.bulk_ingest import GHCND_BASE_URL, GHCND_DATASET
+from ghcnd.incremental_refresh import load_manifest, refresh_stations
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+STATION_ID = "USC00050848"
+STATION_URL = f"{GHCND_BASE_URL}/{STATION_ID}.dly"
+
+
+class TestIncrementalRefresh(unittest.TestCase):
+
+    def setUp(self) -> None:
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        with open(filepath, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        # Initially the file only runs through September
+        self.september_text = "\n".join(line for line in lines if line[11:17] != "202210") + "\n"
+        self.october_text = "\n".join(lines) + "\n"
+
+    @responses.activate
+    def test_refresh(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # First run has no manifest, so downloads and parses everything
+            responses.get(STATION_URL, body=self.september_text, headers={"ETag": '"v1"'})
+            results = refresh_stations([STATION_ID], temp_dir)
+
+            self.assertTrue(results[0].changed)
+            self.assertEqual(61, results[0].num_days_parsed)
+            self.assertNotIn("If-None-Match", responses.calls[0].request.headers)
+
+            manifest = load_manifest(temp_dir)
+            self.assertEqual('"v1"', manifest[STATION_ID].etag)
+            self.assertEqual((2022, 9), (manifest[STATION_ID].last_parsed_year, manifest[STATION_ID].last_parsed_month))
+
+            # Second run gets a 304, so nothing changes
+            responses.replace(responses.GET, STATION_URL, status=304)
+            results = refresh_stations([STATION_ID], temp_dir)
+
+            self.assertFalse(results[0].changed)
+            self.assertEqual('"v1"', responses.calls[1].request.headers["If-None-Match"])
+            self.assertEqual('"v1"', load_manifest(temp_dir)[STATION_ID].etag)
+
+            # Third run gets new data, and only re-parses from the last-parsed month onwards
+            responses.replace(responses.GET, STATION_URL, body=self.october_text, headers={"ETag": '"v2"'})
+            results = refresh_stations([STATION_ID], temp_dir)
+
+            self.assertTrue(results[0].changed)
+            self.assertEqual(46, results[0].num_days_parsed)
+            self.assertEqual((2022, 10), (load_manifest(temp_dir)[STATION_ID].last_parsed_year, load_manifest(temp_dir)[STATION_ID].last_parsed_month))
+
+            df = ParquetStore(temp_dir).read(GHCND_DATASET, STATION_ID)
+
+        self.assertEqual(77, len(df))
+        self.assertEqual(33.9, df.loc["2022-08-01", "tmax"])
+        self.assertEqual(15.0, df.loc["2022-10-16", "tmax"])
+        self.assertFalse(df.isna().any().any())
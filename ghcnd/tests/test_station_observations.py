@@ -1,9 +1,12 @@
 import os
+import tempfile
 import unittest
 from datetime import date
 from math import isnan
 
-from ghcnd.station_observations import read_from_dly_file
+import numpy as np
+
+from ghcnd.station_observations import ALL_MEASUREMENTS, MISSING_VALUE, parse_from_dly_text, read_from_dly_file
 
 # pylint: disable=missing-class-docstring,missing-function-docstring
 
@@ -37,3 +40,109 @@ class TestStationDayObservations(unittest.TestCase):
         self.assertTrue(isnan(daily_obs[64].tmin))
         self.assertTrue(isnan(daily_obs[64].tmax_decimal))
         self.assertTrue(isnan(daily_obs[64].tmin_decimal))
+
+    def test_compact_storage(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        station_obs = read_from_dly_file(filepath)
+
+        self.assertEqual(77, len(station_obs))
+        self.assertEqual(np.int32, station_obs.day_ordinals.dtype)
+        self.assertEqual(np.int16, station_obs.tmax.dtype)
+        self.assertEqual(np.int16, station_obs.tmin.dtype)
+        self.assertEqual(MISSING_VALUE, station_obs.tmax[64])
+        self.assertEqual(date(2022, 8, 1), next(iter(station_obs.observations)).date)
+        self.assertEqual([date(2022, 10, 15), date(2022, 10, 16)], [obs.date for obs in station_obs.observations[-2:]])
+
+    def test_export(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        station_obs = read_from_dly_file(filepath)
+
+        arrays = station_obs.to_numpy()
+        self.assertEqual(np.datetime64("2022-08-01"), arrays["date"][0])
+        self.assertIs(station_obs.values["TMAX"], arrays["TMAX"])
+
+        df = station_obs.to_pandas()
+        self.assertEqual(["tmax", "tmin"], list(df.columns))
+        self.assertEqual("date", df.index.name)
+        self.assertEqual(339, df.loc["2022-08-01", "tmax"])
+        np.testing.assert_array_equal(station_obs.values["TMIN"], df["tmin"].to_numpy())
+        self.assertEqual(np.int16, df["tmin"].dtype)
+
+    def test_read_date_range(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        station_obs = read_from_dly_file(filepath, start_date=date(2022, 9, 10), end_date=date(2022, 10, 2))
+
+        self.assertEqual("USC00050848", station_obs.station_id)
+        self.assertEqual(23, len(station_obs))
+        self.assertEqual(date(2022, 9, 10), station_obs.start_date)
+        self.assertEqual(date(2022, 10, 2), station_obs.end_date)
+        self.assertEqual(128, station_obs.tmax[0])
+
+    def test_read_not_fixed_width(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        fixed_width = read_from_dly_file(filepath, start_date=date(2022, 9, 10))
+
+        # Strip trailing whitespace so the records are no longer fixed-width, which exercises the streaming path
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stripped_path = os.path.join(temp_dir, "stripped.dly")
+            with open(filepath, "r", encoding="utf-8") as src, open(stripped_path, "w", encoding="utf-8") as dest:
+                dest.writelines(line.rstrip() + "\n" for line in src)
+            stripped = read_from_dly_file(stripped_path, start_date=date(2022, 9, 10))
+
+        np.testing.assert_array_equal(fixed_width.day_ordinals, stripped.day_ordinals)
+        np.testing.assert_array_equal(fixed_width.tmax, stripped.tmax)
+        np.testing.assert_array_equal(fixed_width.tmin, stripped.tmin)
+
+    def test_parse_stripped_lines(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        with open(filepath, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        # Give the last day of the first TMAX record a value with no flags, which stripping trailing whitespace drops
+        lines[0] = lines[0][:261] + "  123   "
+        dly_text = "\n".join(lines)
+        stripped_text = "\n".join(line.rstrip() for line in lines)
+
+        # The stripped flags are blank, so the value must not count as failing QC
+        fixed_width = parse_from_dly_text(dly_text, ALL_MEASUREMENTS, exclude_failed_qc=True)
+        stripped = parse_from_dly_text(stripped_text, ALL_MEASUREMENTS, exclude_failed_qc=True)
+
+        self.assertEqual(123, stripped.tmax[30])
+        np.testing.assert_array_equal(fixed_width.day_ordinals, stripped.day_ordinals)
+        for element, values in fixed_width.values.items():
+            np.testing.assert_array_equal(values, stripped.values[element])
+            np.testing.assert_array_equal(fixed_width.flags[element], stripped.flags[element])
+
+    def test_parse_all_elements_and_flags(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        station_obs = read_from_dly_file(filepath, ALL_MEASUREMENTS)
+
+        self.assertEqual({"TMAX", "TMIN", "TOBS", "PRCP", "SNOW", "SNWD", "WT03"}, set(station_obs.values))
+        self.assertEqual(0, station_obs.values["PRCP"][0])
+        self.assertEqual(3, station_obs.values["PRCP"][2])
+        self.assertEqual(b"T", station_obs.flags["PRCP"]["mflag"][0])
+        self.assertEqual(b" ", station_obs.flags["PRCP"]["qflag"][0])
+        self.assertEqual(b"7", station_obs.flags["PRCP"]["sflag"][0])
+        self.assertEqual(b" ", station_obs.flags["PRCP"]["mflag"][2])
+
+        df = station_obs.to_pandas(include_flags=True)
+        self.assertEqual("T", df.loc["2022-08-01", "prcp_mflag"])
+        self.assertEqual(256, df.loc["2022-08-01", "tobs"])
+
+    def test_exclude_failed_qc(self):
+        filepath = os.path.join(os.path.dirname(__file__), "test_data", "test_daily.dly")
+        with open(filepath, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        # Set a QFLAG ("I", failed internal consistency check) on the first day of the first TMAX record
+        lines[0] = lines[0][:27] + "I" + lines[0][28:]
+        dly_text = "\n".join(lines)
+
+        station_obs = parse_from_dly_text(dly_text)
+        self.assertEqual(339, station_obs.tmax[0])
+        self.assertEqual(b"I", station_obs.flags["TMAX"]["qflag"][0])
+
+        station_obs = parse_from_dly_text(dly_text, exclude_failed_qc=True)
+        self.assertEqual(MISSING_VALUE, station_obs.tmax[0])
+        self.assertEqual(156, station_obs.tmin[0])
+        self.assertTrue(isnan(station_obs.observations[0].tmax))
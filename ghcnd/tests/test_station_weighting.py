@@ -0,0 +1,66 @@
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ghcnd.station_weighting import LoadCenter, StationWeighting
+from ghcnd.stations import read_stations_file
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "test_data")
+
+LOAD_CENTERS = [
+    LoadCenter("Denver", 39.7392, -104.9903, 3.0),
+    LoadCenter("Grand Junction", 39.0639, -108.5506, 1.0),
+]
+
+
+class TestStationWeighting(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.stations = read_stations_file(os.path.join(TEST_DATA_DIR, "test_stations.txt"))
+        self.weighting = StationWeighting(self.stations, LOAD_CENTERS, stations_per_center=2)
+
+    def test_nearest_stations(self):
+        nearest = self.weighting.nearest_stations(39.7392, -104.9903, k=3)
+
+        self.assertEqual(["USW00023062", "USC00058995", "USC00054762"], list(nearest.index))
+        self.assertAlmostEqual(10.7, nearest["distance_km"].iloc[0], delta=0.5)
+        self.assertTrue(nearest["distance_km"].is_monotonic_increasing)
+
+    def test_station_weights(self):
+        # Grand Junction's second-nearest station is well beyond 150km, so it only uses Walker Field
+        self.assertEqual(["USW00023066", "USC00058995", "USW00023062"], self.weighting.station_ids)
+
+        weights = self.weighting.station_weights()
+        self.assertAlmostEqual(1.0, weights.sum())
+        self.assertAlmostEqual(0.25, weights["USW00023066"])
+        self.assertGreater(weights["USW00023062"], weights["USC00058995"])
+
+    def test_composite_renormalizes_over_gaps(self):
+        days = pd.date_range("2023-01-01", periods=3, freq="D", name="date")
+        values = pd.DataFrame({
+            "USW00023066": [0.0, 0.0, np.nan],
+            "USC00058995": [10.0, 10.0, 10.0],
+            "USW00023062": [10.0, np.nan, np.nan],
+            "USW00094728": [99.0, 99.0, 99.0],  # Not used by any center
+        }, index=days)
+
+        composite = self.weighting.composite(values)
+
+        self.assertEqual(list(days), list(composite.index))
+        # Denver is 3/4 of the load at 10, Grand Junction 1/4 at 0
+        np.testing.assert_allclose([7.5, 7.5, 10.0], composite.to_numpy())
+        self.assertTrue(np.isnan(self.weighting.composite(values[["USW00094728"]]).iloc[0]))
+
+    def test_composite_weather(self):
+        days = pd.date_range("2023-01-01", periods=2, freq="D", name="date")
+        columns = pd.MultiIndex.from_product([self.weighting.station_ids, ["tmax", "tmin"]], names=["station_id", "element"])
+        weather = pd.DataFrame(np.tile([20.0, 0.0], (2, 3)), index=days, columns=columns)
+
+        composites = self.weighting.composite_weather(weather)
+
+        self.assertEqual(["tmax", "tmin", "tavg"], list(composites.columns))
+        np.testing.assert_allclose([[20.0, 0.0, 10.0]] * 2, composites.to_numpy())
@@ -0,0 +1,181 @@
+"""Archive of NOAA forecast snapshots, so models can be trained on what was forecast rather than what was observed
+
+Every issuance of a grid point's forecast is kept, keyed by grid point and the time NOAA issued it (`updated`), in a
+ParquetStore partitioned by grid point and the year of each forecast period. Rows within each file are sorted by
+period start time, so "the forecast for day D as of time T" only reads the one year partition that D falls in, which
+is then filtered down to D's periods.
+
+Each year's file is a single Parquet file, so archiving an issuance re-reads and rewrites the year files its periods
+fall in (see `ParquetStore.append`). That cost grows as the year's file fills up, which is fine for polling a handful
+of grid points but not for archiving many of them at a high rate.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, Union
+
+import numpy as np
+import pandas as pd
+
+from datastore.parquet_store import ParquetStore
+from noaa_client.point_forecast import PointForecast
+from noaa_client.point_info import GridPoint
+
+HOURLY_DATASET = "noaa_forecast_hourly"
+DAILY_DATASET = "noaa_forecast_daily"
+
+TimestampLike = Union[str, datetime, pd.Timestamp]
+
+
+class ForecastArchive:
+    """Deduplicated store of forecast issuances for many grid points. Issuances are only added, never modified."""
+
+    def __init__(self, root_dir: str) -> None:
+        """Create a new ForecastArchive.
+
+        Args:
+            root_dir: Root directory of the ParquetStore to archive forecasts into
+        """
+        self.store = ParquetStore(root_dir)
+
+    def add(self, grid_point: GridPoint, forecast: PointForecast, hourly: bool) -> bool:
+        """Archive a forecast issuance, unless it has already been archived or is unchanged from the latest one
+
+        This rewrites the year files that the forecast's periods fall in, see the module docs.
+
+        Args:
+            grid_point: Grid point the forecast is for
+            forecast: Forecast from `ForecastClient.point_forecast` or `point_forecast_hourly`
+            hourly: Whether this is an hourly forecast, rather than a daily one
+
+        Returns:
+            True if the forecast was archived, False if it was a duplicate
+        """
+        new_df = _snapshot_frame(forecast)
+        if new_df.empty:
+            return False
+
+        (dataset, key) = (_dataset(hourly), _key(grid_point))
+        if self.store.years(dataset, key):
+            existing_df = self.store.read(dataset, key, start=new_df.index[0], end=new_df.index[-1])
+            if _is_duplicate(existing_df, new_df):
+                return False
+
+        self.store.append(dataset, key, new_df)
+        return True
+
+    def add_many(self, forecasts: Iterable[tuple[GridPoint, PointForecast]], hourly: bool) -> int:
+        """Archive many forecasts, eg as yielded by `ForecastClient.point_forecasts`. Returns the number archived."""
+        return sum(self.add(grid_point, forecast, hourly) for (grid_point, forecast) in forecasts)
+
+    def as_of(self, grid_point: GridPoint, as_of: TimestampLike, start: TimestampLike = None, end: TimestampLike = None,
+              hourly: bool = True) -> pd.DataFrame:
+        """Get the forecast for each period, as it stood at a point in time
+
+        Args:
+            grid_point: Grid point to get the forecast for
+            as_of: Only forecasts issued at or before this (UTC) time are considered
+            start: (optional) Earliest period start time to return. If None, all archived periods are considered.
+            end: (optional) Latest period start time to return
+            hourly: (optional, default True) Use hourly forecasts, rather than daily
+
+        Returns:
+            The most recently issued forecast for each period, indexed by UTC period start time, with an `issued_at`
+            column saying which issuance it came from
+        """
+        df = self._read(grid_point, hourly, start, end)
+        df = df[df["issued_at"] <= _utc(as_of)]
+        return df[~df.index.duplicated(keep="last")]
+
+    def daily_high_low(self, grid_point: GridPoint, days: pd.DatetimeIndex, lead: timedelta = timedelta(hours=18)) -> pd.DataFrame:
+        """Get the forecast high & low temperature for many (UTC) days, each as of `lead` before the start of the day
+
+        This is the training-time join: for each target day, only forecasts that would have been available `lead`
+        ahead of it are used, and the matching hourly periods are picked out with vectorized comparisons rather than
+        a lookup per day.
+
+        Args:
+            grid_point: Grid point to get forecasts for
+            days: Days to get forecasts for
+            lead: (optional, default 18 hours) How long before the start of each day the forecast must have been issued
+
+        Returns:
+            DataFrame indexed by day with `high`, `low` and `issued_at` (of the oldest issuance used) columns. Days with
+            no archived forecast are NaN.
+        """
+        days = pd.DatetimeIndex(days).normalize()
+        df = self._read(grid_point, True, days.min(), days.max() + timedelta(days=1) - timedelta(seconds=1))
+
+        period_days = df.index.tz_localize(None).normalize()
+        df = df[period_days.isin(days) & (df["issued_at"] <= period_days - lead)]
+        df = df[~df.index.duplicated(keep="last")]
+
+        grouped = df.groupby(df.index.tz_localize(None).normalize())
+        result = pd.DataFrame({
+            "high": grouped["temperature"].max(),
+            "low": grouped["temperature"].min(),
+            "issued_at": grouped["issued_at"].min(),
+        })
+        return result.reindex(days).rename_axis("date")
+
+    def _read(self, grid_point: GridPoint, hourly: bool, start: TimestampLike, end: TimestampLike) -> pd.DataFrame:
+        (dataset, key) = (_dataset(hourly), _key(grid_point))
+        if not self.store.years(dataset, key):
+            return _snapshot_frame(None).rename_axis("start_time").tz_localize("UTC")
+
+        start = _utc(start) if start is not None else None
+        end = _utc(end) if end is not None else None
+        df = self.store.read(dataset, key, start=start, end=end)
+
+        # Order by period, then by issuance, so that the last row for each period is the latest issuance
+        df = df.rename_axis("start_time").reset_index().sort_values(["start_time", "issued_at"], kind="stable")
+        return df.set_index(pd.DatetimeIndex(df["start_time"]).tz_localize("UTC")).drop(columns="start_time")
+
+
+def _snapshot_frame(forecast: PointForecast) -> pd.DataFrame:
+    """Convert a forecast into the rows archived for it, indexed by naive UTC period start time"""
+    if forecast is None:
+        arrays = {name: np.array([], dtype=dtype) for (name, dtype) in
+                  [("start_time", "datetime64[s]"), ("end_time", "datetime64[s]"), ("number", np.int16),
+                   ("is_day_time", bool), ("temperature", np.float32)]}
+        issued_at = np.array([], dtype="datetime64[s]")
+    else:
+        arrays = forecast.to_arrays()
+        issued_at = np.full(len(arrays["start_time"]), _utc(forecast.updated).to_datetime64(), dtype="datetime64[s]")
+
+    return pd.DataFrame(
+        {
+            "issued_at": issued_at,
+            "end_time": arrays["end_time"],
+            "number": arrays["number"].astype(np.int16),
+            "is_day_time": arrays["is_day_time"],
+            "temperature": arrays["temperature"].astype(np.float32),
+        },
+        index=pd.DatetimeIndex(arrays["start_time"], name="date")
+    )
+
+
+def _is_duplicate(existing_df: pd.DataFrame, new_df: pd.DataFrame) -> bool:
+    """Whether a new issuance was already archived, or is identical to the latest archived issuance it overlaps"""
+    issued_at = new_df["issued_at"].iloc[0]
+    existing_issued_at = existing_df["issued_at"]
+    if (existing_issued_at == issued_at).any():
+        return True
+    if existing_df.empty:
+        return False
+
+    latest_df = existing_df[existing_issued_at == existing_issued_at.max()]
+    return latest_df.index.equals(new_df.index) \
+        and np.array_equal(latest_df["temperature"].to_numpy(), new_df["temperature"].to_numpy())
+
+
+def _dataset(hourly: bool) -> str:
+    return HOURLY_DATASET if hourly else DAILY_DATASET
+
+
+def _key(grid_point: GridPoint) -> str:
+    return f"{grid_point.forecast_office_id}_{grid_point.grid_x}_{grid_point.grid_y}"
+
+
+def _utc(timestamp: TimestampLike) -> pd.Timestamp:
+    """Convert to a naive UTC Timestamp, treating naive input as already UTC"""
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.tz_convert("UTC").tz_localize(None) if timestamp.tzinfo is not None else timestamp
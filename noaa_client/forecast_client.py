@@ -1,17 +1,35 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterable, Iterator, Union
+
 import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
 
+from noaa_client.gridpoint_cache import GridpointCache
+from noaa_client.http_cache import CachedResponse, HttpCache, freshness_lifetime
 from noaa_client.noaa_metadata import parse as parse_metadata
 from noaa_client.point_forecast import PointForecast
-from noaa_client.point_info import PointInfo
+from noaa_client.point_info import GridPoint, PointInfo
+from noaa_client.rate_limiter import HostRateLimiter
+
+# Statuses worth retrying, since the NOAA API fairly regularly returns transient 500s and 503s
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
 
 
 class ForecastClient:
     """Wrapper for the NOAA Forecast weather API.
 
     Wraps calls to the NOAA Forecast API at https://www.weather.gov/documentation/services-web-api
+    All requests go through a single pooled session, so connections are reused between calls. The client can be used
+    as a context manager to close that session when done.
     """
 
-    def __init__(self, user_agent: str, base_url="https://api.weather.gov") -> None:
+    def __init__(self, user_agent: str, base_url="https://api.weather.gov", max_retries: int = 3,
+                 backoff_factor: float = 0.5, pool_size: int = 10, cache: HttpCache = None,
+                 requests_per_second: float = None, gridpoint_cache: GridpointCache = None) -> None:
         """Create a new ForecastClient.
 
         Args:
@@ -19,6 +37,17 @@ class ForecastClient:
                 user_agent header value sent with requests to NOAA.
                 Should include app name and admin email.
                 eg (my-app, some-admin@example.com)
+            base_url: (optional) Base URL of the NOAA API
+            max_retries: (optional, default 3) How many times to retry requests that fail with a connection error or a
+                retryable status
+            backoff_factor: (optional, default 0.5) Seconds to back off between retries, doubled for each retry
+            pool_size: (optional, default 10) Maximum number of connections to keep open to NOAA
+            cache: (optional) HTTP cache to serve & revalidate responses from, eg a `MemoryCache` or `DiskCache`.
+                If None, nothing is cached.
+            requests_per_second: (optional) Maximum rate of requests to each host, shared by all threads using this
+                client. If None, requests are not rate limited.
+            gridpoint_cache: (optional) Cache of lat/long to grid point resolutions, checked by `points()` before
+                calling NOAA. If None, every `points()` call goes to NOAA.
 
         Raises:
             ValueError: user_agent was not provided or was falsey
@@ -31,21 +60,94 @@ class ForecastClient:
             "User-Agent": user_agent,
             "Accept": "application/geo+json"
         }
+        self.cache = cache
+        self.rate_limiter = HostRateLimiter(requests_per_second) if requests_per_second else None
+        self.gridpoint_cache = gridpoint_cache
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=["GET"],
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> "ForecastClient":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the client's pooled connections"""
+        self.session.close()
 
     def points(self, latitude: any, longitude: any) -> PointInfo:
         """Get information about a particular map/geo point from NOAA, via the /points endpoints
 
+        If the client has a `gridpoint_cache`, cached resolutions are returned without calling NOAA.
+
         Args:
             latitude: Latitude given as either a float or a string
             longitude: Longitude gives as either a float or a string
         """
-        url = f"{self.base_url}/points/{latitude},{longitude}"
-        resp = requests.get(url, headers=self.headers, timeout=120)
-        resp.raise_for_status()
+        if self.gridpoint_cache is not None:
+            point_info = self.gridpoint_cache.get(latitude, longitude)
+            if point_info is not None:
+                return point_info
+
+        (response_json, headers, _) = self._get(f"{self.base_url}/points/{latitude},{longitude}")
+        point_info = PointInfo(response_json, parse_metadata(headers))
+
+        if self.gridpoint_cache is not None:
+            self.gridpoint_cache.set(latitude, longitude, point_info)
+        return point_info
+
+    def prewarm_points(self, locations: Iterable[tuple[any, any]], max_concurrency: int = 8) -> dict[tuple[any, any], GridPoint]:
+        """Resolve many (latitude, longitude) locations concurrently, filling the gridpoint cache
+
+        Locations that are already cached are not re-requested. Typically called once at startup with the coordinates
+        of every weather station, so that later forecast polling never needs to call /points.
+
+        Returns:
+            The grid point for each location
+        """
+        locations = list(locations)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            point_infos = pool.map(lambda location: self.points(*location), locations)
+            return {location: point_info.grid_point for (location, point_info) in zip(locations, point_infos)}
+
+    def location_forecast(self, latitude: any, longitude: any, hourly: bool = False, units: str = "si") -> PointForecast:
+        """Get the forecast for the grid square covering a lat/long, resolving it via `points()`
+
+        If the grid point came from the gridpoint cache but NOAA now returns a 404 or a redirect for its forecast, the
+        cached resolution is invalidated. A 404 is retried once with a freshly-resolved grid point.
 
-        meta = parse_metadata(resp.headers)
-        json = resp.json()
-        return PointInfo(json, meta)
+        Args:
+            latitude: Latitude given as either a float or a string
+            longitude: Longitude gives as either a float or a string
+            hourly: (optional) Get the hourly forecast, rather than daily
+            units (str, optional): What measurement system to request. Default is SI. Possible values are ["si", "us"]
+        """
+        grid_point = self.points(latitude, longitude).grid_point
+        try:
+            (response_json, headers, redirected) = self._get(self._forecast_url(grid_point, hourly), params={"units": units})
+        except requests.HTTPError as ex:
+            if self.gridpoint_cache is None or ex.response is None or ex.response.status_code != 404:
+                raise
+            self.gridpoint_cache.invalidate_grid_point(grid_point)
+            grid_point = self.points(latitude, longitude).grid_point
+            (response_json, headers, redirected) = self._get(self._forecast_url(grid_point, hourly), params={"units": units})
+
+        if redirected and self.gridpoint_cache is not None:
+            self.gridpoint_cache.invalidate_grid_point(grid_point)
+
+        return PointForecast(response_json, parse_metadata(headers))
 
     def point_forecast(self, forecast_office_id: str, grid_x: int, grid_y: int, units: str = "si") -> PointForecast:
         """Get the daily forecast for a particular 2.5km grid square from NOAA
@@ -59,12 +161,9 @@ class ForecastClient:
             grid_y: the Y offset within the forecast offfice's grid
             units (str, optional): What measurement system to request. Default is SI. Possible values are ["si", "us"]
         """
-        url = f"{self.base_url}/gridpoints/{forecast_office_id}/{grid_x},{grid_y}/forecast"
-        resp = requests.get(url, params={"units": units}, headers=self.headers, timeout=120)
-        resp.raise_for_status()
-
-        meta = parse_metadata(resp.headers)
-        return PointForecast(resp.json(), meta)
+        url = self._forecast_url(GridPoint(forecast_office_id, grid_x, grid_y), hourly=False)
+        (response_json, headers, _) = self._get(url, params={"units": units})
+        return PointForecast(response_json, parse_metadata(headers))
 
     def point_forecast_hourly(self, forecast_office_id: str, grid_x: int, grid_y: int, units: str = "si") -> PointForecast:
         """Get the hourly forecast for a particular 2.5km grid square from NOAA
@@ -78,9 +177,84 @@ class ForecastClient:
             grid_y: the Y offset within the forecast offfice's grid
             units (str, optional): What measurement system to request. Default is SI. Possible values are ["si", "us"]
         """
-        url = f"{self.base_url}/gridpoints/{forecast_office_id}/{grid_x},{grid_y}/forecast/hourly"
-        resp = requests.get(url, params={"units": units}, headers=self.headers, timeout=120)
-        resp.raise_for_status()
+        url = self._forecast_url(GridPoint(forecast_office_id, grid_x, grid_y), hourly=True)
+        (response_json, headers, _) = self._get(url, params={"units": units})
+        return PointForecast(response_json, parse_metadata(headers))
+
+    def point_forecasts(self, grid_points: Iterable[GridPoint], hourly: bool = False, units: str = "si",
+                        max_concurrency: int = 8, return_exceptions: bool = False) -> Iterator[tuple[GridPoint, Union[PointForecast, Exception]]]:
+        """Get forecasts for many grid squares concurrently, yielding each one as soon as it arrives
+
+        Requests are made on a bounded pool of threads sharing this client's session, cache and rate limit, so results
+        arrive in completion order rather than the order `grid_points` was given in.
+
+        Args:
+            grid_points: Grid squares to get forecasts for, eg from `PointInfo.grid_point`
+            hourly: (optional) Get hourly forecasts, rather than daily
+            units (str, optional): What measurement system to request. Default is SI. Possible values are ["si", "us"]
+            max_concurrency: (optional, default 8) Maximum number of requests in flight at once
+            return_exceptions: (optional) Yield the exception for grid squares whose request failed, rather than raising
+                it and abandoning the remaining requests
+
+        Yields:
+            (grid_point, forecast) pairs, where forecast is an exception if the request failed and `return_exceptions` is set
+        """
+        get_forecast = self.point_forecast_hourly if hourly else self.point_forecast
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            futures = {
+                pool.submit(get_forecast, grid_point.forecast_office_id, grid_point.grid_x, grid_point.grid_y, units): grid_point
+                for grid_point in grid_points
+            }
+            try:
+                for future in as_completed(futures):
+                    error = future.exception()
+                    if error is not None and not return_exceptions:
+                        raise error
+                    yield (futures[future], error if error is not None else future.result())
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _forecast_url(self, grid_point: GridPoint, hourly: bool) -> str:
+        url = f"{self.base_url}/gridpoints/{grid_point.forecast_office_id}/{grid_point.grid_x},{grid_point.grid_y}/forecast"
+        return f"{url}/hourly" if hourly else url
+
+    def _get(self, url: str, params: dict = None) -> tuple[dict, CaseInsensitiveDict, bool]:
+        """GET a URL, returning the JSON body, response headers, and whether NOAA redirected the request
+
+        If there is a cache, fresh cached responses are returned without a request, and stale ones are revalidated with
+        a conditional request.
+        """
+        if self.cache is None:
+            self._wait_for_rate_limit(url)
+            resp = self.session.get(url, params=params, timeout=120)
+            resp.raise_for_status()
+            return (resp.json(), resp.headers, bool(resp.history))
+
+        full_url = requests.Request("GET", url, params=params).prepare().url
+        cached = self.cache.get(full_url)
+        if cached is not None and cached.is_fresh():
+            return (json.loads(cached.body), CaseInsensitiveDict(cached.headers), False)
+
+        self._wait_for_rate_limit(full_url)
+        resp = self.session.get(full_url, headers=cached.validation_headers() if cached else None, timeout=120)
+        if resp.status_code == 304 and cached is not None:
+            # Unchanged, so keep the cached body but take the new caching headers
+            headers = CaseInsensitiveDict(cached.headers)
+            headers.update(resp.headers)
+            body = cached.body
+        else:
+            resp.raise_for_status()
+            headers = resp.headers
+            body = resp.text
+
+        lifetime = freshness_lifetime(headers)
+        if lifetime is not None:
+            self.cache.set(CachedResponse(full_url, dict(headers), body, time.time() + lifetime))
+
+        return (json.loads(body), headers, bool(resp.history))
 
-        meta = parse_metadata(resp.headers)
-        return PointForecast(resp.json(), meta)
+    def _wait_for_rate_limit(self, url: str):
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait(url)
@@ -0,0 +1,86 @@
+"""Persistent cache of lat/long to forecast grid point resolutions, from the NOAA /points endpoint
+
+The grid square covering a location almost never changes, so resolving it once and reusing it saves a /points call
+for every forecast. Entries expire after a TTL, and can be invalidated when NOAA indicates a grid point has moved.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import timedelta
+from typing import Optional
+
+from noaa_client.noaa_metadata import parse as parse_metadata
+from noaa_client.point_info import GridPoint, PointInfo
+
+DEFAULT_TTL = timedelta(days=30)
+
+
+class GridpointCache:
+    """SQLite-backed cache of PointInfo, keyed by rounded lat/long. Safe to share between threads."""
+
+    def __init__(self, db_path: str = ":memory:", ttl: timedelta = DEFAULT_TTL, precision: int = 4) -> None:
+        """Create a new GridpointCache.
+
+        Args:
+            db_path: (optional) Path of the SQLite database file. Defaults to an in-memory database.
+            ttl: (optional, default 30 days) How long resolutions are trusted for before being re-requested
+            precision: (optional, default 4) Number of decimal places lat/long are rounded to for the cache key.
+                NOAA itself only resolves points to 4 decimal places.
+        """
+        self.ttl = ttl
+        self.precision = precision
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS points (
+                    latitude TEXT NOT NULL,
+                    longitude TEXT NOT NULL,
+                    grid_id TEXT NOT NULL,
+                    grid_x INTEGER NOT NULL,
+                    grid_y INTEGER NOT NULL,
+                    point_json TEXT NOT NULL,
+                    resolved_at REAL NOT NULL,
+                    PRIMARY KEY (latitude, longitude)
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS points_grid_point ON points (grid_id, grid_x, grid_y)")
+
+    def get(self, latitude: any, longitude: any) -> Optional[PointInfo]:
+        """Get the cached PointInfo for a location, or None if there is none or it has expired"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT point_json FROM points WHERE latitude = ? AND longitude = ? AND resolved_at >= ?",
+                (*self._key(latitude, longitude), time.time() - self.ttl.total_seconds())
+            ).fetchone()
+
+        return PointInfo(json.loads(row[0]), parse_metadata({})) if row else None
+
+    def set(self, latitude: any, longitude: any, point_info: PointInfo):
+        """Cache the PointInfo for a location"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO points VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*self._key(latitude, longitude), point_info.grid_id, point_info.grid_x, point_info.grid_y,
+                 json.dumps(point_info.json), time.time())
+            )
+
+    def invalidate(self, latitude: any, longitude: any):
+        """Remove the cached resolution for a location"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM points WHERE latitude = ? AND longitude = ?", self._key(latitude, longitude))
+
+    def invalidate_grid_point(self, grid_point: GridPoint):
+        """Remove every cached resolution to a grid point, eg once NOAA reports that it no longer exists"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM points WHERE grid_id = ? AND grid_x = ? AND grid_y = ?",
+                (grid_point.forecast_office_id, grid_point.grid_x, grid_point.grid_y)
+            )
+
+    def close(self):
+        """Close the underlying database connection"""
+        self._conn.close()
+
+    def _key(self, latitude: any, longitude: any) -> tuple[str, str]:
+        return (f"{float(latitude):.{self.precision}f}", f"{float(longitude):.{self.precision}f}")
@@ -0,0 +1,155 @@
+"""A small HTTP response cache for NOAA API responses, honouring Cache-Control, Expires and ETag/Last-Modified
+
+NOAA sets caching headers on its responses (forecasts are typically cacheable for a few minutes), so repeated polling
+can be served from the cache while fresh, and revalidated with a cheap conditional request after that.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+from requests.structures import CaseInsensitiveDict
+
+# pylint: disable=missing-function-docstring
+
+
+@dataclass
+class CachedResponse:
+    """A cached response body & headers, and when it stops being fresh"""
+    url: str
+    headers: dict[str, str]
+    body: str
+    expires_at: float
+    """Epoch seconds after which the response must be revalidated before use"""
+
+    @property
+    def etag(self) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get("ETag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return CaseInsensitiveDict(self.headers).get("Last-Modified")
+
+    def is_fresh(self, now: float = None) -> bool:
+        return (now if now is not None else time.time()) < self.expires_at
+
+    def validation_headers(self) -> dict[str, str]:
+        """Headers for a conditional request that revalidates this response"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache(ABC):
+    """Base class for HTTP caches, keyed by full request URL"""
+
+    @abstractmethod
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """Get the cached response for a URL, fresh or not, or None if there isn't one"""
+
+    @abstractmethod
+    def set(self, response: CachedResponse):
+        """Store a response, replacing any existing response for the same URL"""
+
+
+class MemoryCache(HttpCache):
+    """An in-memory HTTP cache, safe to share between threads"""
+
+    def __init__(self) -> None:
+        self._responses: dict[str, CachedResponse] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            return self._responses.get(url)
+
+    def set(self, response: CachedResponse):
+        with self._lock:
+            self._responses[response.url] = response
+
+
+class DiskCache(HttpCache):
+    """An on-disk HTTP cache, with one JSON file per URL, so cached responses survive between runs"""
+
+    def __init__(self, cache_dir: str) -> None:
+        """Create a new DiskCache.
+
+        Args:
+            cache_dir: Directory to store cached responses in. Created if it does not exist.
+        """
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        try:
+            with open(self._file_path(url), "r", encoding="utf-8") as f:
+                return CachedResponse(**json.load(f))
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def set(self, response: CachedResponse):
+        # Write via a temp file, so that concurrent readers never see a partially-written response
+        file_path = self._file_path(response.url)
+        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(dataclasses.asdict(response), f)
+        os.replace(temp_path, file_path)
+
+    def _file_path(self, url: str) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+
+def freshness_lifetime(headers: Mapping[str, str], now: float = None) -> Optional[float]:
+    """How many seconds a response stays fresh for, per its Cache-Control or Expires headers
+
+    Returns None if the response must not be stored at all (`no-store`), and 0 if it may be stored but must be
+    revalidated before every use.
+    """
+    now = now if now is not None else time.time()
+    headers = CaseInsensitiveDict(headers)
+
+    directives = {}
+    for directive in headers.get("Cache-Control", "").split(","):
+        (name, _, value) = directive.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"')
+
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+
+    age = _parse_int(headers.get("Age")) or 0
+    max_age = _parse_int(directives.get("max-age"))
+    if max_age is not None:
+        return max(max_age - age, 0)
+
+    expires = _parse_http_date(headers.get("Expires"))
+    if expires is not None:
+        response_date = _parse_http_date(headers.get("Date"))
+        return max(expires - (response_date if response_date is not None else now), 0)
+
+    return 0
+
+
+def _parse_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
@@ -1,46 +1,37 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Iterator
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
 
 from noaa_client.noaa_metadata import NoaaMetadata
 
 # pylint: disable=missing-function-docstring
 
 
-@dataclass
+@dataclass(slots=True)
 class ForecastPeriod:
-    """A single period in a NOAA forecast"""
-    json: dict
+    """A single period in a NOAA forecast, decoded from the JSON once up front"""
+    json: dict = field(repr=False)
     """JSON for this period from the NOAA response"""
-
-    @property
-    def number(self) -> int:
-        """A 1-indexed sequence number for this forecast period in the context of the overall forecast"""
-        return self.json["number"]
-
-    @property
-    def name(self) -> str:
-        return self.json["name"]
-
-    @property
-    def is_day_time(self) -> bool:
-        return self.json["isDaytime"]
-
-    @property
-    def start_time(self) -> datetime:
-        return datetime.fromisoformat(self.json["startTime"])
-
-    @property
-    def end_time(self) -> datetime:
-        return datetime.fromisoformat(self.json["endTime"])
-
-    @property
-    def temperature(self) -> float:
-        return self.json["temperature"]
-
-    @property
-    def temperature_unit(self) -> str:
-        return self.json["temperatureUnit"]
+    number: int = field(init=False)
+    """A 1-indexed sequence number for this forecast period in the context of the overall forecast"""
+    name: str = field(init=False)
+    is_day_time: bool = field(init=False)
+    start_time: datetime = field(init=False)
+    end_time: datetime = field(init=False)
+    temperature: float = field(init=False)
+    temperature_unit: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.number = self.json["number"]
+        self.name = self.json["name"]
+        self.is_day_time = self.json["isDaytime"]
+        self.start_time = datetime.fromisoformat(self.json["startTime"])
+        self.end_time = datetime.fromisoformat(self.json["endTime"])
+        self.temperature = self.json["temperature"]
+        self.temperature_unit = self.json["temperatureUnit"]
 
 
 @dataclass
@@ -52,10 +43,10 @@ class PointForecast:
     meta: NoaaMetadata
     """Response metadata from NOAA"""
 
-    @ property
-    def periods(self) -> Iterator[ForecastPeriod]:
-        """The set of forecast periods"""
-        return (ForecastPeriod(period) for period in self.json["properties"]["periods"])
+    @cached_property
+    def periods(self) -> tuple[ForecastPeriod, ...]:
+        """The set of forecast periods, decoded on first access"""
+        return tuple(ForecastPeriod(period) for period in self.json["properties"]["periods"])
 
     @ property
     def updated(self) -> datetime:
@@ -64,3 +55,48 @@ class PointForecast:
     @ property
     def valid_times(self) -> str:
         return self.json["properties"]["validTimes"]
+
+    def to_arrays(self) -> dict[str, np.ndarray]:
+        """Get the forecast periods as parallel arrays, eg for feeding straight into a model
+
+        Keys are "number", "start_time", "end_time" (as UTC datetime64[s]), "is_day_time" and "temperature".
+        The arrays are decoded once and cached, so treat them as read-only.
+        """
+        return self._arrays
+
+    def to_frame(self) -> pd.DataFrame:
+        """Get the forecast periods as a DataFrame, indexed by their UTC start time"""
+        arrays = self.to_arrays()
+        index = pd.DatetimeIndex(arrays["start_time"], name="start_time").tz_localize("UTC")
+        return pd.DataFrame(
+            {
+                "end_time": pd.DatetimeIndex(arrays["end_time"]).tz_localize("UTC"),
+                "number": arrays["number"],
+                "is_day_time": arrays["is_day_time"],
+                "temperature": arrays["temperature"],
+            },
+            index=index
+        )
+
+    @cached_property
+    def _arrays(self) -> dict[str, np.ndarray]:
+        periods = self.json["properties"]["periods"]
+        arrays = {
+            "number": np.fromiter((period["number"] for period in periods), dtype=np.int32, count=len(periods)),
+            "start_time": _to_utc_datetime64([period["startTime"] for period in periods]),
+            "end_time": _to_utc_datetime64([period["endTime"] for period in periods]),
+            "is_day_time": np.fromiter((period["isDaytime"] for period in periods), dtype=bool, count=len(periods)),
+            "temperature": np.array([period["temperature"] for period in periods], dtype=np.float64),
+        }
+        for array in arrays.values():
+            array.flags.writeable = False
+        return arrays
+
+
+def _to_utc_datetime64(timestamps: list[str]) -> np.ndarray:
+    """Parse ISO-8601 timestamps with UTC offsets into UTC datetime64[s], in one vectorized pass
+
+    NOAA's timestamps all have the same format, so pandas infers it from the first one. (`format="ISO8601"` would
+    also allow mixed formats, but needs pandas 2.)
+    """
+    return pd.to_datetime(timestamps, utc=True).tz_localize(None).to_numpy(dtype="datetime64[s]")
@@ -5,6 +5,14 @@ from noaa_client.noaa_metadata import NoaaMetadata
 # pylint: disable=missing-function-docstring
 
 
+@dataclass(frozen=True)
+class GridPoint:
+    """A single 2.5km square in a forecast office's grid, which is what NOAA forecasts are issued for"""
+    forecast_office_id: str
+    grid_x: int
+    grid_y: int
+
+
 @dataclass
 class PointInfo:
     """Information returned from the NOAA /points API endpoint"""
@@ -35,3 +43,7 @@ class PointInfo:
     @property
     def grid_y(self) -> int:
         return self.json["properties"]["gridY"]
+
+    @property
+    def grid_point(self) -> GridPoint:
+        return GridPoint(self.grid_id, self.grid_x, self.grid_y)
@@ -0,0 +1,45 @@
+"""Thread-safe rate limiting of requests, per host"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+class RateLimiter:
+    """Spaces out calls to `wait()` so that they happen at most `requests_per_second` times a second, across threads"""
+
+    def __init__(self, requests_per_second: float) -> None:
+        if requests_per_second <= 0:
+            raise ValueError("requests_per_second")
+
+        self.interval = 1.0 / requests_per_second
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the caller is allowed to make its request"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HostRateLimiter:
+    """Applies a separate `RateLimiter` to each host that requests are made to"""
+
+    def __init__(self, requests_per_second: float) -> None:
+        self.requests_per_second = requests_per_second
+        self._limiters: dict[str, RateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        """Block until the caller is allowed to make a request to `url`"""
+        host = urlsplit(url).netloc
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = RateLimiter(self.requests_per_second)
+
+        limiter.wait()
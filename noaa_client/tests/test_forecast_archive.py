@@ -0,0 +1,86 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from noaa_client.forecast_archive import ForecastArchive
+from noaa_client.noaa_metadata import parse as parse_metadata
+from noaa_client.point_forecast import PointForecast
+from noaa_client.point_info import GridPoint
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+GRID_POINT = GridPoint("BOU", 70, 83)
+MOUNTAIN_TIME = timezone(timedelta(hours=-6))
+
+
+def hourly_forecast(updated: datetime, first_period: datetime, temperatures: list[float]) -> PointForecast:
+    periods = [
+        {
+            "number": i + 1,
+            "name": "",
+            "startTime": (first_period + timedelta(hours=i)).isoformat(),
+            "endTime": (first_period + timedelta(hours=i + 1)).isoformat(),
+            "isDaytime": 6 <= (first_period + timedelta(hours=i)).hour < 18,
+            "temperature": temperature,
+            "temperatureUnit": "F",
+        }
+        for (i, temperature) in enumerate(temperatures)
+    ]
+    return PointForecast({"properties": {"updated": updated.isoformat(), "periods": periods}}, parse_metadata({}))
+
+
+class TestForecastArchive(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive = ForecastArchive(self.temp_dir.name)
+
+        # Issued 2022-12-30 at 06:00 & 18:00 local time, each covering 72 hours from 2022-12-30 18:00 local
+        self.first_period = datetime(2022, 12, 30, 18, tzinfo=MOUNTAIN_TIME)
+        self.morning = hourly_forecast(datetime(2022, 12, 30, 6, tzinfo=MOUNTAIN_TIME), self.first_period, [50.0] * 72)
+        self.evening = hourly_forecast(datetime(2022, 12, 30, 18, tzinfo=MOUNTAIN_TIME), self.first_period,
+                                       [40.0 + (i % 24) for i in range(72)])
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_add_deduplicates(self):
+        self.assertTrue(self.archive.add(GRID_POINT, self.morning, hourly=True))
+        self.assertFalse(self.archive.add(GRID_POINT, self.morning, hourly=True))
+
+        # Re-issued with nothing changed
+        unchanged = hourly_forecast(datetime(2022, 12, 30, 7, tzinfo=MOUNTAIN_TIME), self.first_period, [50.0] * 72)
+        self.assertFalse(self.archive.add(GRID_POINT, unchanged, hourly=True))
+
+        self.assertEqual(1, self.archive.add_many([(GRID_POINT, self.evening), (GRID_POINT, self.evening)], hourly=True))
+
+    def test_as_of(self):
+        self.archive.add_many([(GRID_POINT, self.morning), (GRID_POINT, self.evening)], hourly=True)
+
+        before_evening = self.archive.as_of(GRID_POINT, "2022-12-30T12:00:00-06:00")
+        self.assertEqual(72, len(before_evening))
+        self.assertTrue((before_evening["temperature"] == 50.0).all())
+        self.assertEqual(pd.Timestamp("2022-12-31T00:00:00Z"), before_evening.index[0])
+
+        after_evening = self.archive.as_of(GRID_POINT, "2023-01-01", start="2023-01-01T00:00:00Z", end="2023-01-01T02:00:00Z")
+        self.assertEqual([40.0, 41.0, 42.0], list(after_evening["temperature"]))
+        self.assertTrue((after_evening["issued_at"] == pd.Timestamp("2022-12-31T00:00:00")).all())
+
+        self.assertTrue(self.archive.as_of(GRID_POINT, "2022-12-29").empty)
+        self.assertTrue(self.archive.as_of(GridPoint("GJT", 1, 1), "2023-01-01").empty)
+
+    def test_daily_high_low(self):
+        self.archive.add_many([(GRID_POINT, self.morning), (GRID_POINT, self.evening)], hourly=True)
+
+        days = pd.DatetimeIndex(["2022-12-31", "2023-01-01", "2023-01-05"])
+        df = self.archive.daily_high_low(GRID_POINT, days, lead=timedelta(hours=12))
+
+        self.assertEqual(list(days), list(df.index))
+        # 2022-12-31 as of 2022-12-30 12:00 UTC, only the morning issuance had been issued
+        self.assertEqual((50.0, 50.0), (df.loc["2022-12-31", "high"], df.loc["2022-12-31", "low"]))
+        # 2023-01-01 as of 2022-12-31 12:00 UTC, the evening issuance had been too
+        self.assertEqual((63.0, 40.0), (df.loc["2023-01-01", "high"], df.loc["2023-01-01", "low"]))
+        self.assertTrue(np.isnan(df.loc["2023-01-05", "high"]))
@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+import unittest
+
+import requests
+import responses
+from dotenv import load_dotenv
+
+from noaa_client.forecast_client import ForecastClient
+from noaa_client.point_info import GridPoint
+from noaa_client.rate_limiter import RateLimiter
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+GRID_POINTS = [GridPoint("BOU", 70, 83), GridPoint("BOU", 62, 60), GridPoint("GJT", 80, 40)]
+
+
+class TestForecastClientBatch(unittest.TestCase):
+    def setUp(self) -> None:
+        load_dotenv()
+        self.client = ForecastClient(user_agent=os.environ.get("NOAA_USER_AGENT"))
+
+    def tearDown(self) -> None:
+        self.client.close()
+
+    @responses.activate
+    def test_point_forecasts(self):
+        responses._add_from_file("noaa_client/tests/test_data/gridpoint_forecast.toml")  # pylint: disable=protected-access
+        for grid_point in GRID_POINTS[1:]:
+            url = f"https://api.weather.gov/gridpoints/{grid_point.forecast_office_id}/{grid_point.grid_x},{grid_point.grid_y}/forecast"
+            responses.get(url, json={"properties": {"periods": []}}, headers={"X-Request-ID": grid_point.forecast_office_id})
+
+        results = dict(self.client.point_forecasts(GRID_POINTS, max_concurrency=3))
+
+        self.assertEqual(set(GRID_POINTS), set(results))
+        self.assertEqual(2022, results[GridPoint("BOU", 70, 83)].updated.year)
+        self.assertEqual("GJT", results[GridPoint("GJT", 80, 40)].meta.request_id)
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_point_forecasts_hourly(self):
+        responses.get("https://api.weather.gov/gridpoints/BOU/70,83/forecast/hourly", json={"properties": {"periods": []}})
+
+        results = list(self.client.point_forecasts([GridPoint("BOU", 70, 83)], hourly=True, units="us"))
+
+        self.assertEqual(1, len(results))
+        self.assertEqual("https://api.weather.gov/gridpoints/BOU/70,83/forecast/hourly?units=us", responses.calls[0].request.url)
+
+    @responses.activate
+    def test_point_forecasts_errors(self):
+        responses.get("https://api.weather.gov/gridpoints/BOU/70,83/forecast", json={"properties": {"periods": []}})
+        responses.get("https://api.weather.gov/gridpoints/BOU/62,60/forecast", status=404)
+
+        results = dict(self.client.point_forecasts(GRID_POINTS[:2], return_exceptions=True))
+        self.assertIsInstance(results[GridPoint("BOU", 62, 60)], requests.HTTPError)
+
+        with self.assertRaises(requests.HTTPError):
+            list(self.client.point_forecasts(GRID_POINTS[:2]))
+
+    def test_rate_limiter_spaces_requests_across_threads(self):
+        limiter = RateLimiter(requests_per_second=50)
+        times = []
+
+        def make_request():
+            limiter.wait()
+            times.append(time.monotonic())
+
+        threads = [threading.Thread(target=make_request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 5 requests at 50/s means the last one can't be less than 80ms after the first
+        self.assertGreaterEqual(max(times) - min(times), 0.075)
@@ -1,10 +1,13 @@
 import os
 import unittest
 
+import numpy as np
+import pandas as pd
 import responses
 from dotenv import load_dotenv
 from responses import _recorder
 from noaa_client.forecast_client import ForecastClient
+from noaa_client.point_forecast import ForecastPeriod
 
 # pylint: disable=missing-class-docstring,missing-function-docstring
 
@@ -63,3 +66,29 @@ class TestForecastClientGridpointForecasts(unittest.TestCase):
         periods = list(forecast.periods)
         self.assertTrue(periods[0].is_day_time)
         self.assertFalse(periods[1].is_day_time)
+
+    @responses.activate
+    def test_columnar_export(self) -> None:
+        responses._add_from_file("noaa_client/tests/test_data/gridpoint_forecast.toml")  # pylint: disable=protected-access
+
+        forecast = self.client.point_forecast("BOU", 70, 83, units="us")
+        periods = forecast.periods
+        self.assertIs(periods, forecast.periods)
+
+        arrays = forecast.to_arrays()
+        self.assertEqual(len(periods), len(arrays["temperature"]))
+        self.assertEqual([period.number for period in periods], list(arrays["number"]))
+        self.assertEqual([period.temperature for period in periods], list(arrays["temperature"]))
+        self.assertEqual([period.is_day_time for period in periods], list(arrays["is_day_time"]))
+
+        # 2022-10-17T08:00:00-06:00
+        self.assertEqual(np.datetime64("2022-10-17T14:00:00"), arrays["start_time"][0])
+        self.assertEqual(periods[0].end_time.timestamp(), arrays["end_time"][0].astype(np.int64))
+
+        df = forecast.to_frame()
+        self.assertEqual(len(periods), len(df))
+        self.assertEqual(pd.Timestamp("2022-10-17T08:00:00-06:00"), df.index[0])
+        self.assertEqual(periods[1].temperature, df["temperature"].iloc[1])
+
+        # Periods can still be constructed straight from their JSON
+        self.assertEqual(periods[0], ForecastPeriod(periods[0].json))
@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+from unittest import mock
+
+import responses
+
+from noaa_client.forecast_client import ForecastClient
+from noaa_client.http_cache import DiskCache, HttpCache, MemoryCache, freshness_lifetime
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+FORECAST_URL = "https://api.weather.gov/gridpoints/BOU/70,83/forecast"
+FORECAST_JSON = {"properties": {"updated": "2022-10-17T10:16:30+00:00", "periods": []}}
+
+
+class TestForecastClientHttp(unittest.TestCase):
+
+    @responses.activate
+    def test_fresh_responses_served_from_cache(self):
+        responses.get(FORECAST_URL, json=FORECAST_JSON, headers={"Cache-Control": "public, max-age=300", "X-Request-ID": "first"})
+
+        with ForecastClient("test-agent", cache=MemoryCache()) as client:
+            first = client.point_forecast("BOU", 70, 83)
+            second = client.point_forecast("BOU", 70, 83)
+
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual(first.json, second.json)
+        self.assertEqual("first", second.meta.request_id)
+
+    @responses.activate
+    def test_stale_responses_revalidated_with_etag(self):
+        responses.get(FORECAST_URL, json=FORECAST_JSON, headers={"Cache-Control": "max-age=0", "ETag": '"v1"'})
+
+        with ForecastClient("test-agent", cache=MemoryCache()) as client:
+            client.point_forecast("BOU", 70, 83)
+
+            responses.replace(responses.GET, FORECAST_URL, status=304, headers={"Cache-Control": "max-age=0", "ETag": '"v1"'})
+            forecast = client.point_forecast("BOU", 70, 83)
+
+        self.assertEqual('"v1"', responses.calls[1].request.headers["If-None-Match"])
+        self.assertEqual(FORECAST_JSON, forecast.json)
+
+    @responses.activate
+    def test_no_store_not_cached(self):
+        responses.get(FORECAST_URL, json=FORECAST_JSON, headers={"Cache-Control": "no-store"})
+
+        with ForecastClient("test-agent", cache=MemoryCache()) as client:
+            client.point_forecast("BOU", 70, 83)
+            client.point_forecast("BOU", 70, 83)
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertNotIn("If-None-Match", responses.calls[1].request.headers)
+
+    @responses.activate
+    def test_disk_cache_shared_between_clients(self):
+        responses.get(FORECAST_URL, json=FORECAST_JSON, headers={"Cache-Control": "max-age=300"})
+
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with ForecastClient("test-agent", cache=DiskCache(cache_dir)) as client:
+                client.point_forecast("BOU", 70, 83, units="us")
+            with ForecastClient("test-agent", cache=DiskCache(cache_dir)) as client:
+                forecast = client.point_forecast("BOU", 70, 83, units="us")
+
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual(FORECAST_JSON, forecast.json)
+
+    @responses.activate
+    def test_retries_transient_errors(self):
+        responses.get(FORECAST_URL, status=503)
+        responses.get(FORECAST_URL, json=FORECAST_JSON)
+
+        with mock.patch("time.sleep"), ForecastClient("test-agent") as client:
+            forecast = client.point_forecast("BOU", 70, 83)
+
+        self.assertEqual(2, len(responses.calls))
+        self.assertEqual(FORECAST_JSON, forecast.json)
+
+    def test_freshness_lifetime(self):
+        self.assertEqual(300, freshness_lifetime({"Cache-Control": "public, max-age=300"}))
+        self.assertEqual(240, freshness_lifetime({"cache-control": "max-age=300", "Age": "60"}))
+        self.assertEqual(0, freshness_lifetime({"Cache-Control": "no-cache, max-age=300"}))
+        self.assertIsNone(freshness_lifetime({"Cache-Control": "no-store"}))
+        self.assertEqual(120, freshness_lifetime({"Date": "Mon, 17 Oct 2022 14:00:00 GMT", "Expires": "Mon, 17 Oct 2022 14:02:00 GMT"}))
+        self.assertEqual(0, freshness_lifetime({}))
+
+    def test_caches_must_implement_get_and_set(self):
+        class GetOnlyCache(HttpCache):
+            def get(self, url):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnlyCache()  # pylint: disable=abstract-class-instantiated
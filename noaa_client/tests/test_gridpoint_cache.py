@@ -0,0 +1,128 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from unittest import mock
+
+import requests
+import responses
+
+from noaa_client.forecast_client import ForecastClient
+from noaa_client.gridpoint_cache import GridpointCache
+from noaa_client.noaa_metadata import parse as parse_metadata
+from noaa_client.point_info import GridPoint, PointInfo
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+LOCATION = (40.242056, -104.819259)
+POINTS_URL = "https://api.weather.gov/points/40.242056,-104.819259"
+FORECAST_JSON = {"properties": {"periods": []}}
+
+
+def points_json(grid_id: str, grid_x: int, grid_y: int) -> dict:
+    return {
+        "properties": {
+            "@id": "https://api.weather.gov/points/40.2421,-104.8193",
+            "gridId": grid_id,
+            "gridX": grid_x,
+            "gridY": grid_y,
+            "relativeLocation": {"geometry": {"coordinates": [-104.824077, 40.216683]}}
+        }
+    }
+
+
+class TestGridpointCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = GridpointCache(os.path.join(self.temp_dir.name, "gridpoints.sqlite"))
+        self.client = ForecastClient(user_agent="test-agent", gridpoint_cache=self.cache)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    @responses.activate
+    def test_points_cached_by_rounded_location(self):
+        responses.get(POINTS_URL, json=points_json("BOU", 70, 83))
+
+        self.client.points(*LOCATION)
+        point_info = self.client.points(*LOCATION)
+
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual(GridPoint("BOU", 70, 83), point_info.grid_point)
+        self.assertEqual(GridPoint("BOU", 70, 83), self.cache.get(40.24206, -104.81926).grid_point)
+
+        # Persisted, so a new cache on the same file sees it
+        reopened = GridpointCache(os.path.join(self.temp_dir.name, "gridpoints.sqlite"))
+        self.assertEqual(GridPoint("BOU", 70, 83), reopened.get(*LOCATION).grid_point)
+        reopened.close()
+
+    @responses.activate
+    def test_expired_entries_re_requested(self):
+        responses.get(POINTS_URL, json=points_json("BOU", 70, 83))
+        self.cache.ttl = timedelta(hours=1)
+
+        self.client.points(*LOCATION)
+        with mock.patch("time.time", return_value=time.time() + 7200):
+            self.client.points(*LOCATION)
+
+        self.assertEqual(2, len(responses.calls))
+
+    @responses.activate
+    def test_prewarm_points(self):
+        responses.get(POINTS_URL, json=points_json("BOU", 70, 83))
+        responses.get("https://api.weather.gov/points/39.0639,-108.55", json=points_json("GJT", 80, 40))
+
+        grid_points = self.client.prewarm_points([LOCATION, (39.0639, -108.55)])
+        self.assertEqual({LOCATION: GridPoint("BOU", 70, 83), (39.0639, -108.55): GridPoint("GJT", 80, 40)}, grid_points)
+
+        self.client.prewarm_points([LOCATION, (39.0639, -108.55)])
+        self.assertEqual(2, len(responses.calls))
+
+    @responses.activate
+    def test_location_forecast_uses_cache(self):
+        responses.get(POINTS_URL, json=points_json("BOU", 70, 83))
+        responses.get("https://api.weather.gov/gridpoints/BOU/70,83/forecast", json=FORECAST_JSON)
+
+        self.client.location_forecast(*LOCATION)
+        self.client.location_forecast(*LOCATION)
+
+        self.assertEqual([POINTS_URL] + ["https://api.weather.gov/gridpoints/BOU/70,83/forecast?units=si"] * 2,
+                         [call.request.url for call in responses.calls])
+
+    @responses.activate
+    def test_location_forecast_404_invalidates(self):
+        self.cache.set(*LOCATION, self._point_info("BOU", 70, 83))
+        responses.get("https://api.weather.gov/gridpoints/BOU/70,83/forecast", status=404)
+        responses.get(POINTS_URL, json=points_json("BOU", 71, 83))
+        responses.get("https://api.weather.gov/gridpoints/BOU/71,83/forecast", json=FORECAST_JSON)
+
+        forecast = self.client.location_forecast(*LOCATION)
+
+        self.assertEqual(FORECAST_JSON, forecast.json)
+        self.assertEqual(GridPoint("BOU", 71, 83), self.cache.get(*LOCATION).grid_point)
+
+    @responses.activate
+    def test_location_forecast_redirect_invalidates(self):
+        self.cache.set(*LOCATION, self._point_info("BOU", 70, 83))
+        responses.get("https://api.weather.gov/gridpoints/BOU/70,83/forecast", status=301,
+                      headers={"Location": "https://api.weather.gov/gridpoints/BOU/71,83/forecast?units=si"})
+        responses.get("https://api.weather.gov/gridpoints/BOU/71,83/forecast", json=FORECAST_JSON)
+
+        forecast = self.client.location_forecast(*LOCATION)
+
+        self.assertEqual(FORECAST_JSON, forecast.json)
+        self.assertIsNone(self.cache.get(*LOCATION))
+
+    @responses.activate
+    def test_404_without_cache_raises(self):
+        responses.get(POINTS_URL, json=points_json("BOU", 70, 83))
+        responses.get("https://api.weather.gov/gridpoints/BOU/70,83/forecast", status=404)
+
+        with ForecastClient(user_agent="test-agent") as client, self.assertRaises(requests.HTTPError):
+            client.location_forecast(*LOCATION)
+
+    def _point_info(self, grid_id: str, grid_x: int, grid_y: int) -> PointInfo:
+        return PointInfo(points_json(grid_id, grid_x, grid_y), parse_metadata({}))
@@ -0,0 +1,199 @@
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+import download_historical_data as dl
+from datastore.parquet_store import ParquetStore
+from eia import cleansing
+from ghcnd.bulk_ingest import GHCND_DATASET
+from ghcnd.station_weighting import LoadCenter, StationWeighting
+
+# pylint: disable=missing-class-docstring,missing-function-docstring
+
+
+class TestReadWeatherData(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        store = ParquetStore(self.temp_dir.name)
+
+        boulder_dates = pd.date_range("2014-12-30", "2015-01-03", freq="D", name="date")
+        store.write(GHCND_DATASET, "USC00050848", pd.DataFrame({"tmax": [1.0, 2.0, 3.0, 4.0, 5.0], "tmin": -1.0}, index=boulder_dates))
+
+        # Starts later, and is missing a day
+        ft_collins_dates = pd.DatetimeIndex(["2015-01-01", "2015-01-03", "2015-01-04"], name="date")
+        store.write(GHCND_DATASET, "USC00053005", pd.DataFrame({"tmax": [10.0, 30.0, 40.0], "tmin": -10.0}, index=ft_collins_dates))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_read_weather_observations(self):
+        df = dl.read_weather_observations(self.temp_dir.name, ["USC00053005", "USC00050848"], earliest_date="2015-01-01")
+
+        self.assertEqual(["station_id", "element"], df.columns.names)
+        self.assertEqual([("USC00053005", "tmax"), ("USC00053005", "tmin"), ("USC00050848", "tmax"), ("USC00050848", "tmin")], list(df.columns))
+        self.assertEqual(list(pd.date_range("2015-01-01", "2015-01-04", freq="D")), list(df.index))
+
+        np.testing.assert_array_equal([10.0, np.nan, 30.0, 40.0], df[("USC00053005", "tmax")])
+        np.testing.assert_array_equal([3.0, 4.0, 5.0, np.nan], df[("USC00050848", "tmax")])
+
+    def test_read_weather_observations_projection(self):
+        df = dl.read_weather_observations(self.temp_dir.name, ["USC00050848"], earliest_date=None, latest_date="2014-12-31", elements=["tmin"])
+
+        self.assertEqual([("USC00050848", "tmin")], list(df.columns))
+        self.assertEqual(2, len(df))
+
+    def test_read_weather_observations_missing_station(self):
+        with self.assertRaises(FileNotFoundError):
+            dl.read_weather_observations(self.temp_dir.name, ["USC00050848", "USW00023062"])
+
+    def test_read_weather_data(self):
+        df = dl.read_weather_data(self.temp_dir.name, ["USC00050848", "USC00053005"], earliest_date=None)
+
+        self.assertEqual(["USC00050848_tmax", "USC00050848_tmin", "USC00053005_tmax", "USC00053005_tmin"], list(df.columns))
+        self.assertEqual(6, len(df))
+        self.assertEqual(1.0, df.loc["2014-12-30", "USC00050848_tmax"])
+
+    def test_read_composite_weather(self):
+        stations = pd.DataFrame({"latitude": [39.9919, 40.6147, 39.7633], "longitude": [-105.2667, -105.1314, -104.8694]},
+                                index=pd.Index(["USC00050848", "USC00053005", "USW00023062"], name="station_id"))
+        weighting = StationWeighting(stations, [LoadCenter("Boulder", 39.9919, -105.2667, 1.0),
+                                                LoadCenter("Fort Collins", 40.6147, -105.1314, 1.0)], stations_per_center=1)
+
+        # Denver Stapleton isn't used by either center, and the Fort Collins gap on 2015-01-02 is left to Boulder
+        df = dl.read_composite_weather(self.temp_dir.name, weighting)
+
+        self.assertEqual(["tmax", "tmin", "tavg"], list(df.columns))
+        np.testing.assert_array_equal([6.5, 4.0, 17.5, 40.0], df["tmax"])
+        np.testing.assert_array_equal([0.5, 1.5, 6.0, 15.0], df["tavg"])
+
+
+class _FailingDetector(cleansing.FixedBoundsDetector):
+    """Fails on any chunk after the first, as if the process died part way through cleansing"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    def detect(self, demand: pd.Series) -> np.ndarray:
+        self.calls += 1
+        if self.calls > 1:
+            raise RuntimeError("Cleansing failed")
+        return super().detect(demand)
+
+
+class TestCleanseEiaData(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ParquetStore(self.temp_dir.name)
+
+        hours = pd.date_range("2021-12-30", "2022-01-02 23:00", freq="h", name="date")
+        self.store.write(dl.EIA_RAW_DATASET, "PSCO", pd.DataFrame({"demand": 5000.0}, index=hours))
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_cleanse_eia_data(self):
+        dl.cleanse_eia_data(self.temp_dir.name)
+
+        daily_df = dl.read_demand_data(self.temp_dir.name)
+        self.assertEqual([24 * 5000.0] * 4, list(daily_df["daily_demand"]))
+        self.assertEqual(4 * 24, len(dl.read_demand_data(self.temp_dir.name, hourly=True)))
+        self.assertEqual([], self.store.keys(dl.EIA_DAILY_DATASET + dl.STAGING_SUFFIX))
+
+        # A date-only end date includes every hour of that day
+        hourly_df = dl.read_demand_data(self.temp_dir.name, hourly=True, start_date="2022-01-01", end_date="2022-01-02")
+        self.assertEqual(48, len(hourly_df))
+
+    def test_failure_keeps_previous_data(self):
+        dl.cleanse_eia_data(self.temp_dir.name)
+
+        # Re-cleansing fails after the first year has been cleansed
+        with self.assertRaises(RuntimeError):
+            dl.cleanse_eia_data(self.temp_dir.name, detectors=[_FailingDetector()])
+
+        self.assertEqual(4, len(dl.read_demand_data(self.temp_dir.name)))
+        self.assertEqual(4 * 24, len(dl.read_demand_data(self.temp_dir.name, hourly=True)))
+
+
+def _hourly_demand(start: str, num_hours: int, seed: int = 0) -> pd.DataFrame:
+    """Hourly demand with a daily cycle, noise, and the occasional spike for the detectors to find"""
+    hours = pd.date_range(start, periods=num_hours, freq="h", name="date")
+    rng = np.random.default_rng(seed)
+    demand = 5000 + 1500 * np.sin(2 * np.pi * hours.hour.to_numpy() / 24) + rng.normal(0, 50, num_hours)
+    demand[rng.choice(num_hours, size=num_hours // 100, replace=False)] *= 3
+    return pd.DataFrame({"demand": demand}, index=hours)
+
+
+class TestSyncEiaData(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.store = ParquetStore(self.temp_dir.name)
+        self.detectors = [cleansing.FixedBoundsDetector(), cleansing.RollingMadDetector(window="3D")]
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def _sync(self, downloaded_df: pd.DataFrame) -> mock.MagicMock:
+        with mock.patch.object(dl.eia, "get_electric_demand_hourly_frame", return_value=downloaded_df) as get_frame:
+            dl.sync_eia_historical_data(self.temp_dir.name, detectors=self.detectors)
+        return get_frame
+
+    def test_full_download_when_empty(self):
+        usage_df = _hourly_demand("2022-01-01", 24 * 20)
+
+        get_frame = self._sync(usage_df)
+
+        self.assertEqual(date(2015, 1, 1), get_frame.call_args.args[0])
+        pd.testing.assert_frame_equal(usage_df, self.store.read(dl.EIA_RAW_DATASET, "PSCO"), check_freq=False)
+        self.assertEqual(20, len(dl.read_demand_data(self.temp_dir.name)))
+
+    def test_sync_matches_full_cleanse(self):
+        self._sync(_hourly_demand("2022-01-01", 24 * 20))
+
+        # The EIA has revised the last stored day, and has a few more days since
+        latest_hour = self.store.latest(dl.EIA_RAW_DATASET, "PSCO")
+        new_df = _hourly_demand("2022-01-18 23:00", 24 * 5 + 1, seed=1)
+        get_frame = self._sync(new_df)
+
+        self.assertEqual((latest_hour - dl.EIA_SYNC_OVERLAP).to_pydatetime(), get_frame.call_args.args[0])
+        raw_df = self.store.read(dl.EIA_RAW_DATASET, "PSCO")
+        self.assertEqual(pd.Timestamp("2022-01-23 23:00"), raw_df.index[-1])
+        pd.testing.assert_frame_equal(new_df, raw_df["2022-01-18 23:00":], check_freq=False)
+
+        # Only recent days were re-cleansed, but the result is the same as cleansing everything again
+        expected_hourly = cleansing.cleanse_hourly(raw_df, self.detectors)
+        pd.testing.assert_frame_equal(expected_hourly, dl.read_demand_data(self.temp_dir.name, hourly=True), check_freq=False)
+        pd.testing.assert_frame_equal(cleansing.daily_totals(expected_hourly), dl.read_demand_data(self.temp_dir.name),
+                                      check_freq=False)
+
+
+class TestDownloadEiaDataMulti(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_download_eia_historical_data_multi(self):
+        frames = {"PNM": _hourly_demand("2022-01-01", 48, seed=1), "PSCO": _hourly_demand("2021-12-31", 72, seed=2)}
+        usage_df = pd.concat(frames, names=["respondent", "date"])
+
+        with mock.patch.object(dl.eia, "get_electric_demand_hourly_multi", return_value=usage_df) as get_multi:
+            dl.download_eia_historical_data_multi(self.temp_dir.name, ["PSCO", "PNM"])
+
+        # One batched request for every respondent
+        get_multi.assert_called_once()
+        self.assertEqual(["PSCO", "PNM"], get_multi.call_args.kwargs["respondents"])
+
+        store = ParquetStore(self.temp_dir.name)
+        self.assertEqual(["PNM", "PSCO"], store.keys(dl.EIA_RAW_DATASET))
+        for (respondent, expected_df) in frames.items():
+            pd.testing.assert_frame_equal(expected_df, store.read(dl.EIA_RAW_DATASET, respondent), check_freq=False)